@@ -30,6 +30,8 @@ INSTALLED_APPS = [
 # MIDDLEWARE
 # ==========================================================
 MIDDLEWARE = [
+    # primeiro da lista: o tempo medido inclui os demais middlewares
+    "leitos.middleware.TimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -91,6 +93,29 @@ STATICFILES_DIRS = [
     BASE_DIR / "leitos" / "static",
 ]
 
+# ==========================================================
+# CACHE DAS APIs DE LEITOS
+# ==========================================================
+# Número máximo de respostas guardadas (LRU), limite em bytes dos corpos
+# guardados (total e por resposta; maiores não entram) e max-age do
+# Cache-Control; as entradas são invalidadas quando a versão do dataset muda
+LEITOS_API_CACHE_SIZE = 512
+LEITOS_API_CACHE_BYTES = 64 * 1024 * 1024
+LEITOS_API_CACHE_MAX_ENTRY_BYTES = 1024 * 1024
+LEITOS_API_CACHE_MAX_AGE = 300
+
+# Intervalo (segundos) entre verificações, em segundo plano, de CSVs novos/alterados em leitos/data/
+LEITOS_INGEST_INTERVAL = 60
+
+# ==========================================================
+# INSTRUMENTAÇÃO
+# ==========================================================
+# Tempos por etapa saem no cabeçalho Server-Timing e as métricas em /metrics.
+# Com LEITOS_PROFILING=1 no ambiente, ?profile=1 em qualquer URL devolve as
+# pilhas amostradas a cada LEITOS_PROFILING_INTERVAL segundos durante a request
+LEITOS_PROFILING = os.environ.get("LEITOS_PROFILING", "") == "1"
+LEITOS_PROFILING_INTERVAL = 0.001
+
 # ==========================================================
 # PADRÕES
 # ==========================================================
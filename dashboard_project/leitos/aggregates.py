@@ -0,0 +1,92 @@
+import pandas as pd
+
+from .utils_notebook_loader import numeric_cols
+
+# Níveis do cubo pelo tamanho do prefixo de CEP guardado: 0 = só zona x mês,
+# 5 = zona x mês x subsetor postal
+CUBE_CEP_LEVELS = (0, 5)
+
+
+def build_cube(df, cep_prefix):
+    """Soma todas as colunas de leitos por zona x mês x prefixo de CEP.
+
+    O cubo tem as mesmas colunas do DF original (com o CEP truncado no
+    prefixo), então os mesmos filtros e agrupamentos das views funcionam
+    sobre ele sem alteração.
+    """
+    cols_map = df.attrs["cols_map"]
+    zone_col = cols_map.get("zone")
+    comp_col = cols_map.get("comp")
+    cep_col = cols_map.get("cep")
+
+    keys = [c for c in (zone_col, comp_col, cep_col) if c]
+    if not keys:
+        return None
+
+    source = df[keys + numeric_cols(df)]
+    if cep_col:
+        source = source.assign(**{cep_col: source[cep_col].str[:cep_prefix]})
+
+    cube = source.groupby(keys, as_index=False, observed=True, sort=True).sum()
+    cube.attrs["cols_map"] = dict(cols_map)
+    return cube
+
+
+def build_cubes(df):
+    return {level: build_cube(df, level) for level in CUBE_CEP_LEVELS}
+
+
+def merge_cubes(parts):
+    """Junta cubos de partes disjuntas dos dados (ex.: um por CSV mensal).
+
+    Como os cubos são somas, o cubo do todo é a soma dos cubos das partes:
+    não é preciso reagrupar as linhas originais.
+    """
+    merged = {}
+    for level in CUBE_CEP_LEVELS:
+        cubes = [p[level] for p in parts if p.get(level) is not None]
+        if not cubes:
+            merged[level] = None
+            continue
+        cols_map = cubes[0].attrs["cols_map"]
+        keys = [c for c in (cols_map.get("zone"), cols_map.get("comp"), cols_map.get("cep")) if c]
+        cube = pd.concat(cubes, ignore_index=True)
+        if cols_map.get("zone"):
+            cube[cols_map["zone"]] = cube[cols_map["zone"]].astype(str)
+        cube = cube.groupby(keys, as_index=False, sort=True).sum()
+        if cols_map.get("zone"):
+            cube[cols_map["zone"]] = cube[cols_map["zone"]].astype("category")
+        cube.attrs["cols_map"] = dict(cols_map)
+        merged[level] = cube
+    return merged
+
+
+def pick_cube(cubes, q_cep):
+    # Menor cubo que ainda responde o filtro; None = usar as linhas do DF
+    for level in CUBE_CEP_LEVELS:
+        if len(q_cep) <= level:
+            return cubes.get(level)
+    return None
+
+
+def sum_by(df, dim_col, fields, dim_name="zone", empty_label="Sem Região"):
+    """Soma colunas por dimensão de forma vetorizada.
+
+    ``fields`` mapeia o nome de saída para a coluna do DF (ou None quando a
+    coluna não existe no CSV, que sai como 0). Valores vazios da dimensão
+    viram ``empty_label``. Retorna um DF com a coluna ``dim_name`` e uma
+    coluna por campo, ordenado pela dimensão.
+    """
+    cols = list(dict.fromkeys(c for c in fields.values() if c))
+
+    grouped = df.groupby(dim_col, observed=True, sort=False)[cols].sum()
+
+    # Agrupa de novo (já sobre poucas linhas) depois de rotular os vazios
+    labels = grouped.index.astype(str)
+    grouped.index = labels.where(labels.str.strip() != "", empty_label)
+    grouped = grouped.groupby(level=0, sort=True).sum()
+
+    out = pd.DataFrame({dim_name: grouped.index.to_numpy(dtype=object)})
+    for name, col in fields.items():
+        out[name] = grouped[col].to_numpy() if col else 0
+    return out
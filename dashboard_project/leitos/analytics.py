@@ -0,0 +1,260 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .periods import period_label
+from .snapshot import SNAPSHOT_FORMAT, read_meta
+
+# Janelas móveis (em meses) calculadas para cada métrica; 1 = o próprio mês
+WINDOWS = (1, 3, 12)
+
+# Tamanhos de prefixo de CEP para os rankings (o cubo guarda até 5 dígitos)
+CEP_PREFIXES = (1, 2, 3, 4, 5)
+
+# Especialidades de UTI: colunas UTI_<ESP>_EXIST e UTI_<ESP>_SUS do CSV
+UTI_ESPECIALIDADES = ("TOTAL", "ADULTO", "PEDIATRICO", "NEONATAL", "QUEIMADO", "CORONARIANA")
+
+# Grupo com a soma de todas as zonas
+TOTAL = "Total"
+
+
+def metric_specs(cols_map, columns):
+    """Métricas disponíveis: ``nome -> (numerador, denominador, descrição)``.
+
+    Sem denominador a métrica é um total de leitos (nas janelas, a média
+    dos totais mensais: leitos são estoque, não fluxo). Com denominador é
+    um percentual, calculado como razão das somas na janela.
+    """
+    specs = {}
+    exist, sus = cols_map.get("leitos_exist"), cols_map.get("leitos_sus")
+    if exist:
+        specs["leitos_exist"] = (exist, None, "Leitos existentes")
+    if sus:
+        specs["leitos_sus"] = (sus, None, "Leitos SUS")
+    if exist and sus:
+        specs["taxa_sus"] = (sus, exist, "% dos leitos existentes que são SUS")
+    for esp in UTI_ESPECIALIDADES:
+        uti_exist, uti_sus = f"UTI_{esp}_EXIST", f"UTI_{esp}_SUS"
+        name = esp.lower()
+        if uti_exist in columns:
+            specs[f"uti_{name}"] = (uti_exist, None, f"Leitos de UTI ({name}) existentes")
+            if exist:
+                specs[f"taxa_uti_{name}"] = (uti_exist, exist, f"% dos leitos existentes que são UTI ({name})")
+        if uti_exist in columns and uti_sus in columns:
+            specs[f"taxa_sus_uti_{name}"] = (uti_sus, uti_exist, f"% dos leitos de UTI ({name}) que são SUS")
+    return specs
+
+
+def _rolling_sum(values, window):
+    # soma dos últimos ``window`` meses ao longo do eixo 1 (meses)
+    cumulative = np.cumsum(values, axis=1)
+    out = cumulative.copy()
+    out[:, window:] -= cumulative[:, :-window]
+    return out
+
+
+def _panel_values(sums, present, specs, columns):
+    # (janelas x métricas, grupos, meses), na ordem de _Panel.values
+    stack = np.empty((len(WINDOWS) * len(specs), sums.shape[0], sums.shape[1]))
+    i = 0
+    for window in WINDOWS:
+        rolled = _rolling_sum(sums, window)
+        # a janela só vale com todos os seus meses presentes nos dados
+        complete = _rolling_sum(present[None, :].astype(float), window)[0] == window
+        for num, den, _ in specs.values():
+            numerator = rolled[:, :, columns.index(num)]
+            if den is None:
+                value = numerator / window
+            else:
+                denominator = rolled[:, :, columns.index(den)]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    value = np.where(denominator > 0, numerator / denominator * 100, np.nan)
+            value = np.round(value, 2)
+            value[:, ~complete] = np.nan
+            stack[i] = value
+            i += 1
+    return stack
+
+
+class _Panel:
+    """Grupos x meses de uma agregação, com as métricas de cada janela.
+
+    Todas as métricas/janelas ficam num único array (``stack``), que é o
+    que vai para a cópia compartilhada; ``values[métrica, janela]`` são
+    fatias dele.
+    """
+
+    def __init__(self, labels, zones, stack, specs):
+        self.labels = labels
+        self.zones = zones
+        self.stack = stack
+        keys = [(name, window) for window in WINDOWS for name in specs]
+        self.values = dict(zip(keys, stack))
+
+
+class Analytics:
+    """Métricas de capacidade pré-calculadas para uma versão dos dados.
+
+    Parte do cubo zona x mês x prefixo de CEP (leitos/aggregates.py):
+    as somas mensais de cada grupo ficam numa matriz grupos x meses x
+    colunas, e as janelas móveis saem de somas acumuladas ao longo dos
+    meses, sem loop por grupo nem por mês. Os meses formam um eixo
+    contínuo (meses ausentes dos dados invalidam as janelas que os
+    contêm). Há um painel por zona (mais o ``Total``, fora dos rankings)
+    e, para cada tamanho de prefixo de CEP, dois: um por prefixo (com a
+    zona só quando todas as linhas do prefixo são da mesma zona; prefixos
+    curtos cobrem várias) e um por zona x prefixo, usado quando a consulta
+    filtra por zona. As consultas só recortam e ordenam esses arrays.
+    """
+
+    def __init__(self, cube, cols_map):
+        self.specs = {}
+        self.panels = {}
+        zone_col, comp_col, cep_col = cols_map.get("zone"), cols_map.get("comp"), cols_map.get("cep")
+        if cube is None or not zone_col or not comp_col:
+            return
+        cube = cube[cube[comp_col] > 0]
+        self.specs = metric_specs(cols_map, cube.columns)
+        if cube.empty or not self.specs:
+            self.specs = {}
+            return
+
+        columns = list(dict.fromkeys(c for spec in self.specs.values() for c in spec[:2] if c))
+        comps = cube[comp_col].to_numpy()
+        first, last = comps.min(), comps.max()
+        start, stop = (first // 100) * 12 + first % 100 - 1, (last // 100) * 12 + last % 100 - 1
+        months = np.arange(start, stop + 1)
+        self.comps = (months // 12) * 100 + months % 12 + 1
+        month = (comps // 100) * 12 + comps % 100 - 1 - start
+        present = np.zeros(len(months), dtype=bool)
+        present[month] = True
+        values = cube[columns].to_numpy(dtype=float)
+        zone_codes, zone_names = pd.factorize(cube[zone_col].astype(str), sort=True)
+        zone_names = np.asarray(zone_names, dtype=object)
+
+        def sums_of(codes, n_groups):
+            sums = np.zeros((n_groups, len(months), len(columns)))
+            np.add.at(sums, (codes, month), values)
+            return sums
+
+        def panel(codes, labels, group_zones):
+            stack = _panel_values(sums_of(codes, len(labels)), present, self.specs, columns)
+            return _Panel(np.asarray(labels, dtype=object), group_zones, stack, self.specs)
+
+        # uma linha por zona + a linha extra com a soma de todas as zonas
+        sums = sums_of(zone_codes, len(zone_names))
+        sums = np.concatenate([sums, sums.sum(axis=0, keepdims=True)])
+        labels = np.append(zone_names, TOTAL).astype(object)
+        self.panels["zona"] = _Panel(labels, labels, _panel_values(sums, present, self.specs, columns), self.specs)
+
+        if cep_col in cube.columns:
+            ceps = cube[cep_col].astype(str)
+            for n in CEP_PREFIXES:
+                codes, prefixes = pd.factorize(ceps.str[:n], sort=True)
+                prefixes = np.asarray(prefixes, dtype=object)
+
+                # zona do prefixo: a única das suas linhas, ou "" se ele cobre mais de uma
+                lo = np.full(len(prefixes), len(zone_names))
+                hi = np.full(len(prefixes), -1)
+                np.minimum.at(lo, codes, zone_codes)
+                np.maximum.at(hi, codes, zone_codes)
+                single = np.where(lo == hi, zone_names[np.minimum(lo, len(zone_names) - 1)], "")
+                self.panels["cep", n] = panel(codes, prefixes, single)
+
+                # zona x prefixo: cada parte de um prefixo que cai numa zona
+                pair_codes, pairs = pd.factorize(zone_codes * len(prefixes) + codes, sort=True)
+                self.panels["cep_zona", n] = panel(
+                    pair_codes, prefixes[pairs % len(prefixes)], zone_names[pairs // len(prefixes)]
+                )
+
+    def __bool__(self):
+        return bool(self.specs)
+
+    def panel(self, by, prefix=None, by_zone=False):
+        """Painel de ``by`` (zona ou cep); ``by_zone`` separa cada prefixo de CEP por zona."""
+        if by == "zona":
+            return self.panels.get("zona")
+        return self.panels.get(("cep_zona" if by_zone else "cep", prefix))
+
+    def month_range(self, comp_range=None):
+        """Fatia do eixo de meses dentro de ``(início, fim)`` AAAAMM (None = sem limite)."""
+        lo, hi = 0, len(self.comps)
+        if comp_range:
+            start, end = comp_range
+            if start is not None:
+                lo = np.searchsorted(self.comps, start, side="left")
+            if end is not None:
+                hi = np.searchsorted(self.comps, end, side="right")
+        return slice(lo, hi)
+
+    def series(self, metric, window, panel, groups, months):
+        """DF longo (grupo, zona, mês, valor) das posições ``groups`` e da fatia ``months``."""
+        values = panel.values[metric, window][groups][:, months]
+        comps = self.comps[months]
+        return pd.DataFrame({
+            "grupo": np.repeat(panel.labels[groups], len(comps)),
+            "zone": np.repeat(panel.zones[groups], len(comps)),
+            "comp": np.tile(period_label(comps, "month").to_numpy(dtype=object), len(groups)),
+            metric: values.ravel(),
+        })
+
+    def ranking(self, metric, window, panel, groups, month, limit, top=True):
+        """Os ``limit`` grupos com maior (``top``) ou menor valor no mês de posição ``month``."""
+        # o Total não concorre com as zonas
+        groups = groups[panel.labels[groups] != TOTAL]
+        values = panel.values[metric, window][groups, month]
+        keep = ~np.isnan(values)
+        groups, values = groups[keep], values[keep]
+        # desempate estável pelo rótulo do grupo
+        order = np.lexsort((panel.labels[groups].astype(str), -values if top else values))[:limit]
+        return pd.DataFrame({
+            "posicao": np.arange(1, len(order) + 1),
+            "grupo": panel.labels[groups[order]],
+            "zone": panel.zones[groups[order]],
+            metric: values[order],
+        })
+
+
+def write_analytics(directory, analytics):
+    """Grava os painéis (arrays .npy) e a lista de métricas em ``directory``."""
+    directory = Path(directory)
+    directory.mkdir(parents=True)
+    panels = []
+    for i, (key, panel) in enumerate(analytics.panels.items()):
+        np.save(directory / f"{i}.npy", panel.stack, allow_pickle=False)
+        np.save(directory / f"{i}.labels.npy", panel.labels.astype(str), allow_pickle=False)
+        np.save(directory / f"{i}.zones.npy", panel.zones.astype(str), allow_pickle=False)
+        panels.append(key)
+    if analytics:
+        np.save(directory / "comps.npy", analytics.comps, allow_pickle=False)
+    meta = {"format": SNAPSHOT_FORMAT, "specs": list(analytics.specs.items()), "panels": panels}
+    (directory / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+
+def read_analytics(directory):
+    """Analytics gravado por ``write_analytics``, com os painéis mapeados em memória (mmap).
+
+    Retorna None se o diretório não existe ou está incompleto.
+    """
+    directory = Path(directory)
+    meta = read_meta(directory)
+    if meta is None:
+        return None
+    analytics = Analytics(None, {})
+    try:
+        specs = {name: tuple(spec) for name, spec in meta["specs"]}
+        if specs:
+            analytics.comps = np.load(directory / "comps.npy", allow_pickle=False)
+        for i, key in enumerate(meta["panels"]):
+            analytics.panels[key if isinstance(key, str) else tuple(key)] = _Panel(
+                np.load(directory / f"{i}.labels.npy", allow_pickle=False).astype(object),
+                np.load(directory / f"{i}.zones.npy", allow_pickle=False).astype(object),
+                np.load(directory / f"{i}.npy", mmap_mode="r", allow_pickle=False),
+                specs,
+            )
+    except (OSError, KeyError, ValueError):
+        return None
+    analytics.specs = specs
+    return analytics
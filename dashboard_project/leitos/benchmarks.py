@@ -0,0 +1,195 @@
+import csv
+import time
+import tracemalloc
+from pathlib import Path
+from urllib.parse import quote, urlencode
+
+import numpy as np
+
+from .timeseries import hospital_id
+from .utils_notebook_loader import find_csv
+
+# Apoio aos comandos bench_leitos e loadtest_leitos: dados sintéticos no
+# formato do Consolidado_SP.csv, medição de tempo/memória e as URLs que o
+# dashboard pede. Sem dependência de Django.
+
+
+def synthetic_csv(source, target, scale=1, seed=0):
+    """Grava em ``target`` um CSV como ``source`` com ``scale`` vezes as linhas.
+
+    Cada linha original vira ``scale`` linhas: a cópia 0 é a original e as
+    demais são hospitais novos (nome com sufixo e CEP com outros três
+    últimos dígitos, mesmo prefixo e zona), com os leitos variando até 20%
+    para mais ou para menos. Meses, zonas e municípios seguem a
+    distribuição do arquivo real. Retorna o número de linhas gravadas.
+    """
+    rng = np.random.default_rng(seed)
+    with open(source, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f, delimiter=";")
+        header = [c.strip() for c in next(reader)]
+        rows = list(reader)
+
+    nome = header.index("NOME_ESTABELECIMENTO")
+    cep = header.index("CO_CEP")
+    counts = [i for i, c in enumerate(header) if c.upper().startswith(("LEITOS", "QT_LEITOS", "UTI_"))]
+
+    written = 0
+    with open(target, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(header)
+        for copy in range(scale):
+            factors = rng.uniform(0.8, 1.2, len(rows)) if copy else np.ones(len(rows))
+            for row, factor in zip(rows, factors):
+                if copy:
+                    row = list(row)
+                    row[nome] = f"{row[nome]} {copy}"
+                    digits = row[cep].zfill(8)
+                    row[cep] = f"{digits[:5]}{(int(digits[5:] or 0) + 37 * copy) % 1000:03d}"
+                    for i in counts:
+                        value = row[i].strip()
+                        row[i] = str(round(int(value) * factor)) if value.isdigit() else value
+                writer.writerow(row)
+                written += 1
+    return written
+
+
+def timed(func, repeat=20, warmup=1):
+    """Executa ``func`` ``warmup + repeat`` vezes; tempos (ms) das ``repeat`` últimas."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def peak_memory(func):
+    """Pico de memória alocada (bytes) durante uma execução de ``func``.
+
+    Medido com tracemalloc (inclui os buffers do numpy/pandas), numa
+    execução separada das de tempo, que o tracemalloc deixaria mais lentas.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(samples):
+    """p50, p99, média e máximo (ms) de uma lista de tempos."""
+    samples = np.asarray(samples, dtype=float)
+    if not len(samples):
+        return {"n": 0, "p50": None, "p99": None, "mean": None, "max": None}
+    return {
+        "n": len(samples),
+        "p50": round(float(np.percentile(samples, 50)), 3),
+        "p99": round(float(np.percentile(samples, 99)), 3),
+        "mean": round(float(samples.mean()), 3),
+        "max": round(float(samples.max()), 3),
+    }
+
+
+def sample_values(data):
+    """Zona, prefixo de CEP, CEP, município e hospital reais do Dataset, para as URLs."""
+    df = data.df
+    values = {"zone": "", "cep_prefix": "", "cep": "", "municipio": "", "hospital": ""}
+    if data.col("zone"):
+        values["zone"] = str(df[data.col("zone")].astype(str).mode().iloc[0])
+    if data.col("cep"):
+        ceps = df[data.col("cep")].astype(str)
+        values["cep"] = str(ceps.iloc[len(ceps) // 2])
+        values["cep_prefix"] = values["cep"][:2]
+    if data.col("municipio"):
+        values["municipio"] = str(df[data.col("municipio")].astype(str).iloc[0])
+    if data.col("nome") and data.col("cep"):
+        values["hospital"] = hospital_id(df[data.col("nome")].iloc[0], df[data.col("cep")].iloc[0])
+    return values
+
+
+def endpoint_urls(data):
+    """``(nome, URL)`` de cada API de leitos/urls.py, com filtros que existem nos dados."""
+    v = {k: quote(value) for k, value in sample_values(data).items()}
+    return [
+        ("dashboard", "/api/dashboard/?format=columns&filters=1"),
+        ("dashboard_filtro", f"/api/dashboard/?format=columns&zone={v['zone']}&cep={v['cep_prefix']}"),
+        ("zona_leitos", "/api/zona_leitos/"),
+        ("zona_especialidades", "/api/zona_especialidades/"),
+        ("evolucao_leitos", "/api/evolucao_leitos/"),
+        ("evolucao_leitos_trimestre", "/api/evolucao_leitos/?period=quarter"),
+        ("taxa_ocupacao_sus", "/api/taxa_ocupacao_sus/"),
+        ("estabelecimentos", "/api/estabelecimentos/?format=columns"),
+        ("estabelecimentos_ordenado", "/api/estabelecimentos/?format=columns&page=3&sort=leitos_sus&order=desc"),
+        ("export", "/api/estabelecimentos/export/"),
+        ("por_municipio", f"/api/por_municipio/{v['municipio']}/?limit=100"),
+        ("por_zona", f"/api/por_zona/{v['zone']}/?limit=100"),
+        ("por_cep", f"/api/por_cep/{v['cep']}/"),
+        ("filters", "/api/filters/"),
+        ("hospital_historico", f"/api/hospitais/{v['hospital']}/historico/"),
+        ("hospital_variacoes", "/api/hospitais/variacoes/"),
+    ]
+
+
+# Mix de requests de uma sessão do dashboard (dashboard.js): carga inicial
+# com filtros, troca de filtros, paginação/ordenação da tabela e export.
+# Pesos relativos de cada tipo.
+DASHBOARD_MIX = (
+    ("carga_inicial", 2),
+    ("filtro", 4),
+    ("pagina", 6),
+    ("ordenacao", 2),
+    ("export", 1),
+)
+
+
+def dashboard_mix(data, seed=0):
+    """Gerador infinito de ``(tipo, URL)`` seguindo ``DASHBOARD_MIX``.
+
+    Os filtros são sorteados entre as zonas e prefixos de CEP dos dados e
+    as páginas entre as existentes, então o cache de respostas vê a mesma
+    variedade de chaves que veria com usuários reais.
+    """
+    rng = np.random.default_rng(seed)
+    kinds = [kind for kind, _ in DASHBOARD_MIX]
+    weights = np.array([w for _, w in DASHBOARD_MIX], dtype=float)
+    weights /= weights.sum()
+
+    zones = [""]
+    if data.col("zone"):
+        zones += sorted(data.df[data.col("zone")].dropna().astype(str).unique().tolist())
+    prefixes = [""]
+    if data.col("cep"):
+        prefixes += sorted({c[:2] for c in data.index_for(data.df).unique_ceps()})
+    total = len(data.hospitals.frame) if data.hospitals.frame is not None else 0
+    sorts = ["leitos_exist", "leitos_sus", "nome", "cep"]
+
+    while True:
+        kind = kinds[rng.choice(len(kinds), p=weights)]
+        zone = zones[rng.integers(len(zones))]
+        cep = prefixes[rng.integers(len(prefixes))]
+        filters = urlencode([(k, v) for k, v in (("zone", zone), ("cep", cep)) if v])
+        filters = f"&{filters}" if filters else ""
+        page_size = 25
+        page = int(rng.integers(1, max(total // page_size, 1) + 1))
+        if kind == "carga_inicial":
+            yield kind, f"/api/dashboard/?page=1&page_size={page_size}&format=columns&filters=1"
+        elif kind == "filtro":
+            yield kind, f"/api/dashboard/?page=1&page_size={page_size}&format=columns{filters}"
+        elif kind == "pagina":
+            yield kind, f"/api/estabelecimentos/?page={page}&page_size={page_size}&format=columns{filters}"
+        elif kind == "ordenacao":
+            sort = sorts[rng.integers(len(sorts))]
+            order = "desc" if rng.integers(2) else "asc"
+            yield kind, f"/api/dashboard/?page=1&page_size={page_size}&format=columns&sort={sort}&order={order}{filters}"
+        else:
+            yield kind, f"/api/estabelecimentos/export/?{filters.lstrip('&')}"
+
+
+def synthetic_dataset_csv(directory, scale=1, source=None, seed=0):
+    """Gera ``Consolidado_SP_<scale>x.csv`` em ``directory`` a partir do consolidado real."""
+    csv_path = Path(directory) / f"Consolidado_SP_{scale}x.csv"
+    synthetic_csv(source or find_csv(), csv_path, scale, seed)
+    return csv_path
@@ -0,0 +1,153 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .instrumentation import mark_cache_hit
+
+# Normalização dos parâmetros que entram na chave do cache (mesma regra de _apply_filters)
+PARAM_NORMALIZERS = {
+    "zone": lambda v: v.strip().upper(),
+    "cep": lambda v: v.replace("-", "").strip(),
+    "page": lambda v: v.strip().lstrip("0") or "0",
+    "page_size": lambda v: v.strip().lstrip("0") or "0",
+    "order": lambda v: v.strip().lower(),
+    "period": lambda v: v.strip().lower(),
+}
+
+
+class ResponseCache:
+    """Cache LRU limitado de respostas já serializadas (thread-safe).
+
+    O limite vale em número de entradas e em bytes somados dos corpos;
+    corpos maiores que ``max_entry_bytes`` (ex.: páginas enormes da tabela)
+    não são guardados.
+    """
+
+    def __init__(self, max_entries, max_bytes=64 << 20, max_entry_bytes=1 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        size = len(entry[1])
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous[1])
+            self._entries[key] = entry
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+RESPONSE_CACHE = ResponseCache(
+    getattr(settings, "LEITOS_API_CACHE_SIZE", 512),
+    getattr(settings, "LEITOS_API_CACHE_BYTES", 64 << 20),
+    getattr(settings, "LEITOS_API_CACHE_MAX_ENTRY_BYTES", 1 << 20),
+)
+
+
+def request_key(request):
+    # caminho + query string normalizada e ordenada (parâmetros vazios são ignorados)
+    params = []
+    for name in sorted(request.GET):
+        value = request.GET.get(name, "")
+        value = PARAM_NORMALIZERS.get(name, str.strip)(value)
+        if value:
+            params.append((name, value))
+    return f"{request.path}?{urlencode(params)}"
+
+
+def make_etag(version, key):
+    return hashlib.sha1(f"{version}|{key}".encode()).hexdigest()[:24]
+
+
+def _version(request):
+    return request.dataset.version if request.dataset is not None else None
+
+
+def cached_api(dataset_func):
+    """Decorator das APIs: ETag/Last-Modified, 304 condicional e cache LRU.
+
+    A chave é a versão do dataset + endpoint + filtros normalizados, então
+    uma nova carga de dados invalida todas as entradas de uma vez. Sem
+    dataset carregado (versão None) a view roda normalmente, sem cache.
+    Só respostas 200 recebem ETag/Last-Modified/Cache-Control: erros (ex.:
+    500 "Dados não carregados") não podem ficar guardados em proxies.
+
+    ``dataset_func()`` é chamado uma única vez por request e o resultado
+    fica em ``request.dataset``: ETag, Last-Modified, chave do cache e a
+    própria view usam a mesma versão, mesmo que a recarga em segundo plano
+    troque o dataset no meio da request.
+    """
+    def decorator(view):
+        def etag(request, *args, **kwargs):
+            version = _version(request)
+            return make_etag(version, request_key(request)) if version else None
+
+        def last_modified(request, *args, **kwargs):
+            return request.dataset.last_modified if request.dataset is not None else None
+
+        @wraps(view)
+        def api_view(request, *args, **kwargs):
+            request.dataset = dataset_func()
+            response = cached_view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                # o condition marca qualquer resposta; erros saem sem validadores
+                for name in ("ETag", "Last-Modified"):
+                    if response.has_header(name):
+                        del response[name]
+            return response
+
+        @condition(etag_func=etag, last_modified_func=last_modified)
+        def cached_view(request, *args, **kwargs):
+            version = _version(request)
+            key = (version, request_key(request))
+
+            entry = RESPONSE_CACHE.get(key) if version else None
+            if entry is not None:
+                mark_cache_hit()
+                status, content, headers = entry
+                response = HttpResponse(content, status=status)
+                for name, value in headers:
+                    response[name] = value
+            else:
+                response = view(request, *args, **kwargs)
+                if version and response.status_code == 200 and not response.streaming:
+                    RESPONSE_CACHE.put(key, (response.status_code, response.content, list(response.items())))
+
+            if version and response.status_code == 200:
+                patch_cache_control(response, public=True, max_age=getattr(settings, "LEITOS_API_CACHE_MAX_AGE", 300))
+            return response
+
+        return api_view
+
+    return decorator
@@ -1,12 +1,95 @@
-from fastapi import FastAPI, Query
+import os
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import anyio
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
+from fastapi.responses import Response
+
+# permite rodar tanto de leitos/data (uvicorn main:app) quanto do projeto Django
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from leitos import queries  # noqa: E402
+from leitos.ingestion import MonthlyIngestor  # noqa: E402
+from leitos.serializers import dumps  # noqa: E402
+from leitos.store import DatasetWatcher  # noqa: E402
 
 # --- Carregar os dados ---
-df = pd.read_csv("Consolidado_SP.csv", sep=";", encoding="utf-8-sig", dtype=str)
+# Anexa à mesma cópia mapeada em memória usada pelos workers do Django
+# (ou a publica, se esta API subir primeiro) e recarrega em segundo plano
+# quando os CSVs mudam; a carga inicial roda no lifespan do app, numa thread
+WATCHER = DatasetWatcher(MonthlyIngestor())
+
+# Máximo de consultas pandas simultâneas por processo. Os handlers são
+# async: o event loop só aceita conexões e espera, e o trabalho de CPU
+# (filtro, agregação e serialização) roda em threads limitadas a este número
+MAX_WORKERS = int(os.environ.get("LEITOS_API_WORKERS", os.cpu_count() or 4))
+LIMITER = anyio.CapacityLimiter(MAX_WORKERS)
+
+# Máximo de linhas por página nas rotas por município/zona/CEP
+MAX_PAGE_ROWS = 5000
+
+
+def _json_response(obj, status_code=200, columnar=False):
+    return Response(dumps(obj, columnar), status_code=status_code, media_type="application/json")
+
+
+async def _run(query, *args, columnar=False, **kwargs):
+    """Executa ``query(data, ...)`` numa thread do pool e retorna o JSON.
+
+    O Dataset é lido uma vez no início, então a consulta inteira usa a
+    mesma versão dos dados mesmo que uma recarga aconteça no meio.
+    """
+    if WATCHER.data is None:
+        # sem lifespan (ou carga inicial falhou): carrega fora do event loop
+        await anyio.to_thread.run_sync(WATCHER.ensure_started)
+    data = WATCHER.data
+    if data is None:
+        raise HTTPException(status_code=500, detail="Dados não carregados")
+
+    def work():
+        try:
+            return _json_response(query(data, *args, **kwargs), columnar=columnar)
+        except queries.QueryError as e:
+            return _json_response({"error": str(e)}, status_code=e.status)
+
+    return await anyio.to_thread.run_sync(work, limiter=LIMITER)
+
+
+def _rows(data, filters, fields, cursor, limit):
+    fields = [f.strip() for f in fields.split(",") if f.strip()]
+    positions, columns, next_cursor = queries.row_selection(
+        data, filters, fields, cursor, limit, MAX_PAGE_ROWS
+    )
+    rows = queries.rows_frame(data, positions, columns)
+    if limit > 0:
+        return {"results": rows, "next_cursor": next_cursor}
+    return rows
+
+
+def _first_rows(data, n):
+    return data.df.head(n)
+
+
+def _establishment_counts(data):
+    counts = data.df[data.col("zone")].value_counts()
+    counts = counts[counts > 0].reset_index()
+    counts.columns = ["zona", "quantidade"]
+    return counts
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # carga inicial (snapshot/CSVs, cubos e índices) antes de aceitar conexões,
+    # fora do event loop
+    await anyio.to_thread.run_sync(WATCHER.ensure_started)
+    yield
+
 
 # --- Inicializar o app FastAPI ---
-app = FastAPI(title="API de Estabelecimentos de SP", version="1.0")
+app = FastAPI(title="API de Estabelecimentos de SP", version="2.0", lifespan=lifespan)
 
 # --- Configurar CORS (libera acesso do frontend) ---
 app.add_middleware(
@@ -21,43 +104,197 @@ app.add_middleware(
 
 
 @app.get("/")
-def home():
+async def home():
     return {"mensagem": "API de Estabelecimentos de SP está online 🚀"}
 
 
 @app.get("/todos")
-def listar_todos(limite: int = Query(20, ge=1, le=500)):
+async def listar_todos(limite: int = Query(20, ge=1, le=500)):
     """Retorna os primeiros registros do arquivo."""
-    return df.head(limite).to_dict(orient="records")
+    return await _run(_first_rows, limite)
 
 
 @app.get("/zonas")
-def listar_zonas():
+async def listar_zonas():
     """Retorna a contagem de estabelecimentos por zona."""
-    zonas = df['ZONA'].value_counts().reset_index()
-    zonas.columns = ['zona', 'quantidade']
-    return zonas.to_dict(orient="records")
+    return await _run(_establishment_counts)
+
+
+# Filtros opcionais da query string, os mesmos do dashboard Django
+ZoneQuery = Query("", description="Zona (ex.: Zona Sul)")
+CepQuery = Query("", description="Prefixo de CEP")
+TextQuery = Query("", description="Busca por nome, razão social ou endereço")
+
+
+# format=columns: DataFrames saem como {coluna: [valores]} (arrays para o Plotly)
+FormatQuery = Query("", pattern="^(|records|columns)$")
+
+# Ordenação da tabela de hospitais (coluna de TABLE_COLUMNS e direção)
+SortQuery = Query("", description="Coluna (ex.: leitos_sus ou Leitos SUS)")
+OrderQuery = Query("asc", pattern="^(asc|desc)$")
+
+# Série temporal: agregação por mês/trimestre/ano e intervalo (AAAA-MM ou AAAA)
+PeriodQuery = Query("month", pattern="^(month|quarter|year)$")
+FromQuery = Query("", alias="from")
+ToQuery = Query("", alias="to")
+
+
+def _filters(zone, cep, q=""):
+    return {"zone": zone.strip(), "cep": cep.replace("-", "").strip(), "q": q.strip()}
 
 
 @app.get("/por_zona/{zona}")
-def filtrar_por_zona(zona: str):
-    """Retorna todos os registros de uma zona específica."""
-    zona = zona.strip().title()
-    dados = df[df['ZONA'] == zona]
-    return dados.to_dict(orient="records")
+async def filtrar_por_zona(
+    zona: str, cep: str = CepQuery, q: str = TextQuery, fields: str = "",
+    cursor: int = -1, limit: int = Query(0, ge=0),
+):
+    """Registros de uma zona (sem diferenciar maiúsculas)."""
+    return await _run(_rows, [{"zone": zona.strip()}, _filters("", cep, q)], fields, cursor, limit)
 
 
 @app.get("/por_cep/{cep}")
-def filtrar_por_cep(cep: str):
+async def filtrar_por_cep(
+    cep: str, zone: str = ZoneQuery, q: str = TextQuery, fields: str = "",
+    cursor: int = -1, limit: int = Query(0, ge=0),
+):
     """Busca registros por CEP (parcial ou completo)."""
-    cep = cep.replace("-", "")
-    dados = df[df['CO_CEP'].str.startswith(cep)]
-    return dados.to_dict(orient="records")
+    return await _run(_rows, [_filters(zone, cep, q)], fields, cursor, limit)
 
 
 @app.get("/por_municipio/{municipio}")
-def filtrar_por_municipio(municipio: str):
-    """Busca registros por município."""
-    municipio = municipio.upper()
-    dados = df[df['MUNICIPIO'].str.upper().str.contains(municipio, na=False)]
-    return dados.to_dict(orient="records")
+async def filtrar_por_municipio(
+    municipio: str, zone: str = ZoneQuery, cep: str = CepQuery, q: str = TextQuery, fields: str = "",
+    cursor: int = -1, limit: int = Query(0, ge=0),
+):
+    """Registros de um município (nome exato, sem diferenciar maiúsculas)."""
+    return await _run(_rows, [{"municipio": municipio.strip()}, _filters(zone, cep, q)], fields, cursor, limit)
+
+
+# --- Agregados do dashboard (mesmas consultas de /leitos/api/ no Django) ---
+
+
+@app.get("/zona_leitos")
+async def zona_leitos(zone: str = ZoneQuery, cep: str = CepQuery, q: str = TextQuery, format: str = FormatQuery):
+    return await _run(queries.zona_leitos, columnar=format == "columns", **_filters(zone, cep, q))
+
+
+@app.get("/zona_especialidades")
+async def zona_especialidades(zone: str = ZoneQuery, cep: str = CepQuery, q: str = TextQuery, format: str = FormatQuery):
+    return await _run(queries.zona_especialidades, columnar=format == "columns", **_filters(zone, cep, q))
+
+
+@app.get("/evolucao_leitos")
+async def evolucao_leitos(
+    zone: str = ZoneQuery, cep: str = CepQuery, q: str = TextQuery, format: str = FormatQuery,
+    period: str = PeriodQuery, date_from: str = FromQuery, date_to: str = ToQuery,
+):
+    return await _run(
+        queries.evolucao_leitos, period=period, date_from=date_from, date_to=date_to,
+        columnar=format == "columns", **_filters(zone, cep, q)
+    )
+
+
+@app.get("/taxa_ocupacao_sus")
+async def taxa_ocupacao_sus(zone: str = ZoneQuery, cep: str = CepQuery, q: str = TextQuery, format: str = FormatQuery):
+    return await _run(queries.taxa_ocupacao_sus, columnar=format == "columns", **_filters(zone, cep, q))
+
+
+@app.get("/estabelecimentos")
+async def estabelecimentos(
+    page: int = Query(1, ge=1), page_size: int = Query(25, ge=1, le=MAX_PAGE_ROWS),
+    zone: str = ZoneQuery, cep: str = CepQuery, q: str = TextQuery, format: str = FormatQuery,
+    sort: str = SortQuery, order: str = OrderQuery,
+):
+    return await _run(
+        queries.estabelecimentos_page, page=page, page_size=page_size, sort=sort, order=order,
+        columnar=format == "columns", **_filters(zone, cep, q)
+    )
+
+
+@app.get("/dashboard")
+async def dashboard(
+    page: int = Query(1, ge=1), page_size: int = Query(25, ge=1, le=MAX_PAGE_ROWS),
+    zone: str = ZoneQuery, cep: str = CepQuery, q: str = TextQuery, filters: bool = False,
+    format: str = FormatQuery,
+    sort: str = SortQuery, order: str = OrderQuery,
+    period: str = PeriodQuery, date_from: str = FromQuery, date_to: str = ToQuery,
+):
+    """Todos os gráficos e a página da tabela em uma única resposta."""
+    return await _run(
+        queries.dashboard, page=page, page_size=page_size, with_filters=filters, sort=sort, order=order,
+        period=period, date_from=date_from, date_to=date_to,
+        columnar=format == "columns", **_filters(zone, cep, q)
+    )
+
+
+@app.get("/filtros")
+async def filtros():
+    return await _run(queries.filter_options)
+
+
+@app.get("/busca")
+async def busca(
+    q: str = Query(..., min_length=1, description="Nome, razão social ou endereço"),
+    limit: int = Query(20, ge=1, le=queries.MAX_SEARCH), format: str = FormatQuery,
+):
+    """Estabelecimentos por nome, razão social ou endereço (sem acentos, tolera erros de digitação)."""
+    return await _run(queries.search, q=q, limit=limit, columnar=format == "columns")
+
+
+@app.get("/proximos")
+async def proximos(
+    cep: str = Query("", description="CEP de origem (ou use lat/lon)"),
+    lat: float | None = Query(None, ge=-90, le=90), lon: float | None = Query(None, ge=-180, le=180),
+    k: int = Query(10, ge=1, le=queries.MAX_PROXIMOS),
+    min_sus: int = Query(1, ge=0), min_uti: int = Query(0, ge=0), format: str = FormatQuery,
+):
+    """Hospitais mais próximos com leitos SUS/UTI disponíveis."""
+    return await _run(
+        queries.proximos, cep=cep.replace("-", "").strip(), lat=lat, lon=lon, k=k,
+        min_sus=min_sus, min_uti=min_uti, columnar=format == "columns",
+    )
+
+
+@app.get("/metricas")
+async def metricas(
+    metric: str = Query("", description="Métrica (vazio lista as disponíveis)"),
+    window: int = Query(1, description="Janela móvel em meses: 1, 3 ou 12"),
+    by: str = Query("zona", pattern="^(zona|cep)$"), prefix: int = Query(3, ge=1, le=5),
+    zone: str = ZoneQuery, cep: str = CepQuery, date_from: str = FromQuery, date_to: str = ToQuery,
+    rank: str = Query("", pattern="^(top|bottom)?$"), comp: str = Query("", description="Mês AAAA-MM do ranking"),
+    limit: int = Query(10, ge=1, le=queries.MAX_METRICAS_RANKING), format: str = FormatQuery,
+):
+    """Taxa SUS, UTI por especialidade e leitos por zona/prefixo de CEP, com janelas móveis e rankings."""
+    return await _run(
+        queries.metricas, metric=metric.strip(), window=window, by=by, prefix=prefix,
+        zone=zone.strip(), cep=cep.replace("-", "").strip(), date_from=date_from, date_to=date_to,
+        rank=rank, comp=comp.strip(), limit=limit, columnar=format == "columns",
+    )
+
+
+@app.get("/qualidade")
+async def qualidade():
+    """Relatório de qualidade de cada arquivo carregado (codificação, texto corrigido, problemas)."""
+    return await _run(queries.quality)
+
+
+# --- Séries por hospital ---
+
+
+@app.get("/hospitais/variacoes")
+async def hospital_variacoes(
+    comp: str = Query("", description="Mês AAAA-MM (padrão: o último)"),
+    metric: str = "leitos_exist", limit: int = Query(20, ge=1, le=queries.MAX_RANKING),
+    direction: str = Query("abs", pattern="^(abs|up|down)$"), format: str = FormatQuery,
+):
+    """Hospitais com as maiores variações de leitos no mês."""
+    return await _run(
+        queries.largest_changes, comp=comp, metric=metric, limit=limit, direction=direction,
+        columnar=format == "columns",
+    )
+
+
+@app.get("/hospitais/{hospital_id}/historico")
+async def hospital_historico(hospital_id: str, format: str = FormatQuery):
+    """Série mensal de um hospital, com variações mês a mês."""
+    return await _run(queries.hospital_history, hospital_id.strip().lower(), columnar=format == "columns")
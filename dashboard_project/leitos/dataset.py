@@ -0,0 +1,60 @@
+from .aggregates import CUBE_CEP_LEVELS, build_cubes
+from .analytics import Analytics
+from .hospitals import HospitalTable
+from .timeseries import HospitalSeries
+from .geo import GeoIndex, centroid_table
+from .indexes import FilterIndex
+from .search import SearchIndex
+
+
+class Dataset:
+    """Uma versão dos dados tipados e de todas as estruturas derivadas.
+
+    Nada aqui é alterado depois de construído: quando os dados mudam, um
+    novo Dataset é montado e substitui o anterior por inteiro, então uma
+    request que já pegou a referência continua vendo uma versão consistente.
+    """
+
+    def __init__(self, df, cubes=None, analytics=None):
+        self.df = df
+        self.cols_map = df.attrs["cols_map"]
+        self.version = df.attrs.get("version")
+        self.last_modified = df.attrs.get("last_modified")
+        # Relatório de qualidade de cada arquivo lido (leitos/validation.py)
+        self.quality = df.attrs.get("quality", [])
+
+        # Cubos pré-agregados (zona x mês x prefixo de CEP) usados pelos gráficos
+        self.cubes = cubes if cubes is not None else build_cubes(df)
+
+        # Métricas de capacidade (taxas e leitos por zona/prefixo de CEP, janelas móveis);
+        # vêm prontas quando o Dataset é anexado à cópia compartilhada
+        if analytics is None:
+            analytics = Analytics(self.cubes.get(max(CUBE_CEP_LEVELS)), self.cols_map)
+        self.analytics = analytics
+
+        # Busca textual (nome, razão social e endereço) dos estabelecimentos
+        self.search = SearchIndex(df)
+
+        # Leitos por hospital, já ordenados por cada coluna (tabela/export)
+        self.hospitals = HospitalTable(df, self.search)
+
+        # Série mensal de cada hospital, com variações mês a mês
+        self.series = HospitalSeries(df)
+
+        # Coordenadas dos hospitais (tabela local de CEPs) e grade para busca por proximidade
+        self.geo = GeoIndex(self.series, centroid_table(), [
+            col for col in (self.col("leitos_exist"), self.col("leitos_sus"), self.col("leitos_uti_total_sus")) if col
+        ])
+
+        # Índices de CEP/zona/município/texto do DF e de cada cubo
+        self._indexes = {
+            id(frame): FilterIndex(frame, self.search)
+            for frame in [df, *self.cubes.values()]
+            if frame is not None
+        }
+
+    def col(self, name):
+        return self.cols_map.get(name)
+
+    def index_for(self, frame):
+        return self._indexes[id(frame)]
@@ -0,0 +1,199 @@
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .utils_notebook_loader import DATA_DIR
+
+# Tabela local de coordenadas por CEP (centroide do CEP ou de um prefixo),
+# sem consulta a serviços externos. Fica fora da pasta dos CSVs mensais para
+# não ser lida como um mês. Colunas: CEP (8 dígitos ou prefixo), latitude e
+# longitude; separador ; ou ,.
+CENTROIDS_PATH = Path(os.environ.get("LEITOS_CEP_CENTROIDS", DATA_DIR / "geo" / "cep_centroides.csv"))
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def read_centroids(path):
+    """Lê a tabela de centroides como DF ``cep`` (só dígitos), ``lat``, ``lon``."""
+    df = pd.read_csv(path, sep=None, engine="python", dtype=str, encoding="utf-8-sig")
+    df.columns = [c.strip().lower() for c in df.columns]
+    cep = next((c for c in ("cep", "co_cep", "prefixo") if c in df.columns), None)
+    lat = next((c for c in ("lat", "latitude") if c in df.columns), None)
+    lon = next((c for c in ("lon", "lng", "longitude") if c in df.columns), None)
+    if not all((cep, lat, lon)):
+        raise ValueError(f"{path}: colunas esperadas: cep, lat, lon")
+
+    out = pd.DataFrame({
+        "cep": df[cep].astype(str).str.replace(r"\D", "", regex=True),
+        "lat": pd.to_numeric(df[lat].str.replace(",", "."), errors="coerce"),
+        "lon": pd.to_numeric(df[lon].str.replace(",", "."), errors="coerce"),
+    })
+    return out[(out["cep"] != "") & out["lat"].between(-90, 90) & out["lon"].between(-180, 180)]
+
+
+class CentroidTable:
+    """Coordenadas por CEP, com recuo para o prefixo mais longo conhecido.
+
+    A tabela pode misturar CEPs completos e prefixos (ex.: 5 dígitos do
+    subsetor): um CEP sem linha própria usa o centroide do maior prefixo
+    presente.
+    """
+
+    def __init__(self, centroids):
+        self.coords = {
+            cep: (lat, lon)
+            for cep, lat, lon in zip(centroids["cep"], centroids["lat"], centroids["lon"])
+        }
+        self.lengths = sorted({len(c) for c in self.coords}, reverse=True)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def lookup(self, cep):
+        """``(lat, lon)`` do CEP (ou prefixo) ou None."""
+        cep = "".join(ch for ch in str(cep) if ch.isdigit())
+        if len(cep) == 8 or len(cep) == 7:
+            cep = cep.zfill(8)
+        for n in self.lengths:
+            if n <= len(cep) and cep[:n] in self.coords:
+                return self.coords[cep[:n]]
+        return None
+
+
+_CACHE = {}
+
+
+def centroid_table(path=None):
+    """``CentroidTable`` do arquivo local (None se não existe), relida só quando o arquivo muda."""
+    path = Path(path or CENTROIDS_PATH)
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _CACHE:
+        _CACHE.clear()
+        _CACHE[key] = CentroidTable(read_centroids(path))
+    return _CACHE[key]
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(v) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class GeoIndex:
+    """Índice espacial (grade regular) dos hospitais ativos no último mês.
+
+    Cada hospital recebe as coordenadas do seu CEP pela ``CentroidTable``
+    e é projetado em km (equiretangular em torno da latitude média, boa
+    aproximação na escala de uma cidade). A grade guarda, por célula, os
+    hospitais que caem nela; a busca dos k mais próximos percorre anéis de
+    células a partir do ponto até que o anel seguinte esteja mais longe
+    que o k-ésimo encontrado, então só uma vizinhança pequena é examinada.
+    As distâncias devolvidas são de haversine.
+
+    ``info`` traz id, nome, CEP, município, zona, coordenadas e os leitos
+    do último mês de cada hospital localizado.
+    """
+
+    def __init__(self, series, centroids, metrics=()):
+        self.info = None
+        self.centroids = centroids
+        if centroids is None or not series.ids:
+            return
+
+        latest = series.latest_comp()
+        last_rows = series.offsets[1:] - 1
+        active = series.comps[last_rows] == latest
+        coords = [centroids.lookup(cep) for cep in series.info["cep"]]
+        located = active & np.array([c is not None for c in coords], dtype=bool)
+        hospitals = np.flatnonzero(located)
+
+        info = series.info.iloc[hospitals].reset_index(drop=True)
+        info["lat"] = [coords[h][0] for h in hospitals]
+        info["lon"] = [coords[h][1] for h in hospitals]
+        for col in metrics:
+            if col in series.metrics:
+                info[col] = series.values[last_rows[hospitals], series.metrics.index(col)]
+        self.info = info
+        self.missing = int(active.sum() - len(hospitals))
+        if not len(info):
+            return
+
+        lat, lon = info["lat"].to_numpy(), info["lon"].to_numpy()
+        self.lat0 = float(lat.mean())
+        self.x, self.y = self._project(lat, lon)
+
+        # célula com ~1 hospital em média (mínimo de 0,5 km)
+        span = max(self.x.max() - self.x.min(), self.y.max() - self.y.min(), 1.0)
+        self.cell = max(span / math.sqrt(len(info)), 0.5)
+        self.x0, self.y0 = self.x.min(), self.y.min()
+        cx, cy = self._cell(self.x, self.y)
+        self.n_cells = int(max(cx.max(), cy.max())) + 1
+        cells = {}
+        for i, key in enumerate(zip(cx.tolist(), cy.tolist())):
+            cells.setdefault(key, []).append(i)
+        self.cells = {key: np.array(ids, dtype=np.intp) for key, ids in cells.items()}
+
+    def __bool__(self):
+        return self.info is not None and len(self.info) > 0
+
+    def _project(self, lat, lon):
+        k = math.pi / 180 * EARTH_RADIUS_KM
+        return np.asarray(lon) * k * math.cos(math.radians(self.lat0)), np.asarray(lat) * k
+
+    def _cell(self, x, y):
+        return (
+            np.floor((x - self.x0) / self.cell).astype(int),
+            np.floor((y - self.y0) / self.cell).astype(int),
+        )
+
+    def _ring(self, cx, cy, r):
+        # células da grade a distância de Chebyshev exatamente r da célula (cx, cy)
+        n = self.n_cells
+        keys = []
+        for y in {cy - r, cy + r}:
+            if 0 <= y < n:
+                keys += [(x, y) for x in range(max(cx - r, 0), min(cx + r, n - 1) + 1)]
+        for x in {cx - r, cx + r}:
+            if 0 <= x < n:
+                keys += [(x, y) for y in range(max(cy - r + 1, 0), min(cy + r - 1, n - 1) + 1)]
+        return [self.cells[key] for key in keys if key in self.cells]
+
+    def nearest(self, lat, lon, k=10, mask=None):
+        """Posições em ``info`` e distâncias (km) dos ``k`` hospitais mais próximos.
+
+        ``mask`` (booleano por hospital) restringe os candidatos, ex.: só
+        hospitais com leitos SUS/UTI.
+        """
+        x, y = self._project(np.array([lat]), np.array([lon]))
+        cx, cy = (int(v[0]) for v in self._cell(x, y))
+        # anéis entre o primeiro que toca a grade (o ponto pode estar fora
+        # dela) e o que cobre a grade inteira
+        first = max(-cx, cx - self.n_cells + 1, -cy, cy - self.n_cells + 1, 0)
+        last = max(abs(cx), abs(cy), abs(self.n_cells - cx), abs(self.n_cells - cy))
+
+        found = []
+        best = np.empty(0, dtype=np.intp)
+        dist = np.empty(0)
+        for r in range(first, last + 1):
+            for ids in self._ring(cx, cy, r):
+                found.append(ids if mask is None else ids[mask[ids]])
+            # pontos de anéis além de r estão a pelo menos r * cell do ponto
+            if sum(len(ids) for ids in found) >= k:
+                candidates = np.concatenate(found)
+                d = np.hypot(self.x[candidates] - x[0], self.y[candidates] - y[0])
+                if np.partition(d, k - 1)[k - 1] <= r * self.cell:
+                    break
+        if found:
+            best = np.concatenate(found)
+        if len(best):
+            dist = haversine_km(lat, lon, self.info["lat"].to_numpy()[best], self.info["lon"].to_numpy()[best])
+            order = np.lexsort((best, dist))[:k]
+            best, dist = best[order], dist[order]
+        return best, dist
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from .indexes import FilterIndex
+
+# Chaves (cols_map) que identificam um hospital e colunas somadas por hospital
+HOSPITAL_KEYS = ("municipio", "zone", "cep", "nome")
+HOSPITAL_VALUES = ("leitos_exist", "leitos_sus")
+
+
+class HospitalTable:
+    """Leitos somados por hospital (município, zona, CEP e nome).
+
+    Montada uma vez por versão dos dados, junto com:
+
+    - ``index``: índices de zona/CEP/município sobre as linhas da tabela.
+      Como zona e CEP fazem parte da chave, filtrar a tabela dá o mesmo
+      resultado que filtrar as linhas originais e agrupar de novo.
+    - ``orders``: para cada coluna e direção, a ordem das linhas e o posto
+      de cada linha nessa ordem (empates mantêm a ordem natural).
+
+    Uma página é só um recorte desses arrays: não há groupby por request.
+    ``frame`` é None quando o CSV não tem alguma das colunas da chave.
+    """
+
+    def __init__(self, df, search=None):
+        cols_map = df.attrs["cols_map"]
+        self.keys = [cols_map.get(k) for k in HOSPITAL_KEYS]
+        self.values = [cols_map.get(k) for k in HOSPITAL_VALUES]
+        self.frame = None
+        self.index = None
+        self.orders = {}
+        if not all(self.keys):
+            return
+
+        frame = df.groupby(self.keys, dropna=False, as_index=False, observed=True).agg(
+            {col: "sum" for col in self.values if col}
+        )
+        frame.attrs["cols_map"] = dict(cols_map)
+        self.frame = frame
+        self.index = FilterIndex(frame, search)
+
+        natural = np.arange(len(frame))
+        for col in frame.columns:
+            codes, _ = pd.factorize(frame[col], sort=True)
+            for desc in (False, True):
+                order = np.lexsort((natural, -codes if desc else codes))
+                rank = np.empty_like(order)
+                rank[order] = natural
+                self.orders[col, desc] = (order, rank)
+
+    def select(self, zone="", cep="", municipio="", q=""):
+        """Posições (ordem natural) das linhas que atendem aos filtros."""
+        positions = self.index.select(zone=zone, cep=cep, municipio=municipio, q=q)
+        return np.arange(len(self.frame)) if positions is None else positions
+
+    def rows(self, positions, sort=None, desc=False, start=0, stop=None):
+        """Linhas ``[start:stop]`` da seleção, na ordem pedida.
+
+        Sem filtro, a página é um recorte direto do array de ordem. Com
+        filtro, só os postos das linhas selecionadas são considerados e
+        apenas os ``stop`` primeiros são ordenados.
+        """
+        stop = len(positions) if stop is None else min(stop, len(positions))
+        if start >= stop:
+            return positions[:0]
+        if sort is None:
+            return positions[start:stop]
+
+        order, rank = self.orders[sort, desc]
+        if len(positions) == len(self.frame):
+            return order[start:stop]
+        ranks = rank[positions]
+        if stop < len(ranks):
+            ranks = np.partition(ranks, stop - 1)[:stop]
+        return order[np.sort(ranks)[start:stop]]
@@ -0,0 +1,125 @@
+import numpy as np
+
+# Maior caractere possível: limite superior da faixa de um prefixo no array ordenado
+_MAX_CHAR = chr(0x10FFFF)
+
+
+def _value_positions(series):
+    # valor em maiúsculas -> posições (ordenadas) das linhas com esse valor
+    values = series.astype("category")
+    codes = values.cat.codes.to_numpy()
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(values.cat.categories) + 1))
+    index = {}
+    for i, value in enumerate(values.cat.categories):
+        positions = order[bounds[i]:bounds[i + 1]]
+        key = str(value).upper()
+        if key in index:
+            positions = np.union1d(index[key], positions)
+        index[key] = positions
+    return index
+
+
+def intersect(a, b):
+    """Interseção de duas seleções de posições (None = sem filtro)."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+class FilterIndex:
+    """Índices de filtro de um DataFrame (DF completo ou cubo agregado).
+
+    - CEP: array ordenado dos CEPs normalizados + posições originais; um
+      prefixo vira uma faixa contígua encontrada com busca binária.
+    - Zona e município: valor em maiúsculas -> posições das linhas.
+    - Competência (COMP, inteiro AAAAMM): array ordenado + posições; um
+      intervalo de meses vira uma faixa contígua (busca binária).
+    - Busca textual (``q``): documento do ``SearchIndex`` de cada linha; as
+      linhas selecionadas são as dos documentos que casam com o texto.
+      Frames sem nome/CEP (cubos) não respondem a ``q``.
+
+    As consultas retornam posições (ordenadas) para uso com ``df.iloc``.
+    """
+
+    def __init__(self, df, search=None):
+        cols_map = df.attrs["cols_map"]
+        zone_col = cols_map.get("zone")
+        cep_col = cols_map.get("cep")
+        municipio_col = cols_map.get("municipio")
+        comp_col = cols_map.get("comp")
+        self.size = len(df)
+
+        self.cep_sorted = None
+        self.cep_order = None
+        if cep_col in df.columns:
+            ceps = df[cep_col].to_numpy(dtype=str)
+            self.cep_order = np.argsort(ceps, kind="stable")
+            self.cep_sorted = ceps[self.cep_order]
+
+        self.comp_sorted = None
+        self.comp_order = None
+        if comp_col in df.columns:
+            comps = df[comp_col].to_numpy()
+            self.comp_order = np.argsort(comps, kind="stable")
+            self.comp_sorted = comps[self.comp_order]
+
+        self.zone_positions = _value_positions(df[zone_col]) if zone_col in df.columns else None
+        self.municipio_positions = (
+            _value_positions(df[municipio_col]) if municipio_col in df.columns else None
+        )
+
+        self.search = search
+        self.row_docs = search.rows_of(df) if search is not None else None
+
+    def unique_ceps(self):
+        if self.cep_sorted is None:
+            return []
+        return np.unique(self.cep_sorted).tolist()
+
+    def cep_range(self, prefix):
+        lo = np.searchsorted(self.cep_sorted, prefix, side="left")
+        hi = np.searchsorted(self.cep_sorted, prefix + _MAX_CHAR, side="left")
+        return lo, hi
+
+    def by_cep(self, prefix):
+        lo, hi = self.cep_range(prefix)
+        return np.sort(self.cep_order[lo:hi])
+
+    def by_zone(self, zone):
+        return self.zone_positions.get(zone.upper(), np.empty(0, dtype=np.intp))
+
+    def by_municipio(self, municipio):
+        return self.municipio_positions.get(municipio.upper(), np.empty(0, dtype=np.intp))
+
+    def by_comp(self, start=None, end=None):
+        # competências em [start, end] (AAAAMM; None = sem limite)
+        lo = 0 if start is None else np.searchsorted(self.comp_sorted, start, side="left")
+        hi = len(self.comp_sorted) if end is None else np.searchsorted(self.comp_sorted, end, side="right")
+        return np.sort(self.comp_order[lo:hi])
+
+    def by_text(self, q):
+        if self.row_docs is None:
+            return np.empty(0, dtype=np.intp)
+        return np.flatnonzero(self.search.doc_mask(q)[self.row_docs])
+
+    def select(self, zone="", cep="", municipio="", comp_range=None, q=""):
+        """Posições das linhas que atendem aos filtros (None = sem filtro).
+
+        ``comp_range`` é ``(início, fim)`` em AAAAMM, limites inclusivos;
+        ``q`` é o texto da busca (nome, razão social e endereço).
+        """
+        positions = None
+        if q and q.strip():
+            positions = self.by_text(q)
+        if zone and self.zone_positions is not None:
+            positions = intersect(positions, self.by_zone(zone))
+        if municipio and self.municipio_positions is not None:
+            positions = intersect(positions, self.by_municipio(municipio))
+        if cep and self.cep_sorted is not None:
+            positions = intersect(positions, self.by_cep(cep))
+        if comp_range and any(b is not None for b in comp_range) and self.comp_sorted is not None:
+            positions = intersect(positions, self.by_comp(*comp_range))
+        return positions
@@ -0,0 +1,149 @@
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+from .aggregates import build_cubes, merge_cubes
+from .snapshot import snapshot_digest
+from .utils_notebook_loader import (
+    CSV_CANDIDATES,
+    DATA_DIR,
+    dictionary_cols,
+    file_mtime,
+    file_version,
+    load_typed,
+)
+
+
+def _combined_version(digests):
+    # versão do conjunto: hash dos (nome, hash) de cada arquivo
+    digest = hashlib.sha1()
+    for name, file_digest in sorted(digests):
+        digest.update(f"{name}:{file_digest}\n".encode())
+    return digest.hexdigest()
+
+
+def _shared_categories(frames):
+    """As partes com as mesmas categorias (união ordenada) em cada coluna codificada.
+
+    Categorias diferentes entre arquivos viram object no concat; com a mesma
+    tabela de valores, o concat só junta os códigos inteiros.
+    """
+    columns = [
+        col for col in dictionary_cols(frames[0])
+        if all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames if col in f.columns)
+    ]
+    categories = {
+        col: sorted(set().union(*(f[col].cat.categories for f in frames if col in f.columns)))
+        for col in columns
+    }
+    return [
+        f.assign(**{col: f[col].cat.set_categories(categories[col]) for col in columns if col in f.columns})
+        for f in frames
+    ]
+
+
+class MonthlyIngestor:
+    """Ingestão incremental dos CSVs mensais (JANEIRO.csv, FEVEREIRO.csv, ...).
+
+    Cada arquivo de ``data_dir`` (exceto o consolidado) é lido e tipado uma
+    única vez (ou carregado do snapshot binário, ver ``load_typed``) e
+    guardado junto com seus cubos agregados. ``refresh()`` só
+    processa arquivos novos ou alterados: compara mtime/tamanho e, se
+    mudaram, o hash do conteúdo. O DF completo e os cubos finais são
+    recompostos a partir dessas partes, sem reler os demais arquivos.
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = Path(data_dir)
+        self.parts = {}
+
+    def discover(self):
+        consolidated = {p.name.lower() for p in CSV_CANDIDATES}
+        return sorted(p for p in self.data_dir.glob("*.csv") if p.name.lower() not in consolidated)
+
+    def refresh(self):
+        """Processa arquivos novos/alterados/removidos e retorna seus nomes.
+
+        As partes só são trocadas quando todos os arquivos foram lidos com
+        sucesso; se algum falhar, o estado anterior é mantido.
+        """
+        parts = dict(self.parts)
+        changed = []
+        found = set()
+        for path in self.discover():
+            found.add(path.name)
+            stat = path.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            part = parts.get(path.name)
+            if part and part["signature"] == signature:
+                continue
+
+            if part and part["digest"] == file_version(path):
+                parts[path.name] = {**part, "signature": signature}
+                continue
+
+            df, digest = load_typed(path)
+            parts[path.name] = {
+                "signature": signature,
+                "digest": digest,
+                "mtime": file_mtime(path),
+                "df": df,
+                "cubes": build_cubes(df),
+            }
+            changed.append(path.name)
+
+        for name in set(parts) - found:
+            del parts[name]
+            changed.append(name)
+
+        self.parts = parts
+        return changed
+
+    def _ordered(self):
+        # ordem cronológica (menor COMP de cada arquivo), como o consolidado do notebook
+        def first_comp(item):
+            name, part = item
+            comp_col = part["df"].attrs["cols_map"].get("comp")
+            df = part["df"]
+            return (int(df[comp_col].min()) if comp_col and len(df) else 0, name)
+
+        return [part for _, part in sorted(self.parts.items(), key=first_comp)]
+
+    def version(self):
+        return _combined_version((name, part["digest"]) for name, part in self.parts.items())
+
+    def peek_version(self):
+        """Versão que ``refresh()`` produziria, sem parsear nenhum CSV.
+
+        Usa o hash já conhecido (parte carregada ou snapshot válido) e só lê
+        o conteúdo de arquivos que mudaram desde então.
+        """
+        digests = []
+        for path in self.discover():
+            stat = path.stat()
+            part = self.parts.get(path.name)
+            if part and part["signature"] == (stat.st_mtime_ns, stat.st_size):
+                digests.append((path.name, part["digest"]))
+            else:
+                digests.append((path.name, snapshot_digest(path) or file_version(path)))
+        return _combined_version(digests)
+
+    def dataframe(self):
+        parts = self._ordered()
+        if not parts:
+            raise FileNotFoundError(f"Nenhum CSV mensal encontrado em {self.data_dir}")
+
+        df = pd.concat(_shared_categories([p["df"] for p in parts]), ignore_index=True)
+        cols_map = dict(parts[0]["df"].attrs["cols_map"])
+
+        df.attrs = {
+            "cols_map": cols_map,
+            "quality": [report for p in parts for report in p["df"].attrs.get("quality", [])],
+            "version": self.version(),
+            "last_modified": max(p["mtime"] for p in parts),
+        }
+        return df
+
+    def cubes(self):
+        return merge_cubes([p["cubes"] for p in self._ordered()])
@@ -0,0 +1,253 @@
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import pandas as pd
+
+# Instrumentação das requests, sem dependência de Django: as consultas
+# marcam etapas (``stage``) e linhas lidas/retornadas (``count_rows``) na
+# request em andamento; o middleware (leitos/middleware.py) abre o registro,
+# devolve as etapas no cabeçalho Server-Timing e acumula tudo em
+# ``METRICS``, exposto em /metrics no formato do Prometheus. Fora de uma
+# request instrumentada (ex.: API FastAPI, testes) as marcações não fazem nada.
+
+_current = ContextVar("leitos_request_timing", default=None)
+
+
+class RequestTiming:
+    """Tempos por etapa e contagem de linhas de uma request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.rows_scanned = 0
+        self.rows_returned = 0
+        self.cache_hit = False
+        self._stack = []
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+
+@contextmanager
+def request_timing():
+    """Abre o registro da request atual (usado pelo middleware)."""
+    record = RequestTiming()
+    token = _current.set(record)
+    try:
+        yield record
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Mede uma etapa da request atual.
+
+    Os tempos são exclusivos: enquanto uma etapa interna roda, a externa
+    fica pausada (a tabela chama o filtro, mas o tempo do filtro conta só
+    em ``filter``), então a soma das etapas nunca passa do total.
+    """
+    record = _current.get()
+    if record is None:
+        yield
+        return
+    now = time.perf_counter()
+    if record._stack:
+        parent = record._stack[-1]
+        record.add(parent[0], now - parent[1])
+    record._stack.append([name, now])
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        name, start = record._stack.pop()
+        record.add(name, now - start)
+        if record._stack:
+            record._stack[-1][1] = now
+
+
+def timed_stage(name):
+    """Decorator: a função inteira conta como a etapa ``name``."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_rows(scanned=0, returned=0):
+    record = _current.get()
+    if record is not None:
+        record.rows_scanned += scanned
+        record.rows_returned += returned
+
+
+def count_returned(out):
+    """Soma como retornadas as linhas dos DataFrames do resultado de uma consulta."""
+    if isinstance(out, pd.DataFrame):
+        count_rows(returned=len(out))
+    elif isinstance(out, dict):
+        for value in out.values():
+            count_returned(value)
+
+
+def mark_cache_hit():
+    record = _current.get()
+    if record is not None:
+        record.cache_hit = True
+
+
+def server_timing(record, total):
+    """Valor do cabeçalho Server-Timing: etapas, total e linhas lidas/retornadas."""
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in record.stages.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    if record.cache_hit:
+        parts.append('cache;desc="hit"')
+    parts.append(f'rows;desc="{record.rows_scanned} lidas/{record.rows_returned} retornadas"')
+    return ", ".join(parts)
+
+
+# Limites (segundos) do histograma de duração das requests
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class Metrics:
+    """Métricas acumuladas por endpoint (thread-safe), por processo.
+
+    Com vários workers, cada processo expõe as suas; o Prometheus soma as
+    séries de todos os alvos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = Counter()        # (endpoint, status)
+            self.buckets = Counter()         # (endpoint, limite)
+            self.duration_sum = Counter()    # endpoint
+            self.duration_count = Counter()  # endpoint
+            self.stage_seconds = Counter()   # (endpoint, etapa)
+            self.rows_scanned = Counter()    # endpoint
+            self.rows_returned = Counter()   # endpoint
+            self.cache_hits = Counter()      # endpoint
+
+    def observe(self, endpoint, status, duration, record):
+        with self._lock:
+            self.requests[endpoint, status] += 1
+            for bound in DURATION_BUCKETS:
+                if duration <= bound:
+                    self.buckets[endpoint, bound] += 1
+            self.duration_sum[endpoint] += duration
+            self.duration_count[endpoint] += 1
+            for name, seconds in record.stages.items():
+                self.stage_seconds[endpoint, name] += seconds
+            self.rows_scanned[endpoint] += record.rows_scanned
+            self.rows_returned[endpoint] += record.rows_returned
+            if record.cache_hit:
+                self.cache_hits[endpoint] += 1
+
+    def render(self):
+        """Métricas no formato texto do Prometheus (versão 0.0.4)."""
+        with self._lock:
+            lines = [
+                "# HELP leitos_requests_total Requests atendidas por endpoint e status.",
+                "# TYPE leitos_requests_total counter",
+            ]
+            for (endpoint, status), n in sorted(self.requests.items()):
+                lines.append(f"leitos_requests_total{_labels(endpoint=endpoint, status=status)} {n}")
+
+            lines += [
+                "# HELP leitos_request_duration_seconds Duração das requests por endpoint.",
+                "# TYPE leitos_request_duration_seconds histogram",
+            ]
+            for endpoint in sorted(self.duration_count):
+                for bound in DURATION_BUCKETS:
+                    n = self.buckets[endpoint, bound]
+                    lines.append(f"leitos_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=bound)} {n}")
+                count = self.duration_count[endpoint]
+                lines.append(f"leitos_request_duration_seconds_bucket{_labels(endpoint=endpoint, le='+Inf')} {count}")
+                lines.append(f"leitos_request_duration_seconds_sum{_labels(endpoint=endpoint)} {self.duration_sum[endpoint]:.6f}")
+                lines.append(f"leitos_request_duration_seconds_count{_labels(endpoint=endpoint)} {count}")
+
+            lines += [
+                "# HELP leitos_stage_seconds_total Tempo acumulado em cada etapa (filtro, agregação, serialização...).",
+                "# TYPE leitos_stage_seconds_total counter",
+            ]
+            for (endpoint, name), seconds in sorted(self.stage_seconds.items()):
+                lines.append(f"leitos_stage_seconds_total{_labels(endpoint=endpoint, stage=name)} {seconds:.6f}")
+
+            for metric, help_text, counter in (
+                ("leitos_rows_scanned_total", "Linhas lidas pelas consultas.", self.rows_scanned),
+                ("leitos_rows_returned_total", "Linhas retornadas nas respostas.", self.rows_returned),
+                ("leitos_cache_hits_total", "Respostas servidas pelo cache.", self.cache_hits),
+            ):
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                for endpoint, n in sorted(counter.items()):
+                    lines.append(f"{metric}{_labels(endpoint=endpoint)} {n}")
+            return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+class SamplingProfiler:
+    """Profiler por amostragem da thread que o criou.
+
+    Uma thread auxiliar lê a pilha da thread alvo a cada ``interval``
+    segundos (``sys._current_frames``) e conta as pilhas vistas. O código
+    medido roda sem ganchos de tracing, então o custo fica na thread
+    auxiliar. As pilhas começam na função que abriu o ``with`` (frames
+    acima dela, como o servidor, ficam de fora). ``collapsed()`` devolve as pilhas no formato usado por
+    flamegraph.pl/speedscope (``a;b;c <amostras>``).
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.samples = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = None
+        self._root = None
+
+    def __enter__(self):
+        self._root = sys._getframe(1)
+        self._thread = threading.Thread(target=self._run, name="leitos-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = None if frame is self._root else frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {n}" for stack, n in self.samples.most_common()) + "\n"
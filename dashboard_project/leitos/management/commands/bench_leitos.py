@@ -0,0 +1,111 @@
+import json
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+from leitos import views
+from leitos.benchmarks import endpoint_urls, peak_memory, summarize, synthetic_dataset_csv, timed
+from leitos.cache import RESPONSE_CACHE
+from leitos.dataset import Dataset
+from leitos.snapshot import snapshot_dir
+from leitos.utils_notebook_loader import load_df
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a carga dos dados (load_df) e cada API de leitos com dados sintéticos "
+        "no formato do Consolidado_SP.csv em várias escalas (p50/p99 e pico de memória)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scales", default="1,10,100",
+                            help="Multiplicadores do tamanho do consolidado (padrão: 1,10,100)")
+        parser.add_argument("--repeat", type=int, default=20, help="Execuções medidas por API")
+        parser.add_argument("--load-repeat", type=int, default=3, help="Execuções medidas da carga")
+        parser.add_argument("--source", help="CSV base (padrão: o consolidado de leitos/data/)")
+        parser.add_argument("--cached", action="store_true",
+                            help="Mede com o cache de respostas ativo (padrão: cache limpo a cada request)")
+        parser.add_argument("--keep", metavar="DIR", help="Mantém os CSVs sintéticos em DIR")
+        parser.add_argument("--json", dest="json_path", metavar="ARQUIVO",
+                            help="Grava os resultados em JSON (para comparar execuções)")
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(s) for s in options["scales"].split(",") if s.strip()]
+        except ValueError:
+            raise CommandError("--scales deve ser uma lista de inteiros, ex.: 1,10,100")
+
+        # As views passam a servir o dataset sintético; a recarga em segundo
+        # plano fica parada para não trocá-lo durante as medições
+        setup_test_environment()
+        views.WATCHER.stop()
+        previous = views.WATCHER.data
+
+        results = []
+        directory = options["keep"] or tempfile.mkdtemp(prefix="bench_leitos_")
+        try:
+            for scale in scales:
+                csv_path = synthetic_dataset_csv(directory, scale, options["source"])
+                self.stdout.write(f"Escala {scale}x: {csv_path}")
+                results += self._bench_load(scale, csv_path, options["load_repeat"])
+                data = Dataset(load_df(csv_path))
+                views.WATCHER.data = data
+                results += self._bench_views(scale, data, options["repeat"], options["cached"])
+        finally:
+            views.WATCHER.data = previous
+            RESPONSE_CACHE.clear()
+            if not options["keep"]:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        self._report(results)
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+
+    def _measure(self, scale, stage, func, repeat, warmup=1, **extra):
+        samples = timed(func, repeat, warmup)
+        return {"scale": scale, "stage": stage, **extra, **summarize(samples), "peak_mb": round(peak_memory(func) / 2**20, 2)}
+
+    def _bench_load(self, scale, csv_path, repeat):
+        def cold():
+            # sem snapshot: leitura e tipagem do CSV (e gravação do snapshot)
+            shutil.rmtree(snapshot_dir(csv_path), ignore_errors=True)
+            return load_df(csv_path)
+
+        def warm():
+            return load_df(csv_path)
+
+        df = cold()
+        return [
+            self._measure(scale, "load_df (csv)", cold, repeat, warmup=0, rows=len(df)),
+            self._measure(scale, "load_df (snapshot)", warm, repeat, rows=len(df)),
+            self._measure(scale, "Dataset (cubos/índices)", lambda: Dataset(df), repeat, warmup=0, rows=len(df)),
+        ]
+
+    def _bench_views(self, scale, data, repeat, cached):
+        client = Client()
+        results = []
+        for name, url in endpoint_urls(data):
+            def fetch(url=url):
+                if not cached:
+                    RESPONSE_CACHE.clear()
+                response = client.get(url)
+                body = b"".join(response.streaming_content) if response.streaming else response.content
+                return response.status_code, len(body)
+
+            status, size = fetch()
+            if status != 200:
+                self.stderr.write(f"  {url}: status {status}")
+            results.append(self._measure(scale, name, fetch, repeat, url=url, status=status, bytes=size))
+        return results
+
+    def _report(self, results):
+        self.stdout.write("")
+        self.stdout.write(f"{'escala':>6}  {'etapa':<28} {'p50 ms':>10} {'p99 ms':>10} {'pico MB':>9}")
+        for r in results:
+            self.stdout.write(
+                f"{r['scale']:>5}x  {r['stage']:<28} {r['p50']:>10.2f} {r['p99']:>10.2f} {r['peak_mb']:>9.2f}"
+            )
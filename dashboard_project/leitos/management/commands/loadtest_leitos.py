@@ -0,0 +1,155 @@
+import json
+import shutil
+import tempfile
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+from leitos import views
+from leitos.benchmarks import dashboard_mix, summarize, synthetic_dataset_csv
+from leitos.dataset import Dataset
+from leitos.utils_notebook_loader import load_df
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga concorrente com o mix de requests do dashboard (carga inicial, filtros, "
+        "paginação, ordenação e export), no processo ou contra um servidor em --url."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Servidor já em execução (ex.: http://127.0.0.1:8000); "
+                                          "sem ele, as requests passam pelo cliente de teste do Django")
+        parser.add_argument("--concurrency", type=int, default=8, help="Clientes simultâneos")
+        parser.add_argument("--requests", type=int, default=500, help="Total de requests")
+        parser.add_argument("--duration", type=float, default=0,
+                            help="Duração máxima em segundos (0 = até completar --requests)")
+        parser.add_argument("--scale", type=int, default=0,
+                            help="Sem --url: serve dados sintéticos com N vezes o consolidado "
+                                 "(padrão: os dados atuais de leitos/data/)")
+        parser.add_argument("--seed", type=int, default=0, help="Semente do sorteio das requests")
+        parser.add_argument("--json", dest="json_path", metavar="ARQUIVO", help="Grava os resultados em JSON")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1 or options["requests"] < 1:
+            raise CommandError("--concurrency e --requests devem ser positivos")
+        if options["url"] and options["scale"]:
+            raise CommandError("--scale só vale sem --url (dados servidos por este processo)")
+
+        directory = None
+        previous = views._current_data()
+        try:
+            if options["scale"]:
+                views.WATCHER.stop()
+                directory = tempfile.mkdtemp(prefix="loadtest_leitos_")
+                views.WATCHER.data = Dataset(load_df(synthetic_dataset_csv(directory, options["scale"])))
+            data = views.WATCHER.data
+            if data is None:
+                raise CommandError(f"Dados não carregados: {views.WATCHER.error}")
+
+            # O mix é sorteado a partir dos dados locais (zonas, CEPs, páginas);
+            # com --url, espera-se que o servidor tenha os mesmos dados
+            if options["url"]:
+                fetch = self._remote_fetch(options["url"].rstrip("/"))
+            else:
+                setup_test_environment()
+                fetch = self._local_fetch()
+            samples, elapsed = self._run(fetch, dashboard_mix(data, options["seed"]), options)
+        finally:
+            views.WATCHER.data = previous
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        results = self._summary(samples, elapsed, options["concurrency"])
+        self._report(results)
+        if options["json_path"]:
+            with open(options["json_path"], "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+
+    def _local_fetch(self):
+        local = threading.local()
+
+        def fetch(url):
+            # um cliente por thread
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = Client()
+            response = client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            return response.status_code
+        return fetch
+
+    def _remote_fetch(self, base):
+        def fetch(url):
+            try:
+                with urlopen(base + url, timeout=60) as response:
+                    response.read()
+                    return response.status
+            except HTTPError as e:
+                return e.code
+        return fetch
+
+    def _run(self, fetch, mix, options):
+        lock = threading.Lock()
+        samples = []
+        remaining = [options["requests"]]
+        deadline = time.perf_counter() + options["duration"] if options["duration"] else None
+
+        def worker():
+            while True:
+                with lock:
+                    if remaining[0] <= 0 or (deadline and time.perf_counter() >= deadline):
+                        return
+                    remaining[0] -= 1
+                    kind, url = next(mix)
+                start = time.perf_counter()
+                try:
+                    status = fetch(url)
+                except Exception:
+                    status = 0
+                ms = (time.perf_counter() - start) * 1000
+                with lock:
+                    samples.append((kind, ms, status))
+
+        threads = [threading.Thread(target=worker) for _ in range(options["concurrency"])]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return samples, time.perf_counter() - start
+
+    def _summary(self, samples, elapsed, concurrency):
+        kinds = {}
+        for kind, ms, status in samples:
+            kinds.setdefault(kind, []).append((ms, status))
+        return {
+            "concurrency": concurrency,
+            "requests": len(samples),
+            "seconds": round(elapsed, 3),
+            "throughput": round(len(samples) / elapsed, 2) if elapsed else None,
+            "errors": sum(1 for _, _, status in samples if status != 200),
+            "total": summarize([ms for _, ms, _ in samples]),
+            "kinds": {
+                kind: {**summarize([ms for ms, _ in values]),
+                       "errors": sum(1 for _, status in values if status != 200)}
+                for kind, values in sorted(kinds.items())
+            },
+        }
+
+    def _report(self, results):
+        self.stdout.write(
+            f"{results['requests']} requests em {results['seconds']:.2f} s com {results['concurrency']} clientes: "
+            f"{results['throughput']} req/s, {results['errors']} erros"
+        )
+        self.stdout.write(f"{'tipo':<16} {'n':>6} {'p50 ms':>10} {'p99 ms':>10} {'erros':>6}")
+        for kind, r in [*results["kinds"].items(), ("total", {**results["total"], "errors": results["errors"]})]:
+            if not r["n"]:
+                continue
+            self.stdout.write(f"{kind:<16} {r['n']:>6} {r['p50']:>10.2f} {r['p99']:>10.2f} {r['errors']:>6}")
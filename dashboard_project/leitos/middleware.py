@@ -0,0 +1,77 @@
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .instrumentation import METRICS, SamplingProfiler, request_timing, server_timing
+
+
+class TimingMiddleware:
+    """Mede cada request: etapas (Server-Timing) e métricas por endpoint.
+
+    As consultas marcam as etapas via leitos/instrumentation.py; aqui o
+    registro da request é aberto, o cabeçalho ``Server-Timing`` é montado e
+    as métricas vão para ``METRICS`` (expostas em /metrics). O endpoint é o
+    nome da rota do Django, então a cardinalidade das séries fica fixa.
+
+    Respostas em streaming são geradas depois que a view retorna: o tempo
+    de envio entra como etapa ``stream`` nas métricas (o cabeçalho já saiu).
+
+    Com ``LEITOS_PROFILING`` ativo, ``?profile=1`` troca o corpo da resposta
+    pelas pilhas amostradas durante a request (formato collapsed).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profiler = None
+        if getattr(settings, "LEITOS_PROFILING", False) and request.GET.get("profile") == "1":
+            profiler = SamplingProfiler(getattr(settings, "LEITOS_PROFILING_INTERVAL", 0.001))
+
+        with request_timing() as record:
+            if profiler is None:
+                response = self.get_response(request)
+            else:
+                with profiler:
+                    response = self.get_response(request)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+
+        endpoint = _endpoint(request)
+        header = server_timing(record, record.elapsed())
+        if profiler is not None:
+            METRICS.observe(endpoint, response.status_code, record.elapsed(), record)
+            response = HttpResponse(profiler.collapsed(), content_type="text/plain; charset=utf-8")
+        elif response.streaming:
+            response.streaming_content = _observe_stream(
+                response.streaming_content, endpoint, response.status_code, record
+            )
+        else:
+            METRICS.observe(endpoint, response.status_code, record.elapsed(), record)
+        response["Server-Timing"] = header
+        return response
+
+
+def _endpoint(request):
+    match = getattr(request, "resolver_match", None)
+    return match.url_name or match.view_name if match else "unmatched"
+
+
+def _observe_stream(chunks, endpoint, status, record):
+    # mede o tempo gasto gerando os blocos e registra as métricas no fim do envio
+    generating = 0.0
+    try:
+        iterator = iter(chunks)
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                generating += time.perf_counter() - start
+            yield chunk
+    finally:
+        record.add("stream", generating)
+        METRICS.observe(endpoint, status, record.elapsed(), record)
@@ -0,0 +1,50 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Períodos da série temporal. COMP é um inteiro AAAAMM desde a carga
+# (ver parse_comp); trimestre e ano são derivados dele com aritmética inteira.
+PERIODS = ("month", "quarter", "year")
+
+_BOUND = re.compile(r"^(\d{4})(?:[-/]?(\d{2}))?$")
+
+
+def parse_bound(value, end=False):
+    """Limite ``from``/``to`` como AAAAMM (None se vazio).
+
+    Aceita AAAA-MM, AAAAMM ou só AAAA: o ano inteiro começa em janeiro
+    (``from``) e termina em dezembro (``to``, com ``end=True``).
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    match = _BOUND.match(value)
+    if not match:
+        raise ValueError(f"Período inválido: {value} (use AAAA-MM ou AAAA)")
+    year, month = int(match.group(1)), match.group(2)
+    if month is None:
+        return year * 100 + (12 if end else 1)
+    if not 1 <= int(month) <= 12:
+        raise ValueError(f"Mês inválido: {value}")
+    return year * 100 + int(month)
+
+
+def period_key(comp, period):
+    """Chave inteira do período de cada COMP: AAAAMM, AAAAT (trimestre) ou AAAA."""
+    comp = np.asarray(comp)
+    if period == "quarter":
+        return (comp // 100) * 10 + (comp % 100 - 1) // 3 + 1
+    if period == "year":
+        return comp // 100
+    return comp
+
+
+def period_label(keys, period):
+    """Rótulos dos períodos: 2023-01, 2023-T1 ou 2023."""
+    keys = pd.Series(np.asarray(keys))
+    if period == "quarter":
+        return (keys // 10).astype(str) + "-T" + (keys % 10).astype(str)
+    if period == "year":
+        return keys.astype(str)
+    return (keys // 100).astype(str) + "-" + (keys % 100).astype(str).str.zfill(2)
@@ -0,0 +1,485 @@
+import math
+
+import numpy as np
+
+from .aggregates import pick_cube, sum_by
+from .analytics import CEP_PREFIXES, WINDOWS
+from .indexes import intersect
+from .instrumentation import count_rows, stage, timed_stage
+from .periods import PERIODS, parse_bound, period_key, period_label
+
+# Consultas do dashboard sobre um Dataset, sem dependência de Django: usadas
+# pelas views e pela API FastAPI (leitos/data/main.py). Recebem os filtros
+# já extraídos da request e retornam DataFrames (ou dicts com DataFrames),
+# convertidos em JSON por leitos/serializers.py.
+
+
+class QueryError(ValueError):
+    """Consulta inválida para os dados carregados (vira resposta 400)."""
+
+    status = 400
+
+
+class NotFound(QueryError):
+    """Registro pedido não existe nos dados carregados (vira resposta 404)."""
+
+    status = 404
+
+
+class Unavailable(QueryError):
+    """Consulta depende de um recurso opcional ausente (vira resposta 503)."""
+
+    status = 503
+
+
+def apply_filters(data, df, zone="", cep="", municipio="", comp_range=None, q=""):
+    # Os filtros usam os índices pré-construídos e retornam uma seleção do DF
+    # tipado, sem varrer as colunas; quem chama não altera o resultado
+    with stage("filter"):
+        positions = data.index_for(df).select(
+            zone=zone, cep=cep, municipio=municipio, comp_range=comp_range, q=q
+        )
+        df = df if positions is None else df.iloc[positions]
+    count_rows(scanned=len(df))
+    return df
+
+
+def chart_source(data, cep="", q=""):
+    # Menor cubo agregado que cobre o filtro de CEP, senão as linhas do DF
+    # (a busca textual precisa das linhas: os cubos não têm os estabelecimentos)
+    if q:
+        return data.df
+    cube = pick_cube(data.cubes, cep)
+    return cube if cube is not None else data.df
+
+
+def _chart_frame(data, zone, cep, comp_range=None, q=""):
+    if not data.col("zone"):
+        raise QueryError("Coluna região não encontrada")
+    return apply_filters(data, chart_source(data, cep, q), zone=zone, cep=cep, comp_range=comp_range, q=q)
+
+
+def _time_range(period, date_from, date_to):
+    # valida período e limites from/to da série temporal
+    if period not in PERIODS:
+        raise QueryError(f"period deve ser um de: {', '.join(PERIODS)}")
+    try:
+        comp_range = (parse_bound(date_from), parse_bound(date_to, end=True))
+    except ValueError as e:
+        raise QueryError(str(e))
+    return comp_range if any(b is not None for b in comp_range) else None
+
+
+@timed_stage("groupby")
+def _zona_leitos(data, df):
+    return sum_by(df, data.col("zone"), {
+        "leitos_exist": data.col("leitos_exist"),
+        "leitos_sus": data.col("leitos_sus"),
+    })
+
+
+@timed_stage("groupby")
+def _zona_especialidades(data, df):
+    return sum_by(df, data.col("zone"), {
+        "leitos_uti_adulto_sus": data.col("leitos_uti_adulto_sus"),
+        "leitos_uti_coronariana_sus": data.col("leitos_uti_coronariana_sus"),
+        "leitos_uti_neonatal_sus": data.col("leitos_uti_neonatal_sus"),
+        "leitos_uti_pediatrico_sus": data.col("leitos_uti_pediatrico_sus"),
+        "leitos_uti_queimado_sus": data.col("leitos_uti_queimado_sus"),
+    })
+
+
+@timed_stage("groupby")
+def _evolucao_leitos(data, df, period="month"):
+    comp_col = data.col("comp") or "COMP"
+    zone_col = data.col("zone")
+    leitos_exist_col = data.col("leitos_exist")
+    leitos_sus_col = data.col("leitos_sus")
+
+    # COMP já vem como inteiro AAAAMM do loader (0 = competência inválida)
+    df = df[df[comp_col] > 0]
+
+    # Agrupa por região e mês
+    grouped = df.groupby([zone_col, comp_col], as_index=False, observed=True).agg({
+        leitos_exist_col: "sum",
+        leitos_sus_col: "sum"
+    })
+
+    # Trimestre/ano: média dos totais mensais (leitos são estoque, não fluxo)
+    if period != "month":
+        grouped[comp_col] = period_key(grouped[comp_col], period)
+        grouped = grouped.groupby([zone_col, comp_col], as_index=False, observed=True).mean().round(2)
+
+    # Formata o período (2023-01, 2023-T1 ou 2023) apenas nas linhas agregadas
+    grouped[comp_col] = period_label(grouped[comp_col], period).to_numpy()
+
+    grouped = grouped.rename(columns={
+        zone_col: "zone",
+        comp_col: "comp",
+        leitos_exist_col: "leitos_exist",
+        leitos_sus_col: "leitos_sus"
+    })
+    return grouped
+
+
+def _check_taxa_cols(data):
+    if not data.col("zone") or not data.col("leitos_exist") or not data.col("leitos_sus"):
+        raise QueryError("Colunas obrigatórias ausentes")
+
+
+@timed_stage("groupby")
+def _taxa_ocupacao_sus(data, df):
+    zone_col = data.col("zone")
+    leitos_exist_col = data.col("leitos_exist")
+    leitos_sus_col = data.col("leitos_sus")
+
+    # Agrupar por zona
+    grouped = (
+        df.groupby(zone_col, as_index=False, observed=True)
+        .agg({leitos_exist_col: "sum", leitos_sus_col: "sum"})
+    )
+
+    # Calcular taxa
+    # Fórmula: (Leitos SUS / Leitos Existentes) * 100 (0 sem leitos existentes)
+    exist = grouped[leitos_exist_col].to_numpy(dtype=float)
+    sus = grouped[leitos_sus_col].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grouped["taxa_ocupacao_sus"] = np.where(exist > 0, np.round(sus / exist * 100, 2), 0.0)
+
+    grouped = grouped.rename(columns={zone_col: "zone"})
+    return grouped.sort_values("zone")
+
+
+def zona_leitos(data, zone="", cep="", q=""):
+    return _zona_leitos(data, _chart_frame(data, zone, cep, q=q))
+
+
+def zona_especialidades(data, zone="", cep="", q=""):
+    return _zona_especialidades(data, _chart_frame(data, zone, cep, q=q))
+
+
+def evolucao_leitos(data, zone="", cep="", period="month", date_from="", date_to="", q=""):
+    comp_range = _time_range(period, date_from, date_to)
+    return _evolucao_leitos(data, _chart_frame(data, zone, cep, comp_range, q), period)
+
+
+def taxa_ocupacao_sus(data, zone="", cep="", q=""):
+    _check_taxa_cols(data)
+    df = apply_filters(data, chart_source(data, cep, q), zone=zone, cep=cep, q=q)
+    return _taxa_ocupacao_sus(data, df)
+
+
+# Colunas da tabela de hospitais: chave do cols_map -> nome na resposta
+TABLE_COLUMNS = {
+    "municipio": "Município",
+    "zone": "Zona",
+    "cep": "CEP",
+    "nome": "Hospital",
+    "leitos_exist": "Leitos Existentes",
+    "leitos_sus": "Leitos SUS",
+}
+
+
+def _sort_column(data, sort):
+    # aceita a chave (ex.: leitos_sus) ou o nome exibido (ex.: Leitos SUS)
+    if not sort:
+        return None
+    for key, label in TABLE_COLUMNS.items():
+        if sort in (key, label) and data.col(key) in data.hospitals.frame.columns:
+            return data.col(key)
+    raise QueryError(f"Coluna de ordenação inexistente: {sort}")
+
+
+def hospitais(data, zone="", cep="", sort="", order="asc", start=0, stop=None, q=""):
+    """Linhas da tabela de hospitais (leitos somados por município, zona,
+    CEP e nome), com os nomes de coluna originais do CSV; base da tabela e
+    do export. Retorna ``(linhas, total de hospitais selecionados)``."""
+    table = data.hospitals
+    if table.frame is None:
+        raise QueryError("Colunas obrigatórias ausentes no CSV.")
+    if order not in ("asc", "desc"):
+        raise QueryError("order deve ser asc ou desc")
+
+    with stage("filter"):
+        positions = table.select(zone=zone, cep=cep, q=q)
+    count_rows(scanned=len(positions))
+    with stage("table"):
+        rows = table.rows(positions, _sort_column(data, sort), order == "desc", start, stop)
+        return table.frame.iloc[rows], len(positions)
+
+
+def estabelecimentos_page(data, page=1, page_size=25, zone="", cep="", sort="", order="asc", q=""):
+    page = max(page, 1)
+    page_size = max(page_size, 1)
+    start, end = (page - 1) * page_size, (page * page_size)
+
+    page_df, total = hospitais(data, zone=zone, cep=cep, sort=sort, order=order, start=start, stop=end, q=q)
+    page_df = page_df.rename(columns={data.col(key): label for key, label in TABLE_COLUMNS.items()})
+
+    return {
+        "results": page_df,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": math.ceil(total / page_size),
+    }
+
+
+def dashboard(data, zone="", cep="", page=1, page_size=25, sort="", order="asc",
+              period="month", date_from="", date_to="", with_filters=False, q=""):
+    """Todos os gráficos e a página da tabela numa única resposta.
+
+    O filtro é aplicado uma vez sobre a origem dos gráficos (cubo ou DF) e
+    todos os gráficos são calculados a partir dessa mesma seleção; a tabela
+    usa sua própria seleção das linhas do DF. Com ``with_filters`` inclui
+    também as opções dos filtros (carga inicial da página). ``period`` e
+    ``date_from``/``date_to`` valem só para a série temporal; ``q`` (busca
+    textual) vale para todos.
+    """
+    _check_taxa_cols(data)
+    comp_range = _time_range(period, date_from, date_to)
+    df = _chart_frame(data, zone, cep, q=q)
+    df_time = df if comp_range is None else _chart_frame(data, zone, cep, comp_range, q)
+    out = {
+        "zona_leitos": _zona_leitos(data, df),
+        "zona_especialidades": _zona_especialidades(data, df),
+        "evolucao_leitos": _evolucao_leitos(data, df_time, period),
+        "taxa_ocupacao_sus": _taxa_ocupacao_sus(data, df),
+        "estabelecimentos": estabelecimentos_page(
+            data, page, page_size, zone=zone, cep=cep, sort=sort, order=order, q=q
+        ),
+    }
+    if with_filters:
+        out["filters"] = filter_options(data)
+    return out
+
+
+# Máximo de hospitais no ranking de variações
+MAX_RANKING = 500
+
+
+def _series_metric(data, metric):
+    # aceita a chave do cols_map (ex.: leitos_sus) ou o nome da coluna (ex.: UTI_TOTAL_EXIST)
+    col = data.col(metric) or metric
+    if col not in data.series.metrics:
+        raise QueryError(f"Métrica inexistente: {metric}")
+    return col
+
+
+def hospital_history(data, hospital_id):
+    """Dados do hospital e sua série mensal com variações (O(meses))."""
+    with stage("series"):
+        found = data.series.history(hospital_id)
+    if found is None:
+        raise NotFound(f"Hospital não encontrado: {hospital_id}")
+    info, series = found
+    return {**info, "series": series}
+
+
+def largest_changes(data, comp="", metric="leitos_exist", limit=20, direction="abs"):
+    """Hospitais com as maiores variações de leitos num mês (padrão: o último)."""
+    series = data.series
+    if not series.ids:
+        raise QueryError("Colunas obrigatórias ausentes no CSV.")
+    if direction not in ("abs", "up", "down"):
+        raise QueryError("direction deve ser abs, up ou down")
+    col = _series_metric(data, metric)
+    try:
+        month = parse_bound(comp) if comp else series.latest_comp()
+    except ValueError as e:
+        raise QueryError(str(e))
+    limit = min(max(limit, 1), MAX_RANKING)
+    with stage("series"):
+        results = series.largest_changes(month, col, limit, direction)
+    return {
+        "comp": period_label([month], "month")[0],
+        "metric": col,
+        "results": results,
+    }
+
+
+# Máximo de estabelecimentos por resposta da busca
+MAX_SEARCH = 100
+
+
+def search(data, q="", limit=20):
+    """Estabelecimentos que casam com ``q`` (nome, razão social, logradouro e
+    bairro, sem acentos; cada palavra vale também como prefixo e palavras
+    inexistentes buscam termos parecidos), do mais ao menos relevante."""
+    if not data.search:
+        raise QueryError("Colunas obrigatórias ausentes no CSV.")
+    if not q.strip():
+        raise QueryError("Parâmetro q é obrigatório")
+    limit = min(max(limit, 1), MAX_SEARCH)
+    with stage("search"):
+        results, total = data.search.search(q, limit)
+    return {"q": q, "total": total, "results": results}
+
+
+# Máximo de hospitais por consulta de proximidade
+MAX_PROXIMOS = 100
+
+
+def proximos(data, cep="", lat=None, lon=None, k=10, min_sus=1, min_uti=0):
+    """Os ``k`` hospitais mais próximos de um CEP ou de ``lat``/``lon``.
+
+    Só entram hospitais ativos no último mês com pelo menos ``min_sus``
+    leitos SUS e ``min_uti`` leitos de UTI SUS. As coordenadas vêm da
+    tabela local de centroides de CEP (ver leitos/geo.py).
+    """
+    geo = data.geo
+    if not geo:
+        raise Unavailable("Coordenadas de CEP indisponíveis (tabela local de centroides ausente)")
+    if cep:
+        coords = geo.centroids.lookup(cep)
+        if coords is None:
+            raise NotFound(f"CEP sem coordenadas: {cep}")
+        lat, lon = coords
+    elif lat is None or lon is None:
+        raise QueryError("Informe cep ou lat e lon")
+    elif not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise QueryError("lat/lon fora do intervalo válido")
+
+    mask = None
+    for key, minimum in (("leitos_sus", min_sus), ("leitos_uti_total_sus", min_uti)):
+        col = data.col(key)
+        if minimum > 0 and col in geo.info.columns:
+            keep = geo.info[col].to_numpy() >= minimum
+            mask = keep if mask is None else mask & keep
+
+    k = min(max(k, 1), MAX_PROXIMOS)
+    with stage("geo"):
+        positions, dist = geo.nearest(lat, lon, k, mask)
+    results = geo.info.iloc[positions].reset_index(drop=True)
+    results["distancia_km"] = np.round(dist, 3)
+    return {"origem": {"cep": cep, "lat": lat, "lon": lon}, "results": results}
+
+
+# Máximo de grupos num ranking de métricas
+MAX_METRICAS_RANKING = 100
+
+
+def metricas(data, metric="", window=1, by="zona", prefix=3, zone="", cep="",
+             date_from="", date_to="", rank="", comp="", limit=10):
+    """Métricas de capacidade pré-calculadas (ver leitos/analytics.py).
+
+    Sem ``metric``, lista as métricas disponíveis. Com ela, devolve a série
+    mensal (janela móvel de ``window`` meses) de cada zona (``by=zona``) ou
+    prefixo de CEP de ``prefix`` dígitos (``by=cep``); com ``rank=top`` ou
+    ``bottom``, os ``limit`` grupos de maior/menor valor no mês ``comp``
+    (padrão: o último).
+    """
+    analytics = data.analytics
+    if not analytics:
+        raise QueryError("Colunas obrigatórias ausentes no CSV.")
+    if not metric:
+        return {
+            "metrics": [
+                {"metric": name, "descricao": desc, "tipo": "total" if den is None else "percentual"}
+                for name, (_, den, desc) in analytics.specs.items()
+            ],
+            "windows": list(WINDOWS),
+            "by": ["zona", "cep"],
+            "prefixes": list(CEP_PREFIXES),
+        }
+
+    if metric not in analytics.specs:
+        raise QueryError(f"metric deve ser uma de: {', '.join(analytics.specs)}")
+    if window not in WINDOWS:
+        raise QueryError(f"window deve ser um de: {', '.join(map(str, WINDOWS))}")
+    if by not in ("zona", "cep"):
+        raise QueryError("by deve ser zona ou cep")
+    if rank not in ("", "top", "bottom"):
+        raise QueryError("rank deve ser top ou bottom")
+    panel = analytics.panel(by, prefix, by_zone=bool(zone))
+    if panel is None:
+        raise QueryError(f"prefix deve ser um de: {', '.join(map(str, CEP_PREFIXES))}")
+
+    # grupos pelos filtros de zona e de prefixo de CEP
+    groups = np.ones(len(panel.labels), dtype=bool)
+    if zone:
+        groups &= np.char.upper(panel.zones.astype(str)) == zone.upper()
+    if cep and by == "cep":
+        groups &= np.char.startswith(panel.labels.astype(str), cep[:prefix])
+    groups = np.flatnonzero(groups)
+
+    out = {"metric": metric, "window": window, "by": by}
+    if by == "cep":
+        out["prefix"] = prefix
+    with stage("analytics"):
+        if rank:
+            try:
+                month = parse_bound(comp) if comp else int(analytics.comps[-1])
+            except ValueError as e:
+                raise QueryError(str(e))
+            position = np.searchsorted(analytics.comps, month)
+            if position >= len(analytics.comps) or analytics.comps[position] != month:
+                raise NotFound(f"Mês fora dos dados: {period_label([month], 'month')[0]}")
+            limit = min(max(limit, 1), MAX_METRICAS_RANKING)
+            results = analytics.ranking(metric, window, panel, groups, position, limit, top=rank == "top")
+            out.update(rank=rank, comp=period_label([month], "month")[0])
+        else:
+            results = analytics.series(metric, window, panel, groups, analytics.month_range(
+                _time_range("month", date_from, date_to)
+            ))
+    if by == "zona":
+        results = results.drop(columns="zone")
+    out["results"] = results.rename(columns={"grupo": "cep" if by == "cep" else "zone"})
+    return out
+
+
+def quality(data):
+    """Relatório de qualidade de cada arquivo carregado (ver leitos/validation.py)."""
+    return {
+        "version": data.version,
+        "ok": all(report["ok"] for report in data.quality),
+        "arquivos": data.quality,
+    }
+
+
+def filter_options(data):
+    zone_col = data.col("zone")
+    return {
+        "zones": sorted(data.df[zone_col].dropna().astype(str).unique().tolist()) if zone_col else [],
+        "ceps": data.index_for(data.df).unique_ceps() if data.col("cep") else [],
+    }
+
+
+def row_selection(data, filters, fields=(), cursor=-1, limit=0, max_rows=None):
+    """Seleção de linhas completas do DF para as APIs por município/zona/CEP.
+
+    ``filters`` é uma lista de dicts de filtros (ex.: o valor do caminho e os
+    da query string), combinados por interseção. Retorna
+    ``(positions, columns, next_cursor)``: o cursor é a posição da última
+    linha entregue, e ``limit`` (limitado a ``max_rows``) corta a página.
+    """
+    df = data.df
+    index = data.index_for(df)
+    positions = None
+    with stage("filter"):
+        for f in filters:
+            positions = intersect(positions, index.select(**f))
+    if positions is None:
+        positions = np.arange(len(df))
+    count_rows(scanned=len(positions))
+
+    unknown = [f for f in fields if f not in df.columns]
+    if unknown:
+        raise QueryError(f"Campos inexistentes: {', '.join(unknown)}")
+    columns = list(fields) or None
+
+    # As posições estão ordenadas: a página começa logo após o cursor
+    positions = positions[np.searchsorted(positions, cursor, side="right"):]
+    next_cursor = None
+    if limit > 0:
+        if max_rows:
+            limit = min(limit, max_rows)
+        if len(positions) > limit:
+            next_cursor = str(positions[limit - 1])
+        positions = positions[:limit]
+    return positions, columns, next_cursor
+
+
+def rows_frame(data, positions, columns=None):
+    df = data.df.iloc[positions]
+    return df if columns is None else df[columns]
@@ -0,0 +1,192 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .timeseries import hospital_id
+
+# Campos pesquisados (chave do cols_map) e peso de cada um na ordenação
+SEARCH_FIELDS = (("nome", 3.0), ("razao_social", 2.0), ("logradouro", 1.0), ("bairro", 1.0))
+
+# Palavras ignoradas na busca (quando há outras no texto pesquisado)
+STOPWORDS = frozenset({"DA", "DAS", "DE", "DO", "DOS", "E"})
+
+# Tolerância a erros de digitação: termos do vocabulário com similaridade de
+# trigramas (Dice) de pelo menos FUZZY_MIN com o termo digitado, no máximo
+# FUZZY_TERMS termos por palavra. Só para palavras de FUZZY_MIN_LENGTH letras
+# ou mais e que não casam exatamente nem como prefixo.
+FUZZY_MIN = 0.4
+FUZZY_TERMS = 20
+FUZZY_MIN_LENGTH = 4
+
+# Maior caractere possível: limite superior da faixa de um prefixo no vocabulário
+_MAX_CHAR = chr(0x10FFFF)
+_NON_ALNUM = re.compile(r"[^0-9A-Z]+")
+
+
+def fold(text):
+    """Texto em maiúsculas, sem acentos e só com letras/dígitos separados por espaço."""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", text.upper()).strip()
+
+
+def tokenize(text):
+    return [t for t in fold(text).split() if len(t) > 1 or t.isdigit()]
+
+
+def _trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _no_docs():
+    return np.empty(0, dtype=np.intp), np.empty(0)
+
+
+class SearchIndex:
+    """Índice invertido de busca textual sobre os estabelecimentos.
+
+    Cada documento é um estabelecimento (nome + CEP, como o id de
+    leitos/timeseries.py), com o texto de nome, razão social, logradouro e
+    bairro sem acentos. O vocabulário fica num array ordenado, então um
+    prefixo (busca enquanto digita) é uma faixa encontrada por busca
+    binária; as listas de documentos de cada termo ficam concatenadas
+    (``postings``), com o peso do campo em que o termo aparece. Um índice
+    de trigramas do vocabulário encontra termos parecidos quando a palavra
+    digitada não existe (erros de digitação).
+
+    ``rows_of(frame)`` dá o documento de cada linha de um DF, para que o
+    filtro ``q`` seja aplicado às linhas do DF e da tabela de hospitais.
+    """
+
+    def __init__(self, df):
+        cols_map = df.attrs["cols_map"]
+        self.nome_col, self.cep_col = cols_map.get("nome"), cols_map.get("cep")
+        self.docs = None
+        if not self.nome_col or not self.cep_col:
+            return
+
+        keys = df[self.nome_col].astype(str) + "|" + df[self.cep_col].astype(str)
+        codes, uniques = pd.factorize(keys)
+        self.keys = pd.Index(uniques)
+        first = np.unique(codes, return_index=True)[1]
+
+        fields = [(key, cols_map.get(key), weight) for key, weight in SEARCH_FIELDS]
+        fields = [(key, col, weight) for key, col, weight in fields if col in df.columns]
+        docs = pd.DataFrame({key: df[col].iloc[first].astype(str).to_numpy() for key, col, _ in fields})
+        docs["cep"] = df[self.cep_col].iloc[first].astype(str).to_numpy()
+        for key in ("municipio", "zone"):
+            col = cols_map.get(key)
+            if col in df.columns:
+                docs[key] = df[col].iloc[first].astype(str).to_numpy()
+        docs.insert(0, "id", [hospital_id(n, c) for n, c in zip(df[self.nome_col].iloc[first], docs["cep"])])
+        self.docs = docs
+
+        # termo -> {documento: maior peso entre os campos em que aparece}
+        weights = {}
+        for key, _, weight in fields:
+            for doc, text in enumerate(docs[key]):
+                for term in set(tokenize(text)):
+                    postings = weights.setdefault(term, {})
+                    if postings.get(doc, 0) < weight:
+                        postings[doc] = weight
+
+        self.terms = np.array(sorted(weights), dtype=str)
+        sizes = [len(weights[t]) for t in self.terms]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.intp)
+        self.postings = np.fromiter((d for t in self.terms for d in weights[t]), dtype=np.intp, count=self.offsets[-1])
+        self.weights = np.fromiter((w for t in self.terms for w in weights[t].values()), dtype=float, count=self.offsets[-1])
+
+        # trigrama -> termos do vocabulário que o contêm
+        trigram_terms = {}
+        for i, term in enumerate(self.terms):
+            for gram in _trigrams(term):
+                trigram_terms.setdefault(gram, []).append(i)
+        self.trigram_terms = {gram: np.array(ids, dtype=np.intp) for gram, ids in trigram_terms.items()}
+        self.term_trigrams = np.array([len(_trigrams(t)) for t in self.terms], dtype=float)
+
+        self.match = lru_cache(maxsize=1024)(self._match)
+
+    def __bool__(self):
+        return self.docs is not None
+
+    def _term_ids(self, term):
+        # (ids do vocabulário, fator de qualidade de cada um)
+        lo = np.searchsorted(self.terms, term, side="left")
+        hi = np.searchsorted(self.terms, term + _MAX_CHAR, side="left")
+        if hi > lo:
+            ids = np.arange(lo, hi)
+            # exato vale 1, prefixo um pouco menos
+            return ids, np.where(self.terms[ids] == term, 1.0, 0.8)
+        if len(term) < FUZZY_MIN_LENGTH:
+            return _no_docs()
+
+        grams = [self.trigram_terms[g] for g in _trigrams(term) if g in self.trigram_terms]
+        if not grams:
+            return _no_docs()
+        shared = np.bincount(np.concatenate(grams), minlength=len(self.terms))
+        candidates = np.flatnonzero(shared)
+        dice = 2 * shared[candidates] / (len(_trigrams(term)) + self.term_trigrams[candidates])
+        keep = dice >= FUZZY_MIN
+        candidates, dice = candidates[keep], dice[keep]
+        if len(candidates) > FUZZY_TERMS:
+            top = np.argpartition(-dice, FUZZY_TERMS - 1)[:FUZZY_TERMS]
+            candidates, dice = candidates[top], dice[top]
+        return candidates, 0.6 * dice
+
+    def _term_docs(self, term):
+        # documentos de um termo digitado e a pontuação de cada um
+        ids, quality = self._term_ids(term)
+        if not len(ids):
+            return _no_docs()
+        starts, stops = self.offsets[ids], self.offsets[ids + 1]
+        lengths = stops - starts
+        idx = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        docs = self.postings[idx]
+        scores = self.weights[idx] * np.repeat(quality, lengths)
+        # um documento pode vir de vários termos (prefixo/aproximado): fica a melhor nota
+        order = np.lexsort((-scores, docs))
+        docs, scores = docs[order], scores[order]
+        first = np.ones(len(docs), dtype=bool)
+        first[1:] = docs[1:] != docs[:-1]
+        return docs[first], scores[first]
+
+    def _match(self, q):
+        terms = tokenize(q)
+        if any(t not in STOPWORDS for t in terms):
+            terms = [t for t in terms if t not in STOPWORDS]
+        if not terms:
+            return _no_docs()
+
+        # todas as palavras precisam casar (E); a nota é a soma das notas
+        docs, scores = self._term_docs(terms[0])
+        for term in terms[1:]:
+            other_docs, other_scores = self._term_docs(term)
+            docs, i, j = np.intersect1d(docs, other_docs, assume_unique=True, return_indices=True)
+            scores = scores[i] + other_scores[j]
+        order = np.lexsort((docs, -scores))
+        return docs[order], scores[order]
+
+    def search(self, q, limit=20):
+        """``(DF dos melhores limit estabelecimentos, total encontrado)`` para ``q``."""
+        docs, scores = self.match(q)
+        out = self.docs.iloc[docs[:limit]].reset_index(drop=True)
+        out.insert(0, "score", np.round(scores[:limit], 3))
+        return out, len(docs)
+
+    def rows_of(self, frame):
+        """Documento de cada linha de ``frame`` (-1 se não é um estabelecimento indexado)."""
+        if not self or self.nome_col not in frame.columns or self.cep_col not in frame.columns:
+            return None
+        keys = frame[self.nome_col].astype(str) + "|" + frame[self.cep_col].astype(str)
+        return self.keys.get_indexer(keys)
+
+    def doc_mask(self, q):
+        """Máscara dos documentos que casam com ``q``, indexável pelo resultado de
+        ``rows_of`` (a posição extra no fim, -1, é sempre False)."""
+        mask = np.zeros(len(self.docs) + 1, dtype=bool)
+        mask[self.match(q)[0]] = True
+        return mask
@@ -0,0 +1,96 @@
+import datetime
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende do ambiente
+    orjson = None
+
+# Serialização JSON das APIs, sem dependência de Django: usada pelas views e
+# pela API FastAPI. Usa orjson quando instalado (bytes direto dos arrays
+# numpy) e cai para o json da biblioteca padrão caso contrário.
+#
+# DataFrames podem aparecer em qualquer ponto do objeto serializado e saem
+# como lista de registros ([{col: valor}, ...]) ou, no formato colunar,
+# como {col: [valores]} — arrays prontos para x/y dos gráficos Plotly.
+
+
+def _values(series):
+    # valores da coluna como objetos Python; ausentes (NaN/NaT/NA) viram None,
+    # já que NaN não é JSON válido
+    if series.hasnans:
+        return series.astype(object).where(series.notna(), None).tolist()
+    return series.tolist()
+
+
+def _column(series, numpy_arrays):
+    # numérico: array numpy contíguo (orjson serializa sem passar por objetos
+    # Python e escreve NaN como null)
+    if numpy_arrays and isinstance(series.dtype, np.dtype) and series.dtype.kind in "iuf":
+        return np.ascontiguousarray(series.to_numpy())
+    return _values(series)
+
+
+def frame_records(df):
+    names = [str(c) for c in df.columns]
+    columns = [_values(df[c]) for c in df.columns]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def frame_columns(df, numpy_arrays=False):
+    return {str(c): _column(df[c], numpy_arrays) for c in df.columns}
+
+
+def _default(columnar, numpy_arrays=False):
+    def default(obj):
+        if isinstance(obj, pd.DataFrame):
+            return frame_columns(obj, numpy_arrays) if columnar else frame_records(obj)
+        if isinstance(obj, np.ndarray):
+            return _values(pd.Series(obj)) if obj.ndim == 1 else obj.tolist()
+        if isinstance(obj, np.generic):
+            return None if pd.isna(obj) else obj.item()
+        if obj is pd.NA or obj is pd.NaT:
+            return None
+        if isinstance(obj, (datetime.datetime, datetime.date)):
+            return obj.isoformat()
+        raise TypeError(f"Tipo não serializável em JSON: {type(obj).__name__}")
+    return default
+
+
+def _without_nan(obj):
+    # floats soltos (inclusive np.float64, que o json trata como float) não
+    # passam pelo default: NaN/inf viram None aqui
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _without_nan(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_without_nan(v) for v in obj]
+    return obj
+
+
+def dumps_stdlib(obj, columnar=False):
+    """Serializa ``obj`` em bytes JSON com o ``json`` da biblioteca padrão.
+
+    Ausentes saem como null, como no orjson; ``allow_nan=False`` garante
+    que nenhum NaN escape como JSON inválido.
+    """
+    default = _default(columnar)
+    return json.dumps(
+        _without_nan(obj), default=lambda o: _without_nan(default(o)),
+        ensure_ascii=False, separators=(",", ":"), allow_nan=False,
+    ).encode("utf-8")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj, columnar=False):
+        """Serializa ``obj`` em bytes JSON (UTF-8, sem espaços)."""
+        return orjson.dumps(obj, default=_default(columnar, numpy_arrays=True), option=_ORJSON_OPTIONS)
+else:
+    dumps = dumps_stdlib
@@ -0,0 +1,151 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Versão do formato gravado; snapshots de outro formato são ignorados
+SNAPSHOT_FORMAT = 8
+
+
+def _narrow_codes(codes, n_values):
+    # menor inteiro com sinal que comporta os códigos (-1 = vazio/NaN)
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_values < np.iinfo(dtype).max:
+            return codes.astype(dtype, copy=False)
+    return codes.astype(np.int64, copy=False)
+
+
+def write_frame(directory, df, meta=None):
+    """Grava o DF como um .npy por coluna em ``directory``.
+
+    Colunas numéricas vão direto; texto e categorias vão como códigos
+    inteiros + tabela ordenada de valores distintos. A gravação é feita num
+    diretório temporário e renomeada no fim, então um leitor nunca vê um
+    diretório pela metade.
+    """
+    target = Path(directory)
+    tmp = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            kind = "category"
+            codes = series.cat.codes.to_numpy()
+            values = series.cat.categories.to_numpy(dtype=str)
+        elif pd.api.types.is_numeric_dtype(series.dtype):
+            np.save(tmp / f"{i}.npy", series.to_numpy(), allow_pickle=False)
+            columns.append({"name": col, "kind": "numeric"})
+            continue
+        else:
+            kind = "text"
+            codes, values = pd.factorize(series.astype(str), sort=True)
+            values = np.asarray(values, dtype=str)
+        np.save(tmp / f"{i}.codes.npy", _narrow_codes(codes, len(values)), allow_pickle=False)
+        np.save(tmp / f"{i}.values.npy", values, allow_pickle=False)
+        columns.append({"name": col, "kind": kind, "dtype": str(series.dtype)})
+
+    meta = {
+        **(meta or {}),
+        "format": SNAPSHOT_FORMAT,
+        "columns": columns,
+        "attrs": {key: df.attrs[key] for key in ("cols_map", "quality") if key in df.attrs},
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    shutil.rmtree(target, ignore_errors=True)
+    try:
+        tmp.rename(target)
+    except OSError:
+        # outro processo gravou o mesmo diretório primeiro
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def read_meta(directory):
+    try:
+        meta = json.loads((Path(directory) / "meta.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("format") == SNAPSHOT_FORMAT else None
+
+
+def read_frame(directory, text_as_category=False):
+    """Carrega um diretório gravado por ``write_frame`` como ``(df, meta)``.
+
+    Colunas numéricas e códigos de categorias são mapeados em memória
+    (mmap, somente leitura): processos que abrem o mesmo diretório
+    compartilham essas páginas pelo cache do sistema operacional. Com
+    ``text_as_category`` as colunas de texto também ficam como categorias
+    sobre os códigos mapeados, em vez de strings por linha. Retorna None se
+    o diretório não existe ou está incompleto.
+    """
+    directory = Path(directory)
+    meta = read_meta(directory)
+    if meta is None:
+        return None
+
+    data = {}
+    try:
+        for i, column in enumerate(meta["columns"]):
+            if column["kind"] == "numeric":
+                data[column["name"]] = np.load(directory / f"{i}.npy", mmap_mode="r", allow_pickle=False)
+                continue
+            codes = np.load(directory / f"{i}.codes.npy", mmap_mode="r", allow_pickle=False)
+            values = np.load(directory / f"{i}.values.npy", allow_pickle=False).astype(object)
+            if column["kind"] == "category" or text_as_category:
+                data[column["name"]] = pd.Categorical.from_codes(codes, categories=values, validate=False)
+            else:
+                data[column["name"]] = pd.array(values[codes], dtype=column["dtype"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+    df = pd.DataFrame(data, copy=False)
+    df.attrs.update(meta["attrs"])
+    return df, meta
+
+
+def snapshot_dir(csv_path):
+    # ex.: data/JANEIRO.csv -> data/JANEIRO.csv.snapshot/
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + ".snapshot")
+
+
+def _source_signature(csv_path):
+    stat = Path(csv_path).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _source_matches(meta, csv_path):
+    # o snapshot só vale se tamanho e mtime do CSV forem os de quando foi gravado
+    if meta is None:
+        return False
+    source = meta.get("source", {})
+    return all(source.get(k) == v for k, v in _source_signature(csv_path).items())
+
+
+def write_snapshot(csv_path, df, digest):
+    """Grava o DF tipado de um CSV no diretório de snapshot ao lado dele."""
+    write_frame(snapshot_dir(csv_path), df, {"source": {**_source_signature(csv_path), "digest": digest}})
+
+
+def snapshot_digest(csv_path):
+    """Hash do CSV guardado no snapshot, sem ler o CSV (None se inválido)."""
+    meta = read_meta(snapshot_dir(csv_path))
+    return meta["source"]["digest"] if _source_matches(meta, csv_path) else None
+
+
+def read_snapshot(csv_path):
+    """Carrega o snapshot do CSV como ``(df, digest)``, ou None se ausente/inválido."""
+    target = snapshot_dir(csv_path)
+    if not _source_matches(read_meta(target), csv_path):
+        return None
+    loaded = read_frame(target)
+    if loaded is None:
+        return None
+    df, meta = loaded
+    return df, meta["source"]["digest"]
@@ -13,20 +13,20 @@ async function safeFetch(path) {
   }
 }
 
-// Gráfico 1: Distribuição de Leitos Hospitalares por Região
-async function drawZonaLeitos(cep = "", zona = "") {
-  let url = '/api/zona_leitos/';
-  const params = new URLSearchParams();
-  if (cep) params.append('cep', cep);
-  if (zona) params.append('zone', zona);
-  if ([...params].length) url += '?' + params.toString();
+// Respostas com format=columns trazem {coluna: [valores]}; converte em registros
+function toRows(cols) {
+  const names = Object.keys(cols || {});
+  if (!names.length) return [];
+  return cols[names[0]].map((_, i) => Object.fromEntries(names.map(n => [n, cols[n][i]])));
+}
 
+// Gráfico 1: Distribuição de Leitos Hospitalares por Região
+function drawZonaLeitos(data) {
   try {
-    const data = await safeFetch(url);
-    if (!Array.isArray(data)) return console.error("Formato inesperado:", data);
-    const zonas = data.map(item => item.zone);
-    const leitosExist = data.map(item => item.leitos_exist);
-    const leitosSus = data.map(item => item.leitos_sus);
+    if (!data || !Array.isArray(data.zone)) return console.error("Formato inesperado:", data);
+    const zonas = data.zone;
+    const leitosExist = data.leitos_exist;
+    const leitosSus = data.leitos_sus;
 
     const trace1 = { x: zonas, y: leitosExist, name: "Leitos Totais", type: "bar", marker: { color: "#1F77B4" } };
     const trace2 = { x: zonas, y: leitosSus, name: "Leitos SUS", type: "bar", marker: { color: "#ff7f0e" } };
@@ -36,23 +36,16 @@ async function drawZonaLeitos(cep = "", zona = "") {
 }
 
 // Gráfico 2: Distribuição de Leitos SUS (Especialidades) por Região
-async function drawZonaEspecialidades(cep = "", zona = "") {
-  let url = '/api/zona_especialidades/';
-  const params = new URLSearchParams();
-  if (cep) params.append('cep', cep);
-  if (zona) params.append('zone', zona);
-  if ([...params].length) url += '?' + params.toString();
-
+function drawZonaEspecialidades(data) {
   try {
-    const data = await safeFetch(url);
-    if (!Array.isArray(data)) return console.error("Formato inesperado:", data);
+    if (!data || !Array.isArray(data.zone)) return console.error("Formato inesperado:", data);
 
-    const zonas = data.map(item => item.zone);
-    const leitosUtiAdulSus = data.map(item => item.leitos_uti_adulto_sus);
-    const leitosUtiCoroSus = data.map(item => item.leitos_uti_coronariana_sus);
-    const leitosUtiNeonSus = data.map(item => item.leitos_uti_neonatal_sus);
-    const leitosUtiPediSus = data.map(item => item.leitos_uti_pediatrico_sus);
-    const leitosUtiQueiSus = data.map(item => item.leitos_uti_queimado_sus);
+    const zonas = data.zone;
+    const leitosUtiAdulSus = data.leitos_uti_adulto_sus;
+    const leitosUtiCoroSus = data.leitos_uti_coronariana_sus;
+    const leitosUtiNeonSus = data.leitos_uti_neonatal_sus;
+    const leitosUtiPediSus = data.leitos_uti_pediatrico_sus;
+    const leitosUtiQueiSus = data.leitos_uti_queimado_sus;
 
     const traces = [
       {x: zonas,y: leitosUtiAdulSus,name:"UTI Adulto SUS",type:"bar",marker:{color:"#1f77b4"}},
@@ -68,16 +61,9 @@ async function drawZonaEspecialidades(cep = "", zona = "") {
 }
 
 // Gráfico 3: Tendência Mensal de Leitos Totais x Leitos SUS por Região
-async function drawGraficoEvolucaoLeitos(cep = "", zona = "") {
-  let url = '/api/evolucao_leitos/';
-  const params = new URLSearchParams();
-  if (cep) params.append('cep', cep);
-  if (zona) params.append('zone', zona);
-  if ([...params].length) url += '?' + params.toString();
-
+function drawGraficoEvolucaoLeitos(data) {
   try {
-    const data = await safeFetch(url);
-    const registros = Array.isArray(data)? data: data.results || [];
+    const registros = toRows(data);
     if (!registros.length) { document.getElementById('chart-evolucao-leitos').innerHTML="Nenhum dado encontrado"; return; }
 
     // Função para traduzir mês/ano para pt-BR
@@ -116,25 +102,16 @@ async function drawGraficoEvolucaoLeitos(cep = "", zona = "") {
 
 
 // Gráfico 4: Taxa Média de Ocupação SUS (%) por Região
-async function drawGraficoTaxaOcupacaoSUS(cep = "", zona = "") {
-  let url = '/api/taxa_ocupacao_sus/';
-  const params = new URLSearchParams();
-  if (cep) params.append('cep', cep);
-  if (zona) params.append('zone', zona);
-  if ([...params].length) url += '?' + params.toString();
-
+function drawGraficoTaxaOcupacaoSUS(data) {
   try {
-    const data = await safeFetch(url);
-    const registros = Array.isArray(data) ? data : [];
+    const zonas = (data && data.zone) || [];
+    const taxas = (data && data.taxa_ocupacao_sus) || [];
 
-    if (!registros.length) {
+    if (!zonas.length) {
       document.getElementById('chart-taxa-ocupacao-sus').innerHTML = "Nenhum dado encontrado";
       return;
     }
 
-    const zonas = registros.map(d => d.zone);
-    const taxas = registros.map(d => d.taxa_ocupacao_sus);
-
     const trace = {
       x: zonas,
       y: taxas,
@@ -160,12 +137,32 @@ async function drawGraficoTaxaOcupacaoSUS(cep = "", zona = "") {
 }
 
 
-// Inicialização
-function inicializarGraficos(cep="", zona="") {
-  drawZonaLeitos(cep,zona);
-  drawZonaEspecialidades(cep,zona);
-  drawGraficoEvolucaoLeitos(cep,zona);
-  drawGraficoTaxaOcupacaoSUS(cep,zona);
+// Inicialização: todos os gráficos e a tabela vêm de uma única request
+async function loadDashboard(cep = "", zona = "", page = 1, page_size = 25, withFilters = false) {
+  let url = `/api/dashboard/?page=${page}&page_size=${page_size}&format=columns`;
+  const params = new URLSearchParams();
+  if (cep) params.append('cep', cep);
+  if (zona) params.append('zone', zona);
+  if (withFilters) params.append('filters', '1');
+  sortParams(params);
+  searchParams(params);
+  if ([...params].length) url += '&' + params.toString();
+
+  let data;
+  try {
+    data = await safeFetch(url);
+  } catch (e) {
+    console.error("Erro ao carregar dashboard:", e);
+    document.getElementById("table-estabs").innerHTML = "<p>Erro ao carregar tabela.</p>";
+    return null;
+  }
+
+  drawZonaLeitos(data.zona_leitos);
+  drawZonaEspecialidades(data.zona_especialidades);
+  drawGraficoEvolucaoLeitos(data.evolucao_leitos);
+  drawGraficoTaxaOcupacaoSUS(data.taxa_ocupacao_sus);
+  showTable(data.estabelecimentos);
+  return data;
 }
 
 // Tabela
@@ -180,7 +177,20 @@ function buildTable(rows) {
   const headers = ["Município", "Zona", "CEP", "Hospital", "Leitos Existentes", "Leitos SUS"];
   const displayNames = ["Município", "Região", "CEP", "Hospital", "Leitos Totais", "Leitos SUS"];
   const thead = document.createElement("thead");
-  thead.innerHTML = "<tr>" + displayNames.map(h => `<th>${h}</th>`).join("") + "</tr>";
+  thead.innerHTML = "<tr>" + displayNames.map((h, i) => {
+    const arrow = headers[i] === currentSort ? (currentOrder === "desc" ? " ▼" : " ▲") : "";
+    return `<th style="cursor:pointer" data-sort="${headers[i]}">${h}${arrow}</th>`;
+  }).join("") + "</tr>";
+  // Clique no cabeçalho ordena pela coluna (de novo inverte a direção)
+  thead.querySelectorAll("th").forEach(th => th.addEventListener("click", async () => {
+    const col = th.dataset.sort;
+    currentOrder = (currentSort === col && currentOrder === "asc") ? "desc" : "asc";
+    currentSort = col;
+    currentPage = 1;
+    const cep = document.getElementById("filter-cep").value.trim();
+    const zona = document.getElementById("filter-zone").value.trim();
+    await loadTable(cep, zona, currentPage, currentPageSize);
+  }));
   table.appendChild(thead);
   const tbody = document.createElement("tbody");
   rows.forEach(r => {
@@ -200,18 +210,40 @@ function buildTable(rows) {
 let currentPage = 1;
 let currentPageSize = 25;
 let currentTotalPages = 1;
+let currentSort = "";
+let currentOrder = "asc";
+
+// Parâmetros de ordenação da tabela para a query string
+function sortParams(params) {
+  if (currentSort) {
+    params.append('sort', currentSort);
+    params.append('order', currentOrder);
+  }
+}
+
+// Busca por nome/endereço (vale para gráficos, tabela e export)
+function searchParams(params) {
+  const q = document.getElementById("filter-q").value.trim();
+  if (q) params.append('q', q);
+}
 
 async function loadTable(cep = "", zona = "", page = 1, page_size = 25){
-  let url = `/api/estabelecimentos/?page=${page}&page_size=${page_size}`;
+  let url = `/api/estabelecimentos/?page=${page}&page_size=${page_size}&format=columns`;
   const params = new URLSearchParams();
   if (cep) params.append('cep', cep);
   if (zona) params.append('zone', zona);
+  sortParams(params);
+  searchParams(params);
   if ([...params].length) url += '&' + params.toString();
 
   const data = await safeFetch(url);
+  showTable(data);
+}
+
+function showTable(data) {
   if(!data){document.getElementById("table-estabs").innerHTML="<p>Erro ao carregar tabela.</p>"; return;}
 
-  buildTable(data.results);
+  buildTable(toRows(data.results));
   currentPage = data.page;
   currentPageSize = data.page_size;
   currentTotalPages = data.total_pages;
@@ -225,16 +257,19 @@ document.getElementById("btn-apply").addEventListener("click", async () => {
   const cep = document.getElementById("filter-cep").value.trim();
   const zona = document.getElementById("filter-zone").value.trim();
   currentPage = 1;
-  await inicializarGraficos(cep,zona);
-  await loadTable(cep,zona,currentPage,currentPageSize);
+  await loadDashboard(cep,zona,currentPage,currentPageSize);
+});
+
+document.getElementById("filter-q").addEventListener("keydown", (e) => {
+  if (e.key === "Enter") document.getElementById("btn-apply").click();
 });
 
 document.getElementById("btn-clear").addEventListener("click", async () => {
   document.getElementById("filter-cep").value = "";
+  document.getElementById("filter-q").value = "";
   document.getElementById("filter-zone").value = "";
   currentPage = 1;
-  await inicializarGraficos();
-  await loadTable("", "", currentPage, currentPageSize);
+  await loadDashboard("", "", currentPage, currentPageSize);
 });
 
 document.getElementById("prev-page").addEventListener("click", async () => {
@@ -270,6 +305,8 @@ document.getElementById("btn-export").addEventListener("click", async () => {
   const params = new URLSearchParams();
   if (cep) params.append('cep', cep);
   if (zona) params.append('zone', zona);
+  sortParams(params);
+  searchParams(params);
   if ([...params].length) url += '?' + params.toString();
   window.location = url;
 });
@@ -278,21 +315,14 @@ document.getElementById("btn-export").addEventListener("click", async () => {
 document.addEventListener("DOMContentLoaded", async function () {
   const filterZona = document.getElementById("filter-zone");
 
-  // Preenche as opções de regiões
-  try {
-    const data = await safeFetch("/api/filters/");
-    const zones = data.zones || [];
-    filterZona.innerHTML = `<option value="">Todas as Regiões</option>`;
-    zones.forEach((z) => {
-      const opt = document.createElement("option");
-      opt.value = z;
-      opt.textContent = z;
-      filterZona.appendChild(opt);
-    });
-  } catch (err) {
-    console.error("Erro ao carregar regiões:", err);
-  }
-
-  inicializarGraficos();
-  loadTable("", "", currentPage, currentPageSize);
+  // Carga inicial (gráficos, tabela e opções de regiões)
+  const data = await loadDashboard("", "", currentPage, currentPageSize, true);
+  const zones = (data && data.filters && data.filters.zones) || [];
+  filterZona.innerHTML = `<option value="">Todas as Regiões</option>`;
+  zones.forEach((z) => {
+    const opt = document.createElement("option");
+    opt.value = z;
+    opt.textContent = z;
+    filterZona.appendChild(opt);
+  });
 });
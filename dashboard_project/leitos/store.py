@@ -0,0 +1,205 @@
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+from .aggregates import CUBE_CEP_LEVELS
+from .analytics import read_analytics, write_analytics
+from .dataset import Dataset
+from .snapshot import SNAPSHOT_FORMAT, read_frame, read_meta, write_frame
+from .utils_notebook_loader import DATA_DIR, find_csv, file_version, load_df
+
+# Cópia publicada do dataset tipado, compartilhada por todos os processos
+# (workers do Django e API FastAPI): um subdiretório por versão dos dados
+SHARED_DIR = DATA_DIR / ".shared"
+
+
+def _cube_dir(level):
+    return f"cube_{level}"
+
+
+def publish_shared(data, shared_dir=SHARED_DIR):
+    """Grava o Dataset em SHARED_DIR/<versão> para outros processos anexarem.
+
+    Cada DF (linhas e cubos) vira um diretório de ``write_frame``, e os
+    painéis de métricas (``Analytics``), o maior conjunto de arrays
+    derivados, vão junto em ``analytics/``. Tudo é
+    gravado num diretório temporário renomeado no fim, então uma versão só
+    aparece depois de completa. Versões antigas são removidas.
+    """
+    if not data.version:
+        return
+    target = shared_dir / data.version
+    if read_meta(target) is None:
+        tmp = target.with_name(f"{target.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        write_frame(tmp / "rows", data.df)
+        for level, cube in data.cubes.items():
+            if cube is not None:
+                write_frame(tmp / _cube_dir(level), cube)
+        write_analytics(tmp / "analytics", data.analytics)
+        meta = {
+            "format": SNAPSHOT_FORMAT,
+            "last_modified": data.last_modified.isoformat() if data.last_modified else None,
+            "cube_levels": [level for level, cube in data.cubes.items() if cube is not None],
+        }
+        (tmp / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+        try:
+            tmp.rename(target)
+        except OSError:
+            # outro processo publicou a mesma versão primeiro
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    # quem ainda usa uma versão antiga continua com os arquivos abertos via mmap
+    for old in shared_dir.iterdir():
+        if old.name != target.name and read_meta(old) is not None:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def attach_shared(version, shared_dir=SHARED_DIR):
+    """Dataset de uma versão já publicada, mapeado em memória; None se ausente.
+
+    As colunas numéricas e os códigos das colunas de texto são abertos com
+    mmap somente leitura, então vários processos anexados à mesma versão
+    dividem essas páginas no cache do sistema operacional em vez de cada um
+    manter sua cópia. O mesmo vale para os painéis de métricas. As demais
+    estruturas derivadas (``FilterIndex``, ``SearchIndex``,
+    ``HospitalTable``, ``HospitalSeries`` e ``GeoIndex``) são montadas por
+    processo a partir dessas colunas: são dicionários e arrays de objetos
+    Python que não se mapeiam direto de arquivos.
+    """
+    target = shared_dir / version
+    meta = read_meta(target)
+    if meta is None:
+        return None
+
+    rows = read_frame(target / "rows", text_as_category=True)
+    if rows is None:
+        return None
+    df = rows[0]
+
+    cubes = dict.fromkeys(CUBE_CEP_LEVELS)
+    for level in meta["cube_levels"]:
+        cube = read_frame(target / _cube_dir(level), text_as_category=True)
+        if cube is None:
+            return None
+        cubes[level] = cube[0]
+    analytics = read_analytics(target / "analytics")
+    if analytics is None:
+        return None
+
+    df.attrs["version"] = version
+    if meta.get("last_modified"):
+        df.attrs["last_modified"] = datetime.fromisoformat(meta["last_modified"])
+    return Dataset(df, cubes, analytics)
+
+
+def load_dataset(ingestor, current=None):
+    """Dataset mais recente dos CSVs, anexando à cópia compartilhada se houver.
+
+    Com CSVs mensais, calcula a versão sem parsear nada: se for a de
+    ``current``, retorna ``current``; se outro processo já publicou essa
+    versão, anexa a ela; senão processa os arquivos alterados e publica o
+    resultado. Sem CSVs mensais, usa o consolidado (sem compartilhamento).
+    """
+    if not ingestor.discover():
+        if current is not None and current.version == file_version(find_csv()):
+            return current
+        return Dataset(load_df())
+
+    version = ingestor.peek_version()
+    if current is not None and current.version == version:
+        return current
+
+    shared_dir = ingestor.data_dir / SHARED_DIR.name
+    data = attach_shared(version, shared_dir)
+    if data is not None:
+        return data
+
+    ingestor.refresh()
+    data = Dataset(ingestor.dataframe(), ingestor.cubes())
+    try:
+        publish_shared(data, shared_dir)
+    except OSError:
+        # sem permissão de escrita: o processo segue com sua cópia privada
+        pass
+    return data
+
+
+
+def _data_signature(data_dir):
+    # nome, mtime e tamanho de cada CSV: muda quando um arquivo entra, sai ou é regravado
+    return sorted((p.name, p.stat().st_mtime_ns, p.stat().st_size) for p in data_dir.glob("*.csv"))
+
+
+class DatasetWatcher:
+    """Mantém o Dataset atual e o recarrega em segundo plano.
+
+    Uma thread verifica a cada ``interval`` segundos se os CSVs da pasta de
+    dados mudaram (mtime/tamanho) e, só então, monta o novo Dataset (com
+    cubos e índices) fora do caminho das requests. A troca é a atribuição
+    de ``self.data``: requests em andamento continuam com a referência que
+    já pegaram. Se a recarga falhar, a versão anterior segue servindo e o
+    erro fica em ``self.error``; a próxima verificação tenta de novo.
+
+    Nada roda no import: ``ensure_started()`` faz a carga inicial e sobe a
+    thread na primeira request de cada processo (o pid separa os workers
+    de um fork, ex.: gunicorn --preload, e comandos do manage.py que não
+    atendem requests nunca sobem a thread).
+    """
+
+    def __init__(self, ingestor, interval=60):
+        self.ingestor = ingestor
+        self.interval = interval
+        self.data = None
+        self.error = None
+        self._signature = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def load(self):
+        """Recarrega se os arquivos mudaram; retorna True se trocou o Dataset."""
+        with self._lock:
+            try:
+                signature = _data_signature(self.ingestor.data_dir)
+                if self.data is not None and signature == self._signature:
+                    return False
+                data = load_dataset(self.ingestor, self.data)
+            except Exception as e:
+                self.error = str(e)
+                return False
+            self._signature = signature
+            self.error = None
+            changed = data is not self.data
+            self.data = data
+            return changed
+
+    def start(self):
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="leitos-dataset-watcher", daemon=True)
+            self._thread.start()
+
+    def ensure_started(self):
+        """Carga inicial síncrona + thread de recarga, uma vez por processo.
+
+        Depois de ``stop()`` (ex.: benchmarks que fixam ``data``) não faz nada.
+        """
+        if self._pid == os.getpid() or self._stop.is_set():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # anexa à cópia compartilhada, se outro worker já publicou
+                self.load()
+                self.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.load()
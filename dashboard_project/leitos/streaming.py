@@ -0,0 +1,56 @@
+import codecs
+import zlib
+
+from .serializers import dumps, frame_records
+
+# Linhas convertidas por bloco nas respostas em streaming
+CHUNK_ROWS = 5000
+
+
+def iter_csv(df, sep=";", chunk_rows=CHUNK_ROWS):
+    """Gera o CSV do DF em blocos de bytes UTF-8, com BOM (Excel) e cabeçalho."""
+    yield codecs.BOM_UTF8
+    yield df.iloc[:0].to_csv(index=False, sep=sep).encode("utf-8")
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows]
+        yield chunk.to_csv(index=False, header=False, sep=sep).encode("utf-8")
+
+
+def gzip_stream(chunks):
+    # compressão gzip incremental: nunca junta o arquivo inteiro em memória
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def frame_chunks(df, positions=None, columns=None, chunk_rows=CHUNK_ROWS):
+    """Fatia o DF em blocos sob demanda (só o bloco atual é materializado)."""
+    col_idx = slice(None) if columns is None else df.columns.get_indexer(columns)
+    total = len(df) if positions is None else len(positions)
+    for start in range(0, total, chunk_rows):
+        rows = slice(start, start + chunk_rows) if positions is None else positions[start:start + chunk_rows]
+        yield df.iloc[rows, col_idx]
+
+
+def iter_json_array(chunks):
+    # lista JSON de registros, gerada bloco a bloco
+    yield b"["
+    first = True
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        body = dumps(chunk)[1:-1]
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
+
+
+def iter_ndjson(chunks):
+    # um objeto JSON por linha (application/x-ndjson)
+    for chunk in chunks:
+        records = frame_records(chunk)
+        if records:
+            yield b"".join(dumps(r) + b"\n" for r in records)
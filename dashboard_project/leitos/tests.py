@@ -1,3 +1,629 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from importlib.util import find_spec
+from pathlib import Path
+from unittest import skipUnless
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from .ingestion import MonthlyIngestor
+from .store import DatasetWatcher
+from .utils_notebook_loader import DATA_DIR, dictionary_cols, load_df, numeric_cols
+from .zones import classify_zone, normalize_cep
+
+
+class NormalizeCepTests(SimpleTestCase):
+    def test_pads_and_strips_non_digits(self):
+        ceps = pd.Series(["1309010", "01309-010", " 2806160 ", "", "abc"])
+        self.assertEqual(
+            normalize_cep(ceps).tolist(),
+            ["01309010", "01309010", "02806160", "", ""],
+        )
+
+
+class ClassifyZoneTests(SimpleTestCase):
+    def test_range_boundaries(self):
+        cases = {
+            "00099999": "Desconhecida",
+            "00100000": "Centro",
+            "01000000": "Centro",
+            "01599999": "Centro",
+            "01600000": "Desconhecida",
+            "02000000": "Zona Norte",
+            "02999999": "Zona Norte",
+            "03000000": "Zona Leste",
+            "04000000": "Zona Sul",
+            "05000000": "Zona Oeste",
+            "05599999": "Zona Oeste",
+            "05600000": "Zona Sul",
+            "05999999": "Zona Sul",
+            "06000000": "Desconhecida",
+            "08000000": "Zona Leste",
+            "08499999": "Zona Leste",
+            "08500000": "Desconhecida",
+            "99999999": "Desconhecida",
+            "": "Desconhecida",
+        }
+        zones = classify_zone(pd.Series(list(cases)))
+        self.assertEqual(zones.astype(str).tolist(), list(cases.values()))
+
+    def test_matches_consolidated_csv(self):
+        # ZONA do consolidado foi gerada pelo notebook a partir dos mesmos CEPs;
+        # nenhum deles cai nas faixas em que os inícios octais do notebook diferem
+        df = pd.read_csv(DATA_DIR / "Consolidado_SP.csv", sep=";", encoding="utf-8-sig", dtype=str)
+        zones = classify_zone(normalize_cep(df["CO_CEP"]))
+        self.assertEqual(zones.astype(str).tolist(), df["ZONA"].tolist())
+
+
+class DatasetWatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.data_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.data_dir, ignore_errors=True)
+        shutil.copy(DATA_DIR / "JANEIRO.csv", self.data_dir)
+        self.watcher = DatasetWatcher(MonthlyIngestor(self.data_dir))
+
+    def test_reloads_only_when_files_change(self):
+        self.assertTrue(self.watcher.load())
+        first = self.watcher.data
+        self.assertFalse(self.watcher.load())
+        self.assertIs(self.watcher.data, first)
+
+        shutil.copy(DATA_DIR / "FEVEREIRO.csv", self.data_dir)
+        self.assertTrue(self.watcher.load())
+        self.assertNotEqual(self.watcher.data.version, first.version)
+        self.assertGreater(len(self.watcher.data.df), len(first.df))
+
+    def test_text_columns_stay_encoded_across_files(self):
+        shutil.copy(DATA_DIR / "FEVEREIRO.csv", self.data_dir)
+        self.watcher.load()
+        df = self.watcher.data.df
+        for col in dictionary_cols(df):
+            self.assertIsInstance(df[col].dtype, pd.CategoricalDtype, col)
+        for col in numeric_cols(df):
+            self.assertEqual(df[col].dtype, np.int16, col)
+
+    def test_second_process_attaches_to_shared_copy(self):
+        shutil.copy(DATA_DIR / "FEVEREIRO.csv", self.data_dir)
+        self.watcher.load()
+        built = self.watcher.data
+
+        # outro processo (outro ingestor, sem estado) anexa à versão publicada
+        other = DatasetWatcher(MonthlyIngestor(self.data_dir))
+        other.load()
+        attached = other.data
+        self.assertEqual(attached.version, built.version)
+
+        self.assertEqual(list(attached.analytics.specs), list(built.analytics.specs))
+        self.assertEqual(attached.analytics.panels.keys(), built.analytics.panels.keys())
+        for key, panel in built.analytics.panels.items():
+            shared = attached.analytics.panels[key]
+            self.assertIsInstance(shared.stack, np.memmap)
+            np.testing.assert_array_equal(shared.labels, panel.labels)
+            np.testing.assert_array_equal(shared.zones, panel.zones)
+            np.testing.assert_array_equal(shared.stack, panel.stack)
+
+    def test_failed_reload_keeps_previous_version(self):
+        self.watcher.load()
+        first = self.watcher.data
+
+        # um "CSV" ilegível faz a recarga falhar
+        (self.data_dir / "QUEBRADO.csv").mkdir()
+        self.assertFalse(self.watcher.load())
+        self.assertIs(self.watcher.data, first)
+        self.assertIsNotNone(self.watcher.error)
+
+        (self.data_dir / "QUEBRADO.csv").rmdir()
+        shutil.copy(DATA_DIR / "FEVEREIRO.csv", self.data_dir)
+        self.assertTrue(self.watcher.load())
+        self.assertIsNone(self.watcher.error)
+
+
+class ZoneAggregationTests(SimpleTestCase):
+    # o loop com iterrows que sum_by substituiu, como referência; as somas
+    # ficam inteiras, como na serialização atual (113, não 113.0)
+    def _reference(self, zone, cep, columns):
+        from . import views
+
+        data = views._current_data()
+        df = data.df
+        zone_col = data.col("zone")
+        if zone:
+            df = df[df[zone_col].astype(str).str.upper() == zone.upper()]
+        if cep:
+            df = df[df[data.col("cep")].astype(str).str.startswith(cep)]
+        agg = {}
+        for _, row in df.iterrows():
+            name = row[zone_col]
+            if not name or str(name).strip() == "":
+                name = "Sem Região"
+            values = agg.setdefault(name, {key: 0 for key in columns})
+            for key in columns:
+                values[key] += int(row[data.col(key)])
+        return sorted(({"zone": z, **v} for z, v in agg.items()), key=lambda x: x["zone"])
+
+    def test_payload_matches_row_loop_byte_for_byte(self):
+        from .serializers import dumps
+
+        endpoints = {
+            "/api/zona_leitos/": ["leitos_exist", "leitos_sus"],
+            "/api/zona_especialidades/": [
+                "leitos_uti_adulto_sus", "leitos_uti_coronariana_sus", "leitos_uti_neonatal_sus",
+                "leitos_uti_pediatrico_sus", "leitos_uti_queimado_sus",
+            ],
+        }
+        for url, columns in endpoints.items():
+            for zone, cep in (("", ""), ("Zona Sul", ""), ("", "013"), ("Centro", "01")):
+                response = self.client.get(url, {"zone": zone, "cep": cep})
+                self.assertEqual(response.content, dumps(self._reference(zone, cep, columns)), (url, zone, cep))
+
+
+class DashboardBatchTests(SimpleTestCase):
+    def test_matches_individual_endpoints(self):
+        query = "?zone=Zona%20Sul&cep=04&page=2&page_size=10"
+        batch = self.client.get("/api/dashboard/" + query + "&filters=1").json()
+        for key, url in [
+            ("zona_leitos", "/api/zona_leitos/"),
+            ("zona_especialidades", "/api/zona_especialidades/"),
+            ("evolucao_leitos", "/api/evolucao_leitos/"),
+            ("taxa_ocupacao_sus", "/api/taxa_ocupacao_sus/"),
+            ("estabelecimentos", "/api/estabelecimentos/"),
+        ]:
+            self.assertEqual(batch[key], self.client.get(url + query).json(), key)
+        self.assertEqual(batch["filters"], self.client.get("/api/filters/").json())
+
+    def test_columns_format_matches_records(self):
+        records = self.client.get("/api/zona_leitos/?cep=03").json()
+        columns = self.client.get("/api/zona_leitos/?cep=03&format=columns").json()
+        self.assertEqual(list(columns), ["zone", "leitos_exist", "leitos_sus"])
+        self.assertEqual([dict(zip(columns, row)) for row in zip(*columns.values())], records)
+
+
+class HospitalTableTests(SimpleTestCase):
+    def test_sorted_page_matches_groupby(self):
+        params = "?zone=Zona%20Sul&sort=Leitos%20SUS&order=desc&page=2&page_size=20"
+        page = self.client.get("/api/estabelecimentos/" + params).json()
+
+        rows = self.client.get("/api/estabelecimentos/?zone=Zona%20Sul&page_size=5000").json()["results"]
+        expected = sorted(rows, key=lambda r: r["Leitos SUS"], reverse=True)[20:40]
+        self.assertEqual([r["Leitos SUS"] for r in page["results"]], [r["Leitos SUS"] for r in expected])
+        self.assertEqual(page["total"], len(rows))
+
+    def test_unknown_sort_column(self):
+        response = self.client.get("/api/estabelecimentos/?sort=nope")
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_page_params(self):
+        for url in ("/api/estabelecimentos/", "/api/dashboard/"):
+            for params in ("page=abc", "page=0", "page_size=x", "page_size=0", "page_size=5001"):
+                self.assertEqual(self.client.get(f"{url}?{params}").status_code, 400, (url, params))
+
+
+class ExportCsvTests(SimpleTestCase):
+    HEADER = ["Município", "Região", "CEP", "Hospital", "Leitos Totais", "Leitos SUS"]
+
+    def _body(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_header_and_row_count(self):
+        import csv
+        import io
+
+        for params in ("", "zone=Zona%20Sul", "cep=013", "zone=Centro&cep=01"):
+            body = self._body(self.client.get(f"/api/estabelecimentos/export/?{params}"))
+            self.assertTrue(body.startswith("\ufeff".encode()), params)
+            rows = list(csv.reader(io.StringIO(body.decode("utf-8-sig")), delimiter=";"))
+            self.assertEqual(rows[0], self.HEADER)
+            total = self.client.get(f"/api/estabelecimentos/?{params}").json()["total"]
+            self.assertEqual(len(rows) - 1, total, params)
+
+    def test_gzip_matches_plain(self):
+        import gzip
+
+        plain = self._body(self.client.get("/api/estabelecimentos/export/?zone=Zona%20Sul"))
+        response = self.client.get("/api/estabelecimentos/export/?zone=Zona%20Sul&compress=gzip")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn(".csv.gz", response["Content-Disposition"])
+        self.assertEqual(gzip.decompress(self._body(response)), plain)
+
+
+class RowsPaginationTests(SimpleTestCase):
+    def test_cursor_round_trip(self):
+        import json
+
+        url = "/api/por_zona/Zona%20Sul/"
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        full = json.loads(b"".join(response.streaming_content))
+        self.assertTrue(full)
+
+        rows, cursor, pages = [], "", 0
+        while True:
+            page = self.client.get(url, {"limit": 100, "cursor": cursor}).json()
+            self.assertLessEqual(len(page["results"]), 100)
+            rows += page["results"]
+            pages += 1
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(pages, -(-len(full) // 100))
+        self.assertEqual(rows, full)
+
+    def test_fields_and_ndjson(self):
+        import json
+
+        response = self.client.get("/api/por_cep/013/?fields=CO_CEP,LEITOS_SUS&format=ndjson&limit=5")
+        lines = b"".join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 5)
+        for line in lines:
+            record = json.loads(line)
+            self.assertEqual(list(record), ["CO_CEP", "LEITOS_SUS"])
+            self.assertTrue(record["CO_CEP"].startswith("013"))
+        self.assertIn("X-Next-Cursor", response)
+        self.assertEqual(self.client.get("/api/por_cep/013/?fields=NAO_EXISTE").status_code, 400)
+
+
+class EvolucaoPeriodTests(SimpleTestCase):
+    def test_range_and_resampling(self):
+        monthly = self.client.get("/api/evolucao_leitos/?zone=Centro").json()
+        sliced = self.client.get("/api/evolucao_leitos/?zone=Centro&from=2023-03&to=2023-05").json()
+        self.assertEqual(sliced, [r for r in monthly if "2023-03" <= r["comp"] <= "2023-05"])
+
+        quarter = self.client.get("/api/evolucao_leitos/?zone=Centro&period=quarter&from=2023&to=2023").json()
+        first = [r["leitos_exist"] for r in monthly if r["comp"] in ("2023-01", "2023-02", "2023-03")]
+        self.assertEqual(quarter[0]["comp"], "2023-T1")
+        self.assertAlmostEqual(quarter[0]["leitos_exist"], sum(first) / 3, places=2)
+
+    def test_invalid_period(self):
+        self.assertEqual(self.client.get("/api/evolucao_leitos/?period=week").status_code, 400)
+        self.assertEqual(self.client.get("/api/evolucao_leitos/?from=2023-13").status_code, 400)
+
+
+class HospitalSeriesTests(SimpleTestCase):
+    def test_history_and_largest_changes(self):
+        ranking = self.client.get("/api/hospitais/variacoes/?comp=2023-12&limit=5").json()
+        self.assertEqual(ranking["comp"], "2023-12")
+        top = ranking["results"][0]
+        self.assertEqual(top["delta"], top["LEITOS_EXISTENTES"] - top["anterior"])
+
+        history = self.client.get(f"/api/hospitais/{top['id']}/historico/").json()
+        self.assertEqual(history["nome"], top["nome"])
+        by_comp = {r["comp"]: r for r in history["series"]}
+        self.assertEqual(by_comp["2023-12"]["DELTA_LEITOS_EXISTENTES"], top["delta"])
+        self.assertIsNone(history["series"][0]["DELTA_LEITOS_EXISTENTES"])
+
+    def test_unknown_hospital(self):
+        self.assertEqual(self.client.get("/api/hospitais/naoexiste/historico/").status_code, 404)
+
+    def test_case_variants_are_one_hospital(self):
+        from .timeseries import HospitalSeries, hospital_id
+
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        csv_path = directory / "TESTE.csv"
+        csv_path.write_text(
+            "COMP;NOME_ESTABELECIMENTO;CO_CEP;LEITOS_EXISTENTES;LEITOS_SUS\n"
+            "202301;Hospital Santa Maria;01309010;10;5\n"
+            "202302;HOSPITAL SANTA MARIA ;01309010;12;6\n"
+            "202302;OUTRO HOSPITAL;01309010;3;1\n"
+            "202303;hospital santa maria;01309010;15;6\n",
+            encoding="utf-8",
+        )
+        series = HospitalSeries(load_df(csv_path))
+        hid = hospital_id("HOSPITAL SANTA MARIA", "01309010")
+        self.assertEqual(len(series.ids), 2)
+
+        info, history = series.history(hid)
+        self.assertEqual(info["id"], hid)
+        self.assertEqual(history["comp"].tolist(), ["2023-01", "2023-02", "2023-03"])
+        self.assertEqual(history["LEITOS_EXISTENTES"].tolist(), [10, 12, 15])
+        self.assertEqual(history["DELTA_LEITOS_EXISTENTES"].tolist()[1:], [2, 3])
+
+
+class InstrumentationTests(SimpleTestCase):
+    def test_server_timing_and_metrics(self):
+        response = self.client.get("/api/zona_leitos/?zone=Centro&cep=01")
+        timing = response["Server-Timing"]
+        for name in ("filter;dur=", "groupby;dur=", "serialize;dur=", "total;dur="):
+            self.assertIn(name, timing)
+
+        metrics = self.client.get("/metrics").content.decode()
+        self.assertIn('leitos_requests_total{endpoint="api_zona_leitos",status="200"}', metrics)
+        self.assertIn('leitos_stage_seconds_total{endpoint="api_zona_leitos",stage="groupby"}', metrics)
+        self.assertIn('leitos_rows_returned_total{endpoint="api_zona_leitos"}', metrics)
+
+
+class ApiCacheTests(SimpleTestCase):
+    def test_etag_and_not_modified(self):
+        response = self.client.get("/api/zona_leitos/?zone=Zona%20Sul&cep=01")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertIn("max-age", response["Cache-Control"])
+
+        again = self.client.get("/api/zona_leitos/?zone=Zona%20Sul&cep=01", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+
+    def test_every_json_api_is_cached(self):
+        for url in ("/api/filters/", "/api/qualidade/", "/api/metricas/?metric=leitos_exist"):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertIn("max-age", response["Cache-Control"], url)
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(again.status_code, 304, url)
+
+    def test_key_normalization(self):
+        base = self.client.get("/api/estabelecimentos/?zone=zona%20sul&cep=01-&page=01")
+        same = self.client.get("/api/estabelecimentos/?page=1&cep=01&zone=ZONA%20SUL")
+        self.assertEqual(base["ETag"], same["ETag"])
+        self.assertEqual(base.content, same.content)
+        other = self.client.get("/api/estabelecimentos/?zone=zona%20sul&cep=01&page=2")
+        self.assertNotEqual(base["ETag"], other["ETag"])
+
+    def test_errors_are_not_cached(self):
+        from .cache import RESPONSE_CACHE
+
+        RESPONSE_CACHE.clear()
+        response = self.client.get("/api/search/?q=")
+        self.assertEqual(response.status_code, 400)
+        for name in ("ETag", "Last-Modified", "Cache-Control"):
+            self.assertFalse(response.has_header(name), name)
+        self.assertEqual(len(RESPONSE_CACHE), 0)
+
+    def test_one_dataset_version_per_request(self):
+        from types import SimpleNamespace
+
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+
+        from .cache import RESPONSE_CACHE, cached_api, make_etag, request_key
+
+        # cada chamada devolve uma versão nova, como uma recarga no meio da request
+        versions = iter(range(1, 100))
+
+        def dataset():
+            return SimpleNamespace(version=f"v{next(versions)}", last_modified=None)
+
+        @cached_api(dataset)
+        def view(request):
+            return HttpResponse(request.dataset.version)
+
+        RESPONSE_CACHE.clear()
+        request = RequestFactory().get("/api/teste/?zone=Centro")
+        response = view(request)
+        self.assertEqual(response.content, b"v1")
+        self.assertEqual(response["ETag"], f'"{make_etag("v1", request_key(request))}"')
+        RESPONSE_CACHE.clear()
+
+    def test_byte_limit(self):
+        from .cache import ResponseCache
+
+        cache = ResponseCache(max_entries=10, max_bytes=10, max_entry_bytes=6)
+        cache.put("a", (200, b"12345", []))
+        cache.put("big", (200, b"1234567", []))
+        self.assertIsNone(cache.get("big"))
+        cache.put("b", (200, b"1234", []))
+        self.assertEqual((len(cache), cache.bytes), (2, 9))
+        cache.put("c", (200, b"12", []))
+        # passou de 10 bytes: sai a entrada usada há mais tempo
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual((len(cache), cache.bytes), (2, 6))
+
+
+class SearchTests(SimpleTestCase):
+    def test_accent_folding_prefix_and_typos(self):
+        exact = self.client.get("/api/search/?q=sao%20camilo").json()
+        self.assertTrue(exact["total"])
+        self.assertIn("SAO CAMILO", exact["results"][0]["nome"])
+
+        # acentos, maiúsculas, prefixo e erro de digitação levam ao mesmo hospital
+        for q in ("São Camilo", "sao cami", "sao camlio"):
+            results = self.client.get("/api/search/", {"q": q}).json()["results"]
+            self.assertIn(exact["results"][0]["id"], [r["id"] for r in results], q)
+        self.assertEqual(self.client.get("/api/search/?q=").status_code, 400)
+
+    def test_q_filters_dashboard_endpoints(self):
+        table = self.client.get("/api/estabelecimentos/?q=sao%20camilo&page_size=100").json()
+        self.assertTrue(table["total"])
+        self.assertTrue(all("CAMILO" in r["Hospital"] for r in table["results"]))
+
+        charts = self.client.get("/api/zona_leitos/?q=sao%20camilo").json()
+        self.assertEqual(sum(r["leitos_exist"] for r in charts), sum(r["Leitos Existentes"] for r in table["results"]))
+
+
+class GeoIndexTests(SimpleTestCase):
+    def test_nearest_matches_brute_force(self):
+        from . import views
+        from .geo import CentroidTable, GeoIndex, haversine_km
+
+        # coordenadas fictícias por prefixo de 5 dígitos em torno do centro de SP
+        series = views._current_data().series
+        prefixes = sorted({cep[:5] for cep in series.info["cep"]})
+        rng = np.random.default_rng(0)
+        centroids = pd.DataFrame({
+            "cep": prefixes,
+            "lat": -23.55 + rng.normal(0, 0.1, len(prefixes)),
+            "lon": -46.63 + rng.normal(0, 0.1, len(prefixes)),
+        })
+        geo = GeoIndex(series, CentroidTable(centroids), ["UTI_TOTAL_SUS"])
+        self.assertTrue(geo)
+
+        lat, lon = geo.info["lat"].to_numpy(), geo.info["lon"].to_numpy()
+        for point, k in (((-23.55, -46.63), 10), ((-23.9, -46.2), 3), ((-10.0, -40.0), 5)):
+            _, dist = geo.nearest(*point, k=k)
+            np.testing.assert_allclose(dist, np.sort(haversine_km(*point, lat, lon))[:k])
+
+        mask = geo.info["UTI_TOTAL_SUS"].to_numpy() >= 10
+        positions, _ = geo.nearest(-23.55, -46.63, k=5, mask=mask)
+        self.assertTrue((geo.info["UTI_TOTAL_SUS"].to_numpy()[positions] >= 10).all())
+
+    def test_endpoint_without_centroid_table(self):
+        from .geo import centroid_table
+
+        if centroid_table() is None:
+            self.assertEqual(self.client.get("/api/proximos/?cep=01309010").status_code, 503)
+        self.assertIn(self.client.get("/api/proximos/").status_code, (400, 503))
+
+
+class ValidationTests(SimpleTestCase):
+    def test_sniffs_repairs_and_reports(self):
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        csv_path = directory / "TESTE.csv"
+        csv_path.write_bytes((
+            "COMP,NOME_ESTABELECIMENTO,DESC_NATUREZA_JURIDICA,CO_CEP,LEITOS_EXISTENTES,LEITOS_SUS\n"
+            "202301,HOSPITAL SÃO JOSÉ ,HOSPITAL_PÃšBLICO,01309-010,10,-2\n"
+            "202301,HOSPITAL B,HOSPITAL_PÚBLICO,04101000,n/d,5\n"
+        ).encode("cp1252"))
+
+        df = load_df(csv_path)
+        report = df.attrs["quality"][0]
+        self.assertEqual((report["encoding"], report["separador"]), ("cp1252", ","))
+        self.assertEqual(df["NOME_ESTABELECIMENTO"].tolist(), ["HOSPITAL SÃO JOSÉ", "HOSPITAL B"])
+        self.assertEqual(df["DESC_NATUREZA_JURIDICA"].cat.categories.tolist(), ["HOSPITAL_PÚBLICO"])
+        self.assertEqual(df["LEITOS_SUS"].tolist(), [0, 5])
+        self.assertEqual(report["problemas"]["contagem_negativa"], {"LEITOS_SUS": 1})
+        self.assertEqual(report["problemas"]["contagem_nao_numerica"], {"LEITOS_EXISTENTES": 1})
+        self.assertEqual(report["problemas"]["sus_acima_existentes"], {"LEITOS_SUS": 1})
+        self.assertFalse(report["ok"])
+
+        # o relatório volta junto com o snapshot
+        self.assertEqual(load_df(csv_path).attrs["quality"], df.attrs["quality"])
+
+    def test_undecodable_bytes_are_reported(self):
+        from .validation import SNIFF_BYTES
+
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        header = b"COMP;NOME_ESTABELECIMENTO;CO_CEP;LEITOS_EXISTENTES;LEITOS_SUS\n"
+        # 0x81/0x9D não existem em cp1252 nem formam UTF-8 válido: na amostra
+        # do sniff_format e só depois dela
+        for name, body in (
+            ("AMOSTRA.csv", header + b"202301;HOSPITAL \x81\x9d;01309010;10;5\n"),
+            ("DEPOIS.csv", header + b"202301;HOSPITAL A;01309010;10;5\n" * (SNIFF_BYTES // 30)
+             + b"202301;HOSPITAL \x81\x9d;01309010;10;5\n"),
+        ):
+            (directory / name).write_bytes(body)
+            report = load_df(directory / name).attrs["quality"][0]
+            self.assertEqual(report["encoding"], "latin-1", name)
+            self.assertEqual(report["problemas"]["codificacao_invalida"], 1, name)
+            self.assertFalse(report["ok"], name)
+
+
+class MetricasTests(SimpleTestCase):
+    def test_rolling_window_matches_pandas(self):
+        from . import views
+
+        df = views._current_data().df
+        monthly = df.groupby(["ZONA", "COMP"], observed=True)[["LEITOS_SUS", "LEITOS_EXISTENTES"]].sum().unstack(0)
+        rolled = monthly.rolling(3).sum()
+        expected = (rolled["LEITOS_SUS"] / rolled["LEITOS_EXISTENTES"] * 100).round(2)
+
+        response = self.client.get("/api/metricas/?metric=taxa_sus&window=3")
+        self.assertEqual(response.status_code, 200)
+        results = pd.DataFrame(response.json()["results"])
+        results = results[results["zone"] != "Total"].pivot(index="comp", columns="zone", values="taxa_sus")
+        expected.index = [f"{comp // 100}-{comp % 100:02d}" for comp in expected.index]
+        np.testing.assert_allclose(
+            results.loc[expected.index, expected.columns].to_numpy(dtype=float), expected.to_numpy()
+        )
+
+    def test_ranking_by_cep_prefix(self):
+        df = pd.DataFrame(self.client.get("/api/metricas/").json()["metrics"])
+        self.assertIn("taxa_sus_uti_adulto", df["metric"].tolist())
+
+        out = self.client.get("/api/metricas/?metric=leitos_exist&by=cep&prefix=3&rank=top&limit=5").json()
+        values = [row["leitos_exist"] for row in out["results"]]
+        self.assertEqual(len(values), 5)
+        self.assertEqual(values, sorted(values, reverse=True))
+        self.assertEqual(self.client.get("/api/metricas/?metric=taxa_sus&window=2").status_code, 400)
+
+        # o Total (soma das zonas) não entra no ranking
+        out = self.client.get("/api/metricas/?metric=leitos_exist&rank=top&limit=10").json()
+        self.assertNotIn("Total", [row["zone"] for row in out["results"]])
+
+    def test_short_cep_prefix_spans_zones(self):
+        def results(query):
+            return self.client.get(f"/api/metricas/?metric=leitos_exist&from=2023-12&to=2023-12&{query}").json()["results"]
+
+        # o prefixo "0" cobre a cidade inteira: sem zona própria
+        (city,) = results("by=cep&prefix=1")
+        self.assertEqual(city["zone"], "")
+        (total,) = results("zone=Total")
+        self.assertEqual(city["leitos_exist"], total["leitos_exist"])
+
+        # com zone=, cada prefixo conta só as linhas daquela zona
+        for zone in ("Zona Sul", "Centro"):
+            (part,) = results(f"by=cep&prefix=1&zone={zone}")
+            (by_zone,) = results(f"zone={zone}")
+            self.assertEqual((part["cep"], part["zone"]), ("0", zone))
+            self.assertEqual(part["leitos_exist"], by_zone["leitos_exist"])
+
+
+@skipUnless(find_spec("fastapi") and find_spec("httpx"), "FastAPI não instalado")
+class FastApiParityTests(SimpleTestCase):
+    # filtros aceitos pelas rotas de gráficos/tabela e pelas de linhas
+    DASHBOARD_PARAMS = (
+        {},
+        {"zone": "Zona Sul", "cep": "04"},
+        {"cep": "013", "sort": "leitos_sus", "order": "desc", "page": "2", "page_size": "10"},
+        {"zone": "Centro", "period": "quarter", "from": "2023-01", "to": "2023-06", "format": "columns"},
+        {"q": "sao camilo"},
+    )
+    ROW_PARAMS = (
+        {},
+        {"fields": "NOME_ESTABELECIMENTO,LEITOS_SUS"},
+        {"q": "hospital", "limit": "7", "cursor": "100"},
+    )
+    # rota do FastAPI -> (rota equivalente do Django, parâmetros)
+    ROUTES = {
+        "/zona_leitos": ("/api/zona_leitos/", DASHBOARD_PARAMS),
+        "/zona_especialidades": ("/api/zona_especialidades/", DASHBOARD_PARAMS),
+        "/evolucao_leitos": ("/api/evolucao_leitos/", DASHBOARD_PARAMS),
+        "/taxa_ocupacao_sus": ("/api/taxa_ocupacao_sus/", DASHBOARD_PARAMS),
+        "/estabelecimentos": ("/api/estabelecimentos/", DASHBOARD_PARAMS),
+        "/dashboard": ("/api/dashboard/", DASHBOARD_PARAMS),
+        "/por_zona/Zona Sul": ("/api/por_zona/Zona Sul/", ROW_PARAMS),
+        "/por_cep/013": ("/api/por_cep/013/", ROW_PARAMS),
+    }
+
+    def test_same_json_as_django(self):
+        import importlib.util
+
+        from fastapi.testclient import TestClient
+
+        spec = importlib.util.spec_from_file_location("leitos_fastapi", DATA_DIR / "main.py")
+        main = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(main)
+        with TestClient(main.app) as client:
+            for route, (url, param_sets) in self.ROUTES.items():
+                for params in param_sets:
+                    fast = client.get(route, params=params)
+                    django = self.client.get(url, params)
+                    self.assertEqual(fast.status_code, 200, (route, params))
+                    self.assertEqual(django.status_code, 200, (url, params))
+                    body = b"".join(django.streaming_content) if django.streaming else django.content
+                    self.assertEqual(fast.content, body, (route, params))
+
+
+class SerializerTests(SimpleTestCase):
+    def test_missing_values_are_null_in_both_paths(self):
+        import json
+
+        from .serializers import dumps, dumps_stdlib
+
+        df = pd.DataFrame({
+            "zone": ["Centro", None],
+            "taxa": [1.5, np.nan],
+            "leitos": np.array([3, 4], dtype=np.int16),
+            "comp": pd.to_datetime(["2023-01-01", None]),
+        })
+        obj = {"results": df, "valor": np.float64("nan")}
+        for columnar in (False, True):
+            stdlib = json.loads(dumps_stdlib(obj, columnar))
+            self.assertEqual(json.loads(dumps(obj, columnar)), stdlib)
+            self.assertIsNone(stdlib["valor"])
+        records = json.loads(dumps_stdlib(obj))["results"]
+        self.assertEqual(records[1], {"zone": None, "taxa": None, "leitos": 4, "comp": None})
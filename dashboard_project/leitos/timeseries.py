@@ -0,0 +1,136 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from .periods import period_label
+from .utils_notebook_loader import numeric_cols
+
+
+def name_key(nome):
+    # nome sem espaços nas pontas e em maiúsculas: grafias que só diferem na
+    # caixa (comuns nos exports do CNES) são o mesmo hospital
+    return str(nome).strip().upper()
+
+
+def hospital_id(nome, cep):
+    """Identificador estável do hospital: hash curto de nome + CEP.
+
+    Não depende da ordem das linhas nem da versão dos dados, então o mesmo
+    hospital mantém o id quando chegam novos meses.
+    """
+    return hashlib.sha1(f"{name_key(nome)}|{cep}".encode("utf-8")).hexdigest()[:12]
+
+
+def _name_keys(series):
+    # name_key de cada linha, calculado só sobre os valores distintos
+    codes, uniques = pd.factorize(series.astype(str))
+    keys = np.array([name_key(n) for n in uniques], dtype=object)
+    return pd.Categorical(keys[codes])
+
+
+class HospitalSeries:
+    """Séries mensais de leitos por hospital, montadas uma vez por versão.
+
+    As linhas (hospital, mês) ficam ordenadas por hospital e depois por
+    mês, em arrays contíguos: o histórico do hospital ``h`` é o trecho
+    ``offsets[h]:offsets[h + 1]`` de ``comps``/``values``/``deltas``. As
+    variações mês a mês (em relação ao mês anterior presente para o mesmo
+    hospital) são pré-calculadas; ``first`` marca o primeiro mês de cada
+    hospital, que não tem variação. Um índice por mês (COMP ordenado)
+    permite listar todos os hospitais de um mês sem varrer o DF.
+    """
+
+    def __init__(self, df):
+        cols_map = df.attrs["cols_map"]
+        nome_col, cep_col, comp_col = cols_map.get("nome"), cols_map.get("cep"), cols_map.get("comp")
+        self.metrics = numeric_cols(df)
+        self.ids = {}
+        if not all((nome_col, cep_col, comp_col)) or not self.metrics:
+            return
+
+        # um hospital por (name_key, CEP), o mesmo par que forma o id
+        rows = df[df[comp_col] > 0]
+        key = _name_keys(rows[nome_col])
+        monthly = (
+            rows.groupby([key, cep_col, comp_col], observed=True, sort=True)[self.metrics]
+            .sum()
+            .reset_index()
+        )
+        nomes = monthly.iloc[:, 0].astype(str).to_numpy()
+        ceps = monthly[cep_col].astype(str).to_numpy()
+
+        # início de cada hospital no array ordenado
+        self.first = np.ones(len(monthly), dtype=bool)
+        self.first[1:] = (nomes[1:] != nomes[:-1]) | (ceps[1:] != ceps[:-1])
+        starts = np.flatnonzero(self.first)
+        self.offsets = np.append(starts, len(monthly))
+
+        self.comps = monthly[comp_col].to_numpy()
+        self.values = monthly[self.metrics].to_numpy(dtype=np.int64)
+        self.deltas = np.diff(self.values, axis=0, prepend=self.values[:1])
+        self.deltas[self.first] = 0
+
+        # dados cadastrais de cada hospital (um registro por hospital)
+        # (o nome exibido é a primeira grafia encontrada nos dados)
+        hospitals = rows.groupby([key, cep_col], observed=True, sort=True)
+        info = pd.DataFrame({"nome": hospitals[nome_col].first().astype(str).to_numpy(), "cep": ceps[starts]})
+        for field in ("municipio", "zone"):
+            col = cols_map.get(field)
+            if col:
+                info[field] = hospitals[col].first().astype(str).to_numpy()
+        info.insert(0, "id", [hospital_id(n, c) for n, c in zip(nomes[starts], info["cep"])])
+        self.info = info
+        self.ids = {hid: h for h, hid in enumerate(info["id"])}
+
+        # hospital de cada linha e índice por mês
+        self.hospital = np.repeat(np.arange(len(starts)), np.diff(self.offsets))
+        self.month_order = np.argsort(self.comps, kind="stable")
+        self.month_sorted = self.comps[self.month_order]
+
+    def latest_comp(self):
+        return int(self.month_sorted[-1]) if len(self.ids) and len(self.month_sorted) else None
+
+    def history(self, hid):
+        """``(dados do hospital, DF com um mês por linha)``, ou None se o id não existe."""
+        h = self.ids.get(hid)
+        if h is None:
+            return None
+        lo, hi = self.offsets[h], self.offsets[h + 1]
+        first = self.first[lo:hi]
+        columns = {"comp": period_label(self.comps[lo:hi], "month").to_numpy()}
+        for i, col in enumerate(self.metrics):
+            columns[col] = self.values[lo:hi, i]
+        for i, col in enumerate(self.metrics):
+            columns[f"DELTA_{col}"] = pd.arrays.IntegerArray(self.deltas[lo:hi, i], first)
+        return self.info.iloc[h].to_dict(), pd.DataFrame(columns)
+
+    def largest_changes(self, comp, metric, limit=20, direction="abs"):
+        """Hospitais com as maiores variações de ``metric`` no mês ``comp``.
+
+        ``direction``: ``abs`` (maior variação em módulo), ``up`` (maiores
+        aumentos) ou ``down`` (maiores reduções). Só entram hospitais com
+        mês anterior na série.
+        """
+        i = self.metrics.index(metric)
+        lo = np.searchsorted(self.month_sorted, comp, side="left")
+        hi = np.searchsorted(self.month_sorted, comp, side="right")
+        rows = self.month_order[lo:hi]
+        rows = rows[~self.first[rows]]
+
+        deltas = self.deltas[rows, i]
+        score = {"abs": -np.abs(deltas), "up": -deltas, "down": deltas}[direction]
+        keep = score < 0  # variação zero (ou no sentido oposto) não entra
+        rows, score = rows[keep], score[keep]
+        if limit < len(rows):
+            top = np.argpartition(score, limit - 1)[:limit]
+            rows, score = rows[top], score[top]
+        rows = rows[np.lexsort((rows, score))]
+
+        out = self.info.iloc[self.hospital[rows]].reset_index(drop=True)
+        out["comp"] = period_label(self.comps[rows], "month").to_numpy()
+        out["comp_anterior"] = period_label(self.comps[rows - 1], "month").to_numpy()
+        out[metric] = self.values[rows, i]
+        out["anterior"] = self.values[rows - 1, i]
+        out["delta"] = self.deltas[rows, i]
+        return out
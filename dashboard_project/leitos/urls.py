@@ -6,6 +6,7 @@ app_name = "leitos"
 urlpatterns = [
     path("dashboard/", views.dashboard_view, name="dashboard"),
     # APIs integradas (inclui funcionalidades do main.py)
+    path("api/dashboard/", views.api_dashboard, name="api_dashboard"),
     path("api/zona_leitos/", views.api_zona_leitos, name="api_zona_leitos"),
     path("api/zona_especialidades/", views.api_zona_especialidades, name="api_zona_especialidades"),
     path("api/evolucao_leitos/", views.api_evolucao_leitos, name="api_evolucao_leitos"),
@@ -16,4 +17,11 @@ urlpatterns = [
     path("api/por_zona/<str:zona>/", views.api_por_zona, name="api_por_zona"),
     path("api/por_cep/<str:cep>/", views.api_por_cep, name="api_por_cep"),
     path("api/filters/", views.api_filters, name="api_filters"),
+    path("api/metricas/", views.api_metricas, name="api_metricas"),
+    path("api/qualidade/", views.api_qualidade, name="api_qualidade"),
+    path("api/search/", views.api_search, name="api_search"),
+    path("api/proximos/", views.api_proximos, name="api_proximos"),
+    path("api/hospitais/variacoes/", views.api_hospital_variacoes, name="api_hospital_variacoes"),
+    path("api/hospitais/<str:hospital_id>/historico/", views.api_hospital_historico, name="api_hospital_historico"),
+    path("metrics", views.metrics, name="metrics"),
 ]
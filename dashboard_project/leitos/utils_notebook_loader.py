@@ -1,8 +1,16 @@
+from datetime import datetime, timezone
 from pathlib import Path
+import hashlib
+
+import numpy as np
 import pandas as pd
 
+from .snapshot import read_snapshot, write_snapshot
+from .validation import FALLBACK_ENCODING, check_ranges, quality_report, repair_text, sniff_format
+from .zones import classify_zone, normalize_cep
+
 BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR = BASE_DIR / "Data"
+DATA_DIR = BASE_DIR / "data"
 
 CSV_CANDIDATES = [
     DATA_DIR / "Consolidado_SP.csv",
@@ -18,6 +26,15 @@ def find_csv():
     raise FileNotFoundError(f"Arquivo CSV não encontrado em {DATA_DIR}. Coloque 'Consolidado_SP.csv' em {DATA_DIR}")
 
 
+def file_version(path):
+    # hash do conteúdo do CSV: muda sempre que os dados mudam
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def try_cols(df, possibilities):
     for p in possibilities:
         if p in df.columns:
@@ -25,22 +42,102 @@ def try_cols(df, possibilities):
     return None
 
 
-def load_df():
-    csv_path = find_csv()
-    # tenta ler com ; (mais comum) e se falhar tenta ,
+# Colunas de texto com poucos valores distintos (repetidos em quase todas as
+# linhas): guardadas como categorias, ou seja, códigos inteiros + uma tabela
+# de valores compartilhada, em vez de uma string por linha
+DICTIONARY_COLS = [
+    "UF", "MUNICIPIO", "MUNICÍPIO", "Municipio", "REGIAO", "REGIÃO", "ZONA", "ZONA_REGIONAL", "Zona",
+    "DS_TIPO_UNIDADE", "TIPO_UNIDADE", "DESC_NATUREZA_JURIDICA", "NATUREZA_JURIDICA",
+    "RAZAO_SOCIAL", "RAZÃO_SOCIAL", "RAZAO SOCIAL",
+]
+
+
+def dictionary_cols(df):
+    return [c for c in DICTIONARY_COLS if c in df.columns]
+
+
+def narrow_int(values):
+    # int16 comporta as contagens de leitos; int32 só se algum valor passar disso
+    limits = np.iinfo(np.int16)
+    if len(values) and (values.min() < limits.min or values.max() > limits.max):
+        return values.astype("int32")
+    return values.astype("int16")
+
+
+def parse_counts(series):
+    """``(contagens inteiras, quantos valores não numéricos viraram 0)``.
+
+    Caminho rápido: valores já numéricos são convertidos direto; a limpeza
+    por regex (remove qualquer caractere não numérico) roda só nos demais.
+    Vazio vira 0 sem contar como problema.
+    """
+    raw = series.astype(str)
+    values = pd.to_numeric(raw, errors="coerce")
+    dirty = values.isna() & (raw != "")
+    if dirty.any():
+        cleaned = raw[dirty].str.replace(r"[^\d\-\.]", "", regex=True)
+        values[dirty] = pd.to_numeric(cleaned, errors="coerce")
+    invalid = int((values.isna() & (raw != "")).sum())
+    return narrow_int(values.fillna(0).round()), invalid
+
+
+def parse_comp(series):
+    # COMP no formato AAAAMM (aceita AAAA-MM e AAAA/MM); inválido -> 0
+    parts = series.astype(str).str.extract(r"(\d{4})[-/]?(\d{2})")
+    year = pd.to_numeric(parts[0], errors="coerce").fillna(0).astype("int32")
+    month = pd.to_numeric(parts[1], errors="coerce").fillna(0).astype("int32")
+    return (year * 100 + month).where(year > 0, 0).astype("int32")
+
+
+def numeric_cols(df):
+    return [c for c in df.columns if c.upper().startswith(("LEITOS", "QT_LEITOS", "UTI_"))]
+
+
+def read_csv(csv_path):
+    # codificação e separador detectados uma vez, no início do arquivo
+    encoding, sep = sniff_format(csv_path)
     try:
-        df = pd.read_csv(csv_path, sep=";", encoding="utf-8-sig", dtype=str, low_memory=False)
-    except Exception:
-        df = pd.read_csv(csv_path, sep=",", encoding="utf-8-sig", dtype=str, low_memory=False)
+        df = pd.read_csv(csv_path, sep=sep, encoding=encoding, dtype=str, low_memory=False)
+    except UnicodeDecodeError:
+        # byte inválido depois da amostra do sniff_format
+        encoding = FALLBACK_ENCODING
+        df = pd.read_csv(csv_path, sep=sep, encoding=encoding, dtype=str, low_memory=False)
 
     # clean column names
     df.columns = [c.strip() for c in df.columns]
+    df.attrs["source"] = {"arquivo": Path(csv_path).name, "encoding": encoding, "separador": sep}
+    return df
+
+
+def prepare_df(df):
+    """Detecta as colunas, tipa os dados e grava ``cols_map`` em ``df.attrs``.
+
+    Arquivos sem coluna de zona (os CSVs mensais) recebem ``ZONA`` calculada
+    a partir do CEP, como o notebook fazia no consolidado.
+
+    A validação (leitos/validation.py) também roda aqui, uma vez por
+    arquivo: texto sem espaços nas pontas e sem mojibake, contagens
+    negativas zeradas e o relatório de qualidade em ``df.attrs["quality"]``.
+    """
+    source = df.attrs.get("source", {})
+    df = df.fillna("")
+    df.attrs.pop("source", None)
+    repaired = repair_text(df, [c for c in df.columns if c not in numeric_cols(df)])
 
-    region_col = try_cols(df, ["ZONA", "REGIAO", "REGIÃO", "ZONA_REGIONAL", "Zona"])
     cep_col = try_cols(df, ["CO_CEP", "CEP", "Co_CEP", "CEP_OLD"])
+    if cep_col:
+        df[cep_col] = normalize_cep(df[cep_col])
+        if not try_cols(df, ["ZONA", "ZONA_REGIONAL", "Zona"]):
+            df["ZONA"] = classify_zone(df[cep_col])
+
+    region_col = try_cols(df, ["ZONA", "REGIAO", "REGIÃO", "ZONA_REGIONAL", "Zona"])
     municipio_col = try_cols(df, ["MUNICIPIO", "MUNICÍPIO", "Municipio"])
     nome_col = try_cols(df, ["NOME_ESTABELECIMENTO", "NOME DO ESTABELECIMENTO", "NOME", "RAZAO_SOCIAL"])
+    razao_social_col = try_cols(df, ["RAZAO_SOCIAL", "RAZÃO_SOCIAL", "RAZAO SOCIAL"])
+    logradouro_col = try_cols(df, ["NO_LOGRADOURO", "LOGRADOURO", "ENDERECO", "ENDEREÇO"])
+    bairro_col = try_cols(df, ["NO_BAIRRO", "BAIRRO"])
     especialidade_col = try_cols(df, ["ESPECIALIDADE", "ESPECIALIDADES", "TIPO", "SERVICO", "UTI"])
+    comp_col = try_cols(df, ["COMP", "COMPETENCIA", "COMPETÊNCIA"])
 
     leitos_exist_col = try_cols(df, [
         "LEITOS_EXISTENTES", "QT_LEITOS_EXISTENTES", "LEITOS EXISTENTES",
@@ -69,20 +166,78 @@ def load_df():
         "UTI_QUEIMADO_SUS"
     ])
 
-    df = df.fillna("")
+    leitos_uti_total_sus_col = try_cols(df, [
+        "UTI_TOTAL_SUS"
+    ])
+
+    # Tipagem feita uma única vez no carregamento: as views leem os dados
+    # já convertidos, sem copiar o DataFrame nem limpar strings a cada request
+    non_numeric = {}
+    for col in numeric_cols(df):
+        df[col], non_numeric[col] = parse_counts(df[col])
+    if comp_col:
+        df[comp_col] = parse_comp(df[comp_col])
 
-    df.attrs["cols_map"] = {
+    problems = check_ranges(df, numeric_cols(df), comp_col, cep_col, keys=(nome_col, cep_col, comp_col))
+    # leito negativo não existe: zerado aqui, fica só a contagem no relatório
+    for col in problems["contagem_negativa"]:
+        df[col] = df[col].clip(lower=0)
+
+    for col in dictionary_cols(df):
+        df[col] = df[col].astype("category")
+
+    cols_map = {
         "zone": region_col,
         "cep": cep_col,
         "municipio": municipio_col,
         "nome": nome_col,
+        "razao_social": razao_social_col,
+        "logradouro": logradouro_col,
+        "bairro": bairro_col,
         "especialidade": especialidade_col,
+        "comp": comp_col,
         "leitos_exist": leitos_exist_col,
         "leitos_sus": leitos_sus_col,
         "leitos_uti_adulto_sus": leitos_uti_adulto_sus_col,
         "leitos_uti_coronariana_sus": leitos_uti_coronariana_sus_col,
         "leitos_uti_neonatal_sus": leitos_uti_neonatal_sus_col,
         "leitos_uti_pediatrico_sus": leitos_uti_pediatrico_sus_col,
-        "leitos_uti_queimado_sus": leitos_uti_queimado_sus_col
+        "leitos_uti_queimado_sus": leitos_uti_queimado_sus_col,
+        "leitos_uti_total_sus": leitos_uti_total_sus_col
     }
+    df.attrs["cols_map"] = cols_map
+    df.attrs["quality"] = [quality_report(df, cols_map, source, repaired, non_numeric, problems)]
+    return df
+
+
+def file_mtime(path):
+    return datetime.fromtimestamp(Path(path).stat().st_mtime, tz=timezone.utc)
+
+
+def load_typed(csv_path):
+    """Retorna ``(df tipado, hash do CSV)``.
+
+    Usa o snapshot binário gravado ao lado do CSV quando ele ainda
+    corresponde ao arquivo; senão lê o CSV e grava um snapshot novo para as
+    próximas inicializações.
+    """
+    cached = read_snapshot(csv_path)
+    if cached is not None:
+        return cached
+
+    digest = file_version(csv_path)
+    df = prepare_df(read_csv(csv_path))
+    try:
+        write_snapshot(csv_path, df, digest)
+    except OSError:
+        # sem permissão de escrita: segue só com o CSV
+        pass
+    return df, digest
+
+
+def load_df(csv_path=None):
+    csv_path = csv_path or find_csv()
+    df, digest = load_typed(csv_path)
+    df.attrs["version"] = digest
+    df.attrs["last_modified"] = file_mtime(csv_path)
     return df
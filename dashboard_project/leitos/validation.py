@@ -0,0 +1,159 @@
+import codecs
+import re
+
+import numpy as np
+import pandas as pd
+
+# Etapa de validação da ingestão, sem dependência de Django: detecta
+# codificação e separador uma única vez por arquivo, corrige texto com
+# mojibake (UTF-8 lido como latin-1 e regravado, ex.: "HOSPITAL_PÃ\x9aBLICO"),
+# confere o esquema e as faixas das contagens e monta o relatório de
+# qualidade do arquivo (``df.attrs["quality"]``). Tudo roda uma vez na
+# carga; as requests já recebem o texto limpo.
+
+# Tentadas em ordem. O cp1252 não define 0x81, 0x8D, 0x8F, 0x90 e 0x9D; se
+# nenhuma das duas decodifica o arquivo, ele é lido como latin-1 (que aceita
+# qualquer byte) e o relatório de qualidade aponta a codificação inválida
+ENCODINGS = ("utf-8-sig", "cp1252")
+FALLBACK_ENCODING = "latin-1"
+DELIMITERS = (";", ",", "\t", "|")
+SNIFF_BYTES = 1 << 16
+
+# Papéis do cols_map sem os quais as consultas do dashboard não funcionam
+REQUIRED_ROLES = ("zone", "cep", "nome", "comp", "leitos_exist", "leitos_sus")
+
+# Contagem de leitos acima disso num único estabelecimento é suspeita
+MAX_LEITOS = 5000
+
+# Pares (SUS, existentes): leitos SUS não podem passar do total existente
+SUS_PAIRS = (("LEITOS_SUS", "LEITOS_EXISTENTES"), ("UTI_TOTAL_SUS", "UTI_TOTAL_EXIST"))
+
+# Sequências típicas de UTF-8 decodificado como latin-1/cp1252: "Ã" ou "Â"
+# seguidos de um byte de continuação (0x80-0xBF, ou o que o cp1252 põe em 0x80-0x9F)
+_CP1252_HIGH = bytes(range(0x80, 0xA0)).decode("cp1252", errors="ignore")
+_MOJIBAKE = re.compile("[ÃÂ][\x80-\xbf" + re.escape(_CP1252_HIGH) + "]")
+
+
+def sniff_format(path):
+    """``(encoding, separador)`` do CSV, a partir do início do arquivo.
+
+    A codificação é a primeira de ENCODINGS que decodifica a amostra (ou
+    FALLBACK_ENCODING); o separador é o mais frequente do cabeçalho entre
+    DELIMITERS.
+    """
+    with open(path, "rb") as f:
+        sample = f.read(SNIFF_BYTES)
+    encoding = FALLBACK_ENCODING
+    for candidate in ENCODINGS:
+        try:
+            # a amostra pode cortar um caractere multibyte no fim
+            codecs.getincrementaldecoder(candidate)().decode(sample, final=False)
+        except UnicodeDecodeError:
+            continue
+        encoding = candidate
+        break
+
+    header = sample.decode(encoding, errors="replace").lstrip("\ufeff").splitlines()[:1]
+    counts = {sep: header[0].count(sep) if header else 0 for sep in DELIMITERS}
+    sep = max(DELIMITERS, key=lambda s: counts[s])
+    return encoding, sep if counts[sep] else ";"
+
+
+def fix_mojibake(text):
+    """Desfaz UTF-8 decodificado como latin-1/cp1252 (uma ou mais vezes)."""
+    for _ in range(3):
+        if not _MOJIBAKE.search(text):
+            break
+        for encoding in ("latin-1", "cp1252"):
+            try:
+                text = text.encode(encoding).decode("utf-8")
+                break
+            except UnicodeError:
+                continue
+        else:
+            break
+    return text
+
+
+def _clean_values(values):
+    # (valores limpos, quantos tinham mojibake)
+    cleaned = pd.Series(values, dtype=object).str.strip()
+    broken = cleaned.str.contains(_MOJIBAKE, regex=True).to_numpy(dtype=bool)
+    if broken.any():
+        cleaned[broken] = [fix_mojibake(v) for v in cleaned[broken]]
+    return cleaned.to_numpy(dtype=object), int(broken.sum())
+
+
+def repair_text(df, columns):
+    """Remove espaços nas pontas e corrige mojibake das colunas de texto.
+
+    A correção roda só sobre os valores distintos de cada coluna (os
+    mesmos nomes se repetem mês a mês) e só para os que têm a sequência
+    típica do erro. Retorna ``{coluna: valores distintos corrigidos}``.
+    """
+    repaired = {}
+    for col in columns:
+        codes, uniques = pd.factorize(df[col].astype(str))
+        cleaned, broken = _clean_values(uniques)
+        if broken or (cleaned != np.asarray(uniques, dtype=object)).any():
+            df[col] = pd.Series(cleaned[codes], index=df.index, dtype=df[col].dtype)
+        if broken:
+            repaired[col] = broken
+    return repaired
+
+
+def check_ranges(df, count_cols, comp_col=None, cep_col=None, keys=()):
+    """Problemas de faixa/consistência do DF já tipado, em forma vetorizada.
+
+    Só conta: quem corrige (ex.: contagens negativas viram 0) é quem chama.
+    """
+    problems = {}
+    negative = {col: int((df[col] < 0).sum()) for col in count_cols}
+    above = {col: int((df[col] > MAX_LEITOS).sum()) for col in count_cols}
+    problems["contagem_negativa"] = {c: n for c, n in negative.items() if n}
+    problems["contagem_acima_limite"] = {c: n for c, n in above.items() if n}
+
+    sus_above = {}
+    for sus, total in SUS_PAIRS:
+        if sus in df.columns and total in df.columns:
+            n = int((df[sus] > df[total]).sum())
+            if n:
+                sus_above[sus] = n
+    problems["sus_acima_existentes"] = sus_above
+
+    if comp_col:
+        comps = df[comp_col]
+        month = comps % 100
+        problems["comp_invalida"] = int(((comps == 0) | (month < 1) | (month > 12)).sum())
+    if cep_col:
+        problems["cep_invalido"] = int((df[cep_col].astype(str).str.len() != 8).sum())
+    keys = [k for k in keys if k]
+    if keys:
+        problems["linhas_duplicadas"] = int(df.duplicated(keys).sum())
+    return problems
+
+
+def quality_report(df, cols_map, source, repaired, non_numeric, problems):
+    """Relatório de qualidade de um arquivo (serializável em JSON).
+
+    ``source`` traz nome do arquivo, codificação e separador detectados.
+    """
+    missing = [role for role in REQUIRED_ROLES if not cols_map.get(role)]
+    problems = {
+        # nem UTF-8 nem cp1252: lido como latin-1, o texto pode estar trocado
+        "codificacao_invalida": int(source.get("encoding") == FALLBACK_ENCODING),
+        "contagem_nao_numerica": {c: n for c, n in non_numeric.items() if n},
+        **problems,
+    }
+    issues = sum(n if isinstance(n, int) else sum(n.values()) for n in problems.values())
+    return {
+        "arquivo": source.get("arquivo"),
+        "linhas": len(df),
+        "encoding": source.get("encoding"),
+        "separador": source.get("separador"),
+        "colunas": {role: col for role, col in cols_map.items() if col},
+        "colunas_ausentes": missing,
+        "texto_corrigido": repaired,
+        "problemas": problems,
+        "ok": not missing and not issues,
+    }
@@ -1,346 +1,343 @@
-import io
-import pandas as pd
-import math
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
-from .utils_notebook_loader import load_df
+from django.http import HttpResponse, StreamingHttpResponse
+from django.conf import settings
+from . import queries
+from .queries import QueryError
+from .ingestion import MonthlyIngestor
+from .store import DatasetWatcher
+from .cache import cached_api
+from .serializers import dumps
+from .instrumentation import METRICS, count_returned, count_rows, stage
+from .streaming import iter_csv, gzip_stream, frame_chunks, iter_json_array, iter_ndjson
 
-# Carregar DataFrame inicial
-try:
-    DF = load_df()
-    LOAD_ERROR = None
-except Exception as e:
-    DF = None
-    LOAD_ERROR = str(e)
+# Dataset atual, recarregado em segundo plano quando os CSVs de leitos/data/ mudam
+# (ingestão incremental dos CSVs mensais; sem eles, usa o consolidado).
+# A carga e a thread começam na primeira request de cada processo
+WATCHER = DatasetWatcher(MonthlyIngestor(), getattr(settings, "LEITOS_INGEST_INTERVAL", 60))
 
 
-def dashboard_view(request):
-    if LOAD_ERROR:
-        return HttpResponse(f"Erro ao carregar dados: {LOAD_ERROR}", status=500)
-    return render(request, "leitos/dashboard.html", {})
+def _current_data(request=None):
+    # nas views com cache, o dataset já lido para o ETag (ver leitos/cache.py)
+    data = getattr(request, "dataset", None)
+    if data is not None:
+        return data
+    WATCHER.ensure_started()
+    return WATCHER.data
+
 
+# Máximo de linhas por página nas APIs por município/zona/CEP e na tabela
+MAX_PAGE_ROWS = 5000
 
-def _col(name):
-    return DF.attrs["cols_map"].get(name)
+# Cache de respostas + ETag/Last-Modified, invalidado pela versão do dataset
+api_cache = cached_api(_current_data)
 
 
-# Função auxiliar para aplicar filtros de região e CEP
-def _apply_filters(df, request):
-    zone_col = _col("zone")
-    cep_col = _col("cep")
+# Resposta JSON pela camada de leitos/serializers.py (orjson quando instalado);
+# com columnar, DataFrames saem como {coluna: [valores]}
+def _json_response(obj, status=200, columnar=False):
+    with stage("serialize"):
+        content = dumps(obj, columnar)
+    return HttpResponse(content, status=status, content_type="application/json")
 
-    q_zone = request.GET.get("zone", "").strip()
-    q_cep = request.GET.get("cep", "").replace("-", "").strip()
 
-    if q_zone and zone_col:
-        df = df[df[zone_col].astype(str).str.upper() == q_zone.upper()]
+def dashboard_view(request):
+    if _current_data() is None:
+        return HttpResponse(f"Erro ao carregar dados: {WATCHER.error}", status=500)
+    return render(request, "leitos/dashboard.html", {})
 
-    if q_cep and cep_col:
-        df = df[df[cep_col].astype(str).str.replace("-", "").str.startswith(q_cep)]
 
-    return df
+# Filtros de região, CEP e busca textual (q) vindos da query string
+def _query_filters(request):
+    return {
+        "zone": request.GET.get("zone", "").strip(),
+        "cep": request.GET.get("cep", "").replace("-", "").strip(),
+        "q": request.GET.get("q", "").strip(),
+    }
+
+
+# Executa uma consulta de leitos/queries.py e serializa o resultado
+def _query_response(request, query, **kwargs):
+    data = _current_data(request)
+    if data is None:
+        return _json_response({"error": "Dados não carregados"}, status=500)
+    try:
+        with stage("query"):
+            out = query(data, **kwargs)
+    except QueryError as e:
+        return _json_response({"error": str(e)}, status=e.status)
+    count_returned(out)
+    return _json_response(out, columnar=request.GET.get("format", "").strip().lower() == "columns")
 
 
 # API: Zona Leitos
+@api_cache
 def api_zona_leitos(request):
-    if DF is None:
-        return JsonResponse({"error": "Dados não carregados"}, status=500)
-
-    zone_col = _col("zone")
-    leitos_exist_col = _col("leitos_exist")
-    leitos_sus_col = _col("leitos_sus")
-
-    if not zone_col:
-        return JsonResponse({"error": "Coluna região não encontrada"}, status=400)
-
-    df = _apply_filters(DF.copy(), request)
-
-    # Converter leitos para numérico
-    for col in [leitos_exist_col, leitos_sus_col]:
-        if col:
-            df[col] = pd.to_numeric(
-                df[col].astype(str).str.replace(r"[^\d\-\.]", "", regex=True),
-                errors="coerce"
-            ).fillna(0)
-
-    agg = {}
-    for _, row in df.iterrows():
-        zone = row[zone_col] if zone_col else "N/A"
-        if not zone or str(zone).strip() == "":
-            zone = "Sem Região"
-        if zone not in agg:
-            agg[zone] = {"leitos_exist": 0.0, "leitos_sus": 0.0}
-        if leitos_exist_col:
-            agg[zone]["leitos_exist"] += float(row[leitos_exist_col])
-        if leitos_sus_col:
-            agg[zone]["leitos_sus"] += float(row[leitos_sus_col])
-
-    out = [{"zone": z, **v} for z, v in agg.items()]
-    out = sorted(out, key=lambda x: x["zone"])
-    return JsonResponse(out, safe=False)
+    return _query_response(request, queries.zona_leitos, **_query_filters(request))
 
 
 # API: Zona Especialidades (UTIs específicas)
+@api_cache
 def api_zona_especialidades(request):
-    if DF is None:
-        return JsonResponse({"error": "Dados não carregados"}, status=500)
-
-    zone_col = _col("zone")
-    leitos_uti_adulto_sus_col = _col("leitos_uti_adulto_sus")
-    leitos_uti_coronariana_sus_col = _col("leitos_uti_coronariana_sus")
-    leitos_uti_neonatal_sus_col = _col("leitos_uti_neonatal_sus")
-    leitos_uti_pediatrico_sus_col = _col("leitos_uti_pediatrico_sus")
-    leitos_uti_queimado_sus_col = _col("leitos_uti_queimado_sus")
-
-    if not zone_col:
-        return JsonResponse({"error": "Coluna região não encontrada"}, status=400)
-
-    df = _apply_filters(DF.copy(), request)
-
-    # Converter leitos para numérico
-    for col in [leitos_uti_adulto_sus_col, leitos_uti_coronariana_sus_col,
-                leitos_uti_neonatal_sus_col, leitos_uti_pediatrico_sus_col,
-                leitos_uti_queimado_sus_col]:
-        if col:
-            df[col] = pd.to_numeric(
-                df[col].astype(str).str.replace(r"[^\d\-\.]", "", regex=True),
-                errors="coerce"
-            ).fillna(0)
-
-    agg = {}
-    for _, row in df.iterrows():
-        zone = row[zone_col] if zone_col else "N/A"
-        if not zone or str(zone).strip() == "":
-            zone = "Sem Região"
-        if zone not in agg:
-            agg[zone] = {
-                "leitos_uti_adulto_sus": 0.0,
-                "leitos_uti_coronariana_sus": 0.0,
-                "leitos_uti_neonatal_sus": 0.0,
-                "leitos_uti_pediatrico_sus": 0.0,
-                "leitos_uti_queimado_sus": 0.0
-            }
-        if leitos_uti_adulto_sus_col:
-            agg[zone]["leitos_uti_adulto_sus"] += float(row[leitos_uti_adulto_sus_col])
-        if leitos_uti_coronariana_sus_col:
-            agg[zone]["leitos_uti_coronariana_sus"] += float(row[leitos_uti_coronariana_sus_col])
-        if leitos_uti_neonatal_sus_col:
-            agg[zone]["leitos_uti_neonatal_sus"] += float(row[leitos_uti_neonatal_sus_col])
-        if leitos_uti_pediatrico_sus_col:
-            agg[zone]["leitos_uti_pediatrico_sus"] += float(row[leitos_uti_pediatrico_sus_col])
-        if leitos_uti_queimado_sus_col:
-            agg[zone]["leitos_uti_queimado_sus"] += float(row[leitos_uti_queimado_sus_col])
-
-    out = [{"zone": z, **v} for z, v in agg.items()]
-    out = sorted(out, key=lambda x: x["zone"])
-    return JsonResponse(out, safe=False)
-
-
-# API: Evolução Temporal (Mês) Leitos
-def api_evolucao_leitos(request):
-    if DF is None:
-        return JsonResponse({"error": "Dados não carregados"}, status=500)
-
-    comp_col = _col("comp") or "COMP"
-    zone_col = _col("zone")
-    leitos_exist_col = _col("leitos_exist")
-    leitos_sus_col = _col("leitos_sus")
-
-    if not zone_col:
-        return JsonResponse({"error": "Coluna região não encontrada"}, status=400)
-
-    df = _apply_filters(DF.copy(), request)
-
-    # Normaliza COMP para formato AAAA-MM
-    df[comp_col] = df[comp_col].astype(str).str.extract(r"(\d{4})[-/]?(\d{2})")\
-        .apply(lambda x: f"{x[0]}-{x[1]}" if pd.notnull(x[0]) and pd.notnull(x[1]) else None, axis=1)
-    df = df.dropna(subset=[comp_col])
-
-    # Converter leitos para numérico
-    for col in [leitos_exist_col, leitos_sus_col]:
-        if col:
-            df[col] = pd.to_numeric(
-                df[col].astype(str).str.replace(r"[^\d\-\.]", "", regex=True),
-                errors="coerce"
-            ).fillna(0)
-
-    # Agrupa por região e mês
-    grouped = df.groupby([zone_col, comp_col], as_index=False).agg({
-        leitos_exist_col: "sum",
-        leitos_sus_col: "sum"
-    })
+    return _query_response(request, queries.zona_especialidades, **_query_filters(request))
 
-    grouped = grouped.rename(columns={
-        zone_col: "zone",
-        comp_col: "comp",
-        leitos_exist_col: "leitos_exist",
-        leitos_sus_col: "leitos_sus"
-    })
 
-    return JsonResponse(grouped.to_dict(orient="records"), safe=False)
-
-
-# API: Taxa Média de Ocupação SUS (%) por Região
-def api_taxa_ocupacao_sus(request):
-
-    if DF is None:
-        return JsonResponse({"error": "Dados não carregados"}, status=500)
+# Série temporal: period=month|quarter|year e intervalo from/to (AAAA-MM ou AAAA)
+def _time_params(request):
+    return {
+        "period": request.GET.get("period", "").strip().lower() or "month",
+        "date_from": request.GET.get("from", ""),
+        "date_to": request.GET.get("to", ""),
+    }
 
-    zone_col = _col("zone")
-    leitos_exist_col = _col("leitos_exist")
-    leitos_sus_col = _col("leitos_sus")
 
-    if not zone_col or not leitos_exist_col or not leitos_sus_col:
-        return JsonResponse({"error": "Colunas obrigatórias ausentes"}, status=400)
+# API: Evolução Temporal (Mês, Trimestre ou Ano) Leitos
+@api_cache
+def api_evolucao_leitos(request):
+    return _query_response(request, queries.evolucao_leitos, **_query_filters(request), **_time_params(request))
 
-    df = _apply_filters(DF.copy(), request)
 
-    # Converter colunas numéricas
-    for col in [leitos_exist_col, leitos_sus_col]:
-        df[col] = pd.to_numeric(
-            df[col].astype(str).str.replace(r"[^\d\-\.]", "", regex=True),
-            errors="coerce"
-        ).fillna(0)
+# API: Taxa Média de Ocupação SUS (%) por Região
+@api_cache
+def api_taxa_ocupacao_sus(request):
+    return _query_response(request, queries.taxa_ocupacao_sus, **_query_filters(request))
 
-    # Agrupar por zona
-    grouped = (
-        df.groupby(zone_col, as_index=False)
-        .agg({leitos_exist_col: "sum", leitos_sus_col: "sum"})
-    )
 
-    # Calcular taxa
-    # Fórmula: (Leitos SUS / Leitos Existentes) * 100
-    grouped["taxa_ocupacao_sus"] = grouped.apply(
-        lambda x: round((x[leitos_sus_col] / x[leitos_exist_col]) * 100, 2)
-        if x[leitos_exist_col] > 0 else 0,
-        axis=1
-    )
+# Ordenação da tabela de hospitais: sort=<coluna> (ex.: leitos_sus ou "Leitos SUS")
+# e order=asc|desc
+def _table_sort(request):
+    return {
+        "sort": request.GET.get("sort", "").strip(),
+        "order": request.GET.get("order", "asc").strip().lower() or "asc",
+    }
 
-    grouped = grouped.rename(columns={zone_col: "zone"})
-    grouped = grouped.sort_values("zone")
 
-    return JsonResponse(grouped.to_dict(orient="records"), safe=False)
+# Página da tabela: page >= 1 e 1 <= page_size <= MAX_PAGE_ROWS (ValueError se não)
+def _page_params(request):
+    page = int(request.GET.get("page", "1") or "1")
+    page_size = int(request.GET.get("page_size", "25") or "25")
+    if page < 1 or not 1 <= page_size <= MAX_PAGE_ROWS:
+        raise ValueError(f"page={page}, page_size={page_size}")
+    return page, page_size
 
 
 # API: Estabelecimentos (Tabela com Paginação e Export)
+@api_cache
 def api_estabelecimentos_table(request):
-    if DF is None:
-        return JsonResponse({"error": "Dados não carregados"}, status=500)
-
-    page = int(request.GET.get("page", "1"))
-    page_size = int(request.GET.get("page_size", "25"))
-    page = max(page, 1)
-    page_size = max(page_size, 1)
-
-    zone_col = _col("zone")
-    municipio_col = _col("municipio")
-    cep_col = _col("cep")
-    nome_col = _col("nome")
-    leitos_exist_col = _col("leitos_exist")
-    leitos_sus_col = _col("leitos_sus")
+    try:
+        page, page_size = _page_params(request)
+    except ValueError:
+        return _json_response({"error": f"Parâmetros page/page_size inválidos (page_size até {MAX_PAGE_ROWS})"}, status=400)
+    return _query_response(
+        request, queries.estabelecimentos_page, page=page, page_size=page_size,
+        **_query_filters(request), **_table_sort(request)
+    )
 
-    if not all([zone_col, municipio_col, cep_col, nome_col]):
-        return JsonResponse({"error": "Colunas obrigatórias ausentes no CSV."}, status=400)
 
-    df = _apply_filters(DF.copy(), request)
+# API: Dashboard completo (todos os gráficos + página da tabela) em uma request
+# Parâmetros: zone, cep, page, page_size, sort, order, period, from, to
+# e filters=1 (inclui as opções dos filtros)
+@api_cache
+def api_dashboard(request):
+    try:
+        page, page_size = _page_params(request)
+    except ValueError:
+        return _json_response({"error": f"Parâmetros page/page_size inválidos (page_size até {MAX_PAGE_ROWS})"}, status=400)
+    with_filters = request.GET.get("filters", "") == "1"
+    return _query_response(
+        request, queries.dashboard, page=page, page_size=page_size, with_filters=with_filters,
+        **_query_filters(request), **_table_sort(request), **_time_params(request)
+    )
 
-    for col in [leitos_exist_col, leitos_sus_col]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(r"[^\d]", "", regex=True).replace("", "0").astype(float)
 
-    group_cols = [municipio_col, zone_col, cep_col, nome_col]
-    agg_dict = {leitos_exist_col: "sum", leitos_sus_col: "sum"}
+# API: Histórico mensal de um hospital (id estável derivado de nome + CEP)
+@api_cache
+def api_hospital_historico(request, hospital_id):
+    return _query_response(request, queries.hospital_history, hospital_id=hospital_id.strip().lower())
+
+
+# API: Maiores variações de leitos no mês
+# Parâmetros: comp (AAAA-MM, padrão: último mês), metric (ex.: leitos_sus ou
+# UTI_TOTAL_EXIST), limit e direction=abs|up|down
+@api_cache
+def api_hospital_variacoes(request):
+    try:
+        limit = int(request.GET.get("limit", "20") or "20")
+    except ValueError:
+        return _json_response({"error": "Parâmetro limit inválido"}, status=400)
+    return _query_response(
+        request, queries.largest_changes,
+        comp=request.GET.get("comp", "").strip(),
+        metric=request.GET.get("metric", "").strip() or "leitos_exist",
+        limit=limit,
+        direction=request.GET.get("direction", "").strip().lower() or "abs",
+    )
 
-    df_grouped = df.groupby(group_cols, dropna=False, as_index=False).agg(agg_dict)
-    df_grouped = df_grouped.rename(columns={
-        municipio_col: "Município",
-        zone_col: "Zona",
-        cep_col: "CEP",
-        nome_col: "Hospital",
-        leitos_exist_col: "Leitos Existentes",
-        leitos_sus_col: "Leitos SUS",
-    })
 
-    total = len(df_grouped)
-    total_pages = math.ceil(total / page_size)
-    start, end = (page - 1) * page_size, (page * page_size)
-    page_df = df_grouped.iloc[start:end]
-
-    return JsonResponse({
-        "results": page_df.to_dict(orient="records"),
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": total_pages,
-    })
+# API: Busca de estabelecimentos por nome, razão social e endereço
+# Parâmetros: q (texto, sem diferenciar acentos/maiúsculas) e limit
+@api_cache
+def api_search(request):
+    try:
+        limit = int(request.GET.get("limit", "20") or "20")
+    except ValueError:
+        return _json_response({"error": "Parâmetro limit inválido"}, status=400)
+    return _query_response(request, queries.search, q=request.GET.get("q", "").strip(), limit=limit)
+
+
+# API: Hospitais mais próximos de um CEP ou de lat/lon
+# Parâmetros: cep ou lat+lon, k (quantidade), min_sus e min_uti (mínimo de
+# leitos SUS e de UTI SUS; padrão: 1 e 0)
+@api_cache
+def api_proximos(request):
+    try:
+        lat = request.GET.get("lat", "").strip()
+        lon = request.GET.get("lon", "").strip()
+        params = {
+            "lat": float(lat) if lat else None,
+            "lon": float(lon) if lon else None,
+            "k": int(request.GET.get("k", "10") or "10"),
+            "min_sus": int(request.GET.get("min_sus", "1") or "1"),
+            "min_uti": int(request.GET.get("min_uti", "0") or "0"),
+        }
+    except ValueError:
+        return _json_response({"error": "Parâmetros lat/lon/k/min_sus/min_uti inválidos"}, status=400)
+    return _query_response(
+        request, queries.proximos, cep=request.GET.get("cep", "").replace("-", "").strip(), **params
+    )
 
 
+@api_cache
 def api_estabelecimentos_export_csv(request):
-    if DF is None:
+    data = _current_data(request)
+    if data is None:
         return HttpResponse("Dados não carregados", status=500)
 
-    zone_col = _col("zone")
-    municipio_col = _col("municipio")
-    cep_col = _col("cep")
-    nome_col = _col("nome")
-    leitos_exist_col = _col("leitos_exist")
-    leitos_sus_col = _col("leitos_sus")
-
-    df = _apply_filters(DF.copy(), request)
-
-    for col in [leitos_exist_col, leitos_sus_col]:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.replace(r"[^\d]", "", regex=True).replace("", "0").astype(float)
-
-    group_cols = [municipio_col, zone_col, cep_col, nome_col]
-    agg_dict = {leitos_exist_col: "sum", leitos_sus_col: "sum"}
-
-    df_grouped = df.groupby(group_cols, dropna=False, as_index=False).agg(agg_dict)
+    try:
+        df_grouped, _ = queries.hospitais(data, **_query_filters(request), **_table_sort(request))
+    except QueryError as e:
+        return HttpResponse(str(e), status=400)
+    count_rows(returned=len(df_grouped))
     df_grouped = df_grouped.rename(columns={
-        municipio_col: "Município",
-        zone_col: "Região",
-        cep_col: "CEP",
-        nome_col: "Hospital",
-        leitos_exist_col: "Leitos Totais",
-        leitos_sus_col: "Leitos SUS",
+        data.col("municipio"): "Município",
+        data.col("zone"): "Região",
+        data.col("cep"): "CEP",
+        data.col("nome"): "Hospital",
+        data.col("leitos_exist"): "Leitos Totais",
+        data.col("leitos_sus"): "Leitos SUS",
     })
 
-    buf = io.StringIO()
-    df_grouped.to_csv(buf, index=False, sep=";", encoding="utf-8-sig")
-    response = HttpResponse(buf.getvalue(), content_type="text/csv; charset=utf-8")
-    response["Content-Disposition"] = 'attachment; filename="Relacao_Hospitais_Regiao.csv"'
+    # Envia o CSV em blocos (opcionalmente gzip) em vez de montar o arquivo inteiro em memória
+    filename = "Relacao_Hospitais_Regiao.csv"
+    chunks = iter_csv(df_grouped, sep=";")
+    if request.GET.get("compress", "").strip().lower() == "gzip":
+        response = StreamingHttpResponse(gzip_stream(chunks), content_type="application/gzip")
+        filename += ".gz"
+    else:
+        response = StreamingHttpResponse(chunks, content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
     return response
 
 
 # APIs adicionais (por Município, Região e CEP)
+# Linhas completas do DF filtradas pelo valor do caminho (+ filtros da query).
+# Parâmetros opcionais:
+#   fields=COL1,COL2   projeção de colunas
+#   limit=N&cursor=C   paginação por cursor (C = next_cursor da página anterior)
+#   format=ndjson      resposta em streaming, um registro por linha
+# Sem limit, a lista completa é enviada em streaming (mesmo JSON de antes).
+def _rows_response(data, request, **path_filters):
+    fields = [f.strip() for f in request.GET.get("fields", "").split(",") if f.strip()]
+    try:
+        cursor = int(request.GET.get("cursor", "-1") or "-1")
+        limit = int(request.GET.get("limit", "0") or "0")
+    except ValueError:
+        return _json_response({"error": "Parâmetros cursor/limit inválidos"}, status=400)
+
+    try:
+        positions, columns, next_cursor = queries.row_selection(
+            data, [path_filters, _query_filters(request)], fields, cursor, limit, MAX_PAGE_ROWS
+        )
+    except QueryError as e:
+        return _json_response({"error": str(e)}, status=400)
+    count_rows(returned=len(positions))
+
+    chunks = frame_chunks(data.df, positions, columns)
+    if request.GET.get("format", "").strip().lower() == "ndjson":
+        response = StreamingHttpResponse(iter_ndjson(chunks), content_type="application/x-ndjson")
+        if next_cursor:
+            response["X-Next-Cursor"] = next_cursor
+        return response
+    if limit > 0:
+        return _json_response({"results": queries.rows_frame(data, positions, columns), "next_cursor": next_cursor})
+    return StreamingHttpResponse(iter_json_array(chunks), content_type="application/json")
+
+
+@api_cache
 def api_por_municipio(request, municipio):
-    if DF is None:
-        return JsonResponse({"error": "Dados não carregados"}, status=500)
-    df = _apply_filters(DF.copy(), request)
-    return JsonResponse(df.to_dict(orient="records"), safe=False)
+    data = _current_data(request)
+    if data is None:
+        return _json_response({"error": "Dados não carregados"}, status=500)
+    return _rows_response(data, request, municipio=municipio.strip())
 
 
+@api_cache
 def api_por_zona(request, zona):
-    if DF is None:
-        return JsonResponse({"error": "Dados não carregados"}, status=500)
-    df = _apply_filters(DF.copy(), request)
-    return JsonResponse(df.to_dict(orient="records"), safe=False)
+    data = _current_data(request)
+    if data is None:
+        return _json_response({"error": "Dados não carregados"}, status=500)
+    return _rows_response(data, request, zone=zona.strip())
 
 
+@api_cache
 def api_por_cep(request, cep):
-    if DF is None:
-        return JsonResponse({"error": "Dados não carregados"}, status=500)
-    df = _apply_filters(DF.copy(), request)
-    return JsonResponse(df.to_dict(orient="records"), safe=False)
+    data = _current_data(request)
+    if data is None:
+        return _json_response({"error": "Dados não carregados"}, status=500)
+    return _rows_response(data, request, cep=cep.replace("-", "").strip())
+
+
+# API: Métricas de capacidade (taxa SUS, UTI por especialidade, leitos por zona)
+# Parâmetros: metric (sem ele, lista as métricas), window=1|3|12 meses,
+# by=zona|cep, prefix (dígitos do CEP), zone, cep, from/to; rank=top|bottom
+# com comp (AAAA-MM, padrão: último mês) e limit para ranking
+@api_cache
+def api_metricas(request):
+    try:
+        params = {
+            key: int(request.GET.get(key, str(default)) or default)
+            for key, default in (("window", 1), ("prefix", 3), ("limit", 10))
+        }
+    except ValueError:
+        return _json_response({"error": "Parâmetros window, prefix e limit devem ser inteiros"}, status=400)
+    return _query_response(
+        request, queries.metricas,
+        metric=request.GET.get("metric", "").strip(),
+        by=request.GET.get("by", "").strip().lower() or "zona",
+        zone=request.GET.get("zone", "").strip(),
+        cep=request.GET.get("cep", "").replace("-", "").strip(),
+        date_from=request.GET.get("from", ""),
+        date_to=request.GET.get("to", ""),
+        rank=request.GET.get("rank", "").strip().lower(),
+        comp=request.GET.get("comp", "").strip(),
+        **params,
+    )
 
 
+# Qualidade dos arquivos lidos: codificação, texto corrigido e problemas por arquivo
+# (muda só com a versão do dataset, então passa pelo mesmo cache)
+@api_cache
+def api_qualidade(request):
+    return _query_response(request, queries.quality)
+
+
+@api_cache
 def api_filters(request):
-    if DF is None:
-        return JsonResponse({"zones": [], "ceps": []}, safe=False)
-    zone_col = _col("zone")
-    cep_col = _col("cep")
-    data = {
-        "zones": sorted(DF[zone_col].dropna().astype(str).unique().tolist()) if zone_col else [],
-        "ceps": sorted(DF[cep_col].astype(str).str.replace("-", "").dropna().unique().tolist()) if cep_col else [],
-    }
-    return JsonResponse(data)
+    data = _current_data(request)
+    if data is None:
+        return _json_response({"zones": [], "ceps": []})
+    return _json_response(queries.filter_options(data))
+
+
+# Métricas das requests no formato do Prometheus (ver leitos/middleware.py)
+def metrics(request):
+    return HttpResponse(METRICS.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+ZONA_DESCONHECIDA = "Desconhecida"
+
+# Faixas do prefixo de 6 dígitos do CEP (ex.: 01309010 -> 13090), no formato
+# (início da faixa, zona). Cada faixa vai até o início da seguinte:
+#   Centro      1000-15999   (CEPs 00100-000 a 01599-999)
+#   Zona Norte  20000-29999  (02000-000 a 02999-999)
+#   Zona Leste  30000-39999 e 80000-84999 (03000-000 a 03999-999, 08000-000 a 08499-999)
+#   Zona Sul    40000-49999 e 56000-59999 (04000-000 a 04999-999, 05600-000 a 05999-999)
+#   Zona Oeste  50000-55999  (05000-000 a 05599-999)
+# O identificar_zona do notebook analise_leitos.ipynb escreve os inícios com
+# zero à esquerda (0o1000, 0o20000, ...), que o Python lê como octais (512,
+# 8192, ...). Como as faixas do notebook são testadas em ordem, lá o Centro
+# começa em 512 e a Zona Norte em 16000; aqui valem os valores decimais, e
+# 512-999 e 16000-19999 ficam como ZONA_DESCONHECIDA. Os CEPs dos dados não
+# caem nessas faixas, então a coluna ZONA do consolidado é a mesma.
+ZONE_RANGES = [
+    (0, ZONA_DESCONHECIDA),
+    (1000, "Centro"),
+    (16000, ZONA_DESCONHECIDA),
+    (20000, "Zona Norte"),
+    (30000, "Zona Leste"),
+    (40000, "Zona Sul"),
+    (50000, "Zona Oeste"),
+    (56000, "Zona Sul"),
+    (60000, ZONA_DESCONHECIDA),
+    (80000, "Zona Leste"),
+    (85000, ZONA_DESCONHECIDA),
+]
+
+_STARTS = np.array([start for start, _ in ZONE_RANGES], dtype=np.int64)
+_ZONES = sorted({zone for _, zone in ZONE_RANGES})
+_RANGE_CODES = np.array([_ZONES.index(zone) for _, zone in ZONE_RANGES], dtype=np.int8)
+
+
+def normalize_cep(series):
+    """CEP apenas com dígitos e sempre com 8 posições (ex.: 1309010 -> 01309010).
+
+    Valores sem nenhum dígito viram string vazia. A limpeza roda só sobre os
+    valores distintos (cada estabelecimento repete o CEP todo mês).
+    """
+    codes, uniques = pd.factorize(series.astype(str))
+    digits = pd.Series(uniques, dtype=object).str.replace(r"\D", "", regex=True)
+    digits = digits.where(digits == "", digits.str.zfill(8)).to_numpy(dtype=object)
+    return pd.Series(digits[codes], index=series.index)
+
+
+def classify_zone(ceps):
+    """Zona de São Paulo de cada CEP normalizado, como Series categórica.
+
+    Busca binária (``searchsorted``) do prefixo de 6 dígitos na tabela
+    ZONE_RANGES, sem função Python por linha. CEPs vazios ou inválidos
+    ficam como ZONA_DESCONHECIDA.
+    """
+    positions, uniques = pd.factorize(ceps.astype(str))
+    prefix = pd.to_numeric(pd.Series(uniques, dtype=object).str[:6], errors="coerce")
+    values = prefix.to_numpy(dtype=float, na_value=-1)
+
+    codes = _RANGE_CODES[np.clip(np.searchsorted(_STARTS, values, side="right") - 1, 0, None)]
+    codes = np.where(values < 0, _ZONES.index(ZONA_DESCONHECIDA), codes)
+    return pd.Series(pd.Categorical.from_codes(codes[positions], categories=_ZONES), index=ceps.index)